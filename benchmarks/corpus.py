@@ -0,0 +1,149 @@
+"""
+合成 EPUB 语料生成器。
+
+为基准测试生成不同规模和形态的 EPUB 文件：
+- small-files: 大量小文件
+- giant-chapter: 单个超大章节
+- code-heavy: 代码块密集（大量会被 HTMLReplacer 替换为占位符的标签）
+- image-heavy: 图片密集（大量二进制资源）
+"""
+
+import random
+import struct
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Union
+
+from ebooklib import epub
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog interview question answer system design "
+    "distributed cache latency throughput engineer candidate team project manager data "
+    "model service request response network storage memory process thread queue book "
+    "chapter reader writer story history future simple complex example problem solution"
+).split()
+
+
+@dataclass
+class CorpusShape:
+    """描述一种合成 EPUB 的形态"""
+
+    name: str
+    files: int  # 章节文件数量
+    paragraphs: int  # 每个章节的段落数
+    code_blocks: int = 0  # 每个章节的代码块数量
+    images: int = 0  # 每个章节引用的图片数量
+    image_size: int = 64  # 图片边长（像素）
+
+
+SHAPES: Dict[str, CorpusShape] = {
+    "small-files": CorpusShape(name="small-files", files=200, paragraphs=5),
+    "giant-chapter": CorpusShape(name="giant-chapter", files=1, paragraphs=2000),
+    "code-heavy": CorpusShape(name="code-heavy", files=20, paragraphs=20, code_blocks=30),
+    "image-heavy": CorpusShape(name="image-heavy", files=20, paragraphs=10, images=10, image_size=256),
+}
+
+
+def scaled_shape(shape: Union[str, CorpusShape], scale: float = 1.0) -> CorpusShape:
+    """按比例缩放语料规模（文件数和段落数），代码块与图片的密度保持不变"""
+    if isinstance(shape, str):
+        shape = SHAPES[shape]
+    return CorpusShape(
+        name=shape.name,
+        files=max(1, int(shape.files * scale)),
+        paragraphs=max(1, int(shape.paragraphs * scale)),
+        code_blocks=shape.code_blocks,
+        images=shape.images,
+        image_size=shape.image_size,
+    )
+
+
+def _sentence(rng: random.Random, words: int = 16) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _paragraph(rng: random.Random) -> str:
+    return " ".join(_sentence(rng, rng.randint(8, 24)) for _ in range(rng.randint(2, 6)))
+
+
+def _code_block(rng: random.Random) -> str:
+    lines = [f"def {rng.choice(WORDS)}_{i}(x):\n    return x * {i}" for i in range(rng.randint(3, 10))]
+    return "<pre><code>" + "\n".join(lines) + "</code></pre>"
+
+
+def _png(size: int, seed: int) -> bytes:
+    """生成一张合法的 RGB PNG 图片（噪声填充，避免被过度压缩）"""
+    rng = random.Random(seed)
+    raw = b"".join(b"\x00" + bytes(rng.getrandbits(8) for _ in range(size * 3)) for _ in range(size))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+def _chapter_body(rng: random.Random, shape: CorpusShape, index: int, images: List[str]) -> str:
+    parts = [f"<h1>Chapter {index}</h1>"]
+    blocks = ["p"] * shape.paragraphs + ["code"] * shape.code_blocks + ["img"] * len(images)
+    rng.shuffle(blocks)
+    image_iter = iter(images)
+    for block in blocks:
+        if block == "p":
+            parts.append(f"<p>{_paragraph(rng)}</p>")
+        elif block == "code":
+            parts.append(_code_block(rng))
+        else:
+            parts.append(f'<p><img src="{next(image_iter)}" alt="figure"/></p>')
+    return "\n".join(parts)
+
+
+def generate_epub(path: Union[str, Path], shape: Union[str, CorpusShape], seed: int = 42) -> Path:
+    """
+    生成一个合成 EPUB 文件。
+    Args:
+        path: 输出文件路径
+        shape: 形态名称（见 SHAPES）或 CorpusShape 实例
+        seed: 随机种子，保证同一参数生成的内容一致，便于跨提交对比
+    Returns:
+        生成的 EPUB 文件路径
+    """
+    if isinstance(shape, str):
+        shape = SHAPES[shape]
+    rng = random.Random(seed)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    book = epub.EpubBook()
+    book.set_identifier(f"epubot-bench-{shape.name}-{seed}")
+    book.set_title(f"Synthetic {shape.name}")
+    book.set_language("en")
+    book.add_author("epubot benchmarks")
+
+    chapters = []
+    for i in range(1, shape.files + 1):
+        images = []
+        for j in range(shape.images):
+            file_name = f"images/c{i:04d}_{j:03d}.png"
+            book.add_item(
+                epub.EpubImage(
+                    uid=f"img_{i}_{j}",
+                    file_name=file_name,
+                    media_type="image/png",
+                    content=_png(shape.image_size, seed * 100000 + i * 1000 + j),
+                )
+            )
+            images.append(f"../{file_name}")
+        chapter = epub.EpubHtml(title=f"Chapter {i}", file_name=f"Text/chapter-{i:04d}.xhtml", lang="en")
+        chapter.content = _chapter_body(rng, shape, i, images)
+        book.add_item(chapter)
+        chapters.append(chapter)
+
+    book.toc = [epub.Link(c.file_name, c.title, c.id) for c in chapters]
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+    book.spine = ["nav", *chapters]
+    epub.write_epub(str(path), book, {})
+    return path
@@ -0,0 +1,64 @@
+"""
+进程内的假翻译后端，用于端到端基准测试。
+
+不访问任何网络，按配置的延迟分布休眠后返回“翻译”结果，
+从而可以在不消耗 API 额度的情况下测量流水线本身的开销。
+"""
+
+import asyncio
+import random
+from typing import Optional
+
+from epubot.services.hedging import Hedger
+from epubot.services.translator import Translator
+
+
+class FakeTranslator(Translator):
+    """注入延迟的假翻译器"""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.5,
+        concurrency: int = 8,
+        seed: Optional[int] = 42,
+        hedge: bool = False,
+    ):
+        """
+        Args:
+            latency: 每次请求的中位延迟（秒）
+            jitter: 对数正态分布的 sigma，越大长尾越明显
+            concurrency: 同时处理的请求数
+            seed: 随机种子
+            hedge: 是否启用请求对冲（对冲等待下限按 latency 缩放）
+        """
+        super().__init__()
+        self.hedger = Hedger(min_delay=latency, budget=0.1 if hedge else 0, metrics=self.metrics)
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.requests = 0
+        self.characters = 0
+
+    def _delay(self) -> float:
+        if self.latency <= 0:
+            return 0.0
+        return self.latency * self.rng.lognormvariate(0, self.jitter)
+
+    async def _translate(self, text: str, source_lang: str, target_lang: str, **kwargs) -> str:
+        await asyncio.sleep(self._delay())
+        self.requests += 1
+        self.characters += len(text)
+        return self._replace_designation(text)
+
+    async def translate(
+        self, content: str, source_lang: str = "English", target_lang: str = "Chinese", **kwargs
+    ) -> str:
+        """跳过真实翻译器的重试与请求间隔，只保留并发限制和请求对冲"""
+
+        async def attempt():
+            async with self.semaphore:
+                return await self._translate(content, source_lang, target_lang, **kwargs)
+
+        return await self.hedger.run(attempt, attempt, tokens=len(content) // 4)
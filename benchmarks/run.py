@@ -0,0 +1,241 @@
+"""
+基准测试入口。
+
+用法:
+    python -m benchmarks.run run --scale 0.1 --output benchmarks/results/baseline.json
+    python -m benchmarks.run compare benchmarks/results/old.json benchmarks/results/new.json
+    python -m benchmarks.run startup --output benchmarks/results/startup.json
+
+结果以 JSON 保存，包含提交哈希和运行环境，便于在本地跨提交对比回归。
+"""
+
+import asyncio
+import gc
+import json
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import typer
+from typing_extensions import Annotated
+
+from benchmarks.corpus import SHAPES, generate_epub, scaled_shape
+from benchmarks.fake import FakeTranslator
+from epubot.services.coordinator import Coordinator
+from epubot.services.epub import EpubBuilder, EpubParser
+from epubot.services.html import HTMLBuilder, HTMLReplacer, HTMLSplitter
+
+app = typer.Typer(name="benchmarks", help="epubot 性能基准测试", no_args_is_help=True, add_completion=False)
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """重复执行 func 并返回耗时统计（秒）"""
+    timings: List[float] = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        "repeat": repeat,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def _documents(book) -> List[str]:
+    return [item.content for item in book.items if item.is_translatable and isinstance(item.content, str)]
+
+
+def bench_shape(epub_path: Path, workdir: Path, repeat: int, latency: float, hedge: bool = False) -> Dict[str, Dict]:
+    """对单个语料运行全部微基准和端到端基准"""
+    results: Dict[str, Dict] = {}
+
+    parser = EpubParser(str(epub_path))
+    results["EpubParser.parse"] = _measure(parser.parse, repeat)
+    book = parser.parse()
+    documents = _documents(book)
+    total_chars = sum(len(doc) for doc in documents)
+
+    replacers: List[HTMLReplacer] = []
+    replaced: List[str] = []
+
+    def replace():
+        replacers.clear()
+        replaced.clear()
+        for doc in documents:
+            replacer = HTMLReplacer()
+            replaced.append(replacer.replace(doc))
+            replacers.append(replacer)
+
+    results["HTMLReplacer.replace"] = _measure(replace, repeat)
+
+    def restore():
+        for replacer, doc in zip(replacers, replaced):
+            replacer.restore(doc)
+
+    results["HTMLReplacer.restore"] = _measure(restore, repeat)
+
+    splitter = HTMLSplitter()
+    chunk_count = 0
+
+    def split():
+        nonlocal chunk_count
+        chunk_count = sum(len(splitter.split(doc)) for doc in replaced)
+
+    results["HTMLSplitter.split"] = _measure(split, repeat)
+
+    html_builder = HTMLBuilder()
+    for item in book.items:
+        if item.is_translatable:
+            item.translated = html_builder.build(splitter.split(HTMLReplacer().replace(item.content)))
+    output = workdir / f"{epub_path.stem}-built.epub"
+    results["EpubBuilder.build"] = _measure(lambda: EpubBuilder(book, str(output)).build(), repeat)
+
+    concurrency = 8
+    translator = FakeTranslator(latency=latency, concurrency=concurrency, hedge=hedge)
+
+    def end_to_end():
+        coordinator = Coordinator(str(epub_path), output_file=str(workdir / f"{epub_path.stem}-e2e.epub"), enable_resume=False)
+        coordinator.translator = translator
+        coordinator.scheduler.concurrency = concurrency
+        asyncio.run(coordinator.process())
+
+    results["Coordinator.process"] = _measure(end_to_end, max(1, repeat // 3))
+    results["Coordinator.process"]["fake_requests"] = translator.requests
+    # 对比开启 --hedge 前后的请求延迟 p99 与额外 token
+    results["Coordinator.process"]["request_latency"] = translator.metrics.summary("request.latency_seconds")
+    results["Coordinator.process"]["hedge"] = translator.metrics.report().get("hedge", {})
+
+    results["corpus"] = {
+        "file_size": epub_path.stat().st_size,
+        "documents": len(documents),
+        "characters": total_chars,
+        "chunks": chunk_count,
+    }
+    return results
+
+
+@app.command()
+def run(
+    shapes: Annotated[Optional[List[str]], typer.Option("--shape", "-s", help="要运行的语料形态，可重复指定")] = None,
+    scale: Annotated[float, typer.Option(help="语料规模缩放比例")] = 1.0,
+    repeat: Annotated[int, typer.Option(help="每个微基准的重复次数")] = 5,
+    latency: Annotated[float, typer.Option(help="假翻译后端的中位延迟（秒）")] = 0.02,
+    seed: Annotated[int, typer.Option(help="语料随机种子")] = 42,
+    hedge: Annotated[bool, typer.Option(help="端到端基准中启用请求对冲")] = False,
+    output: Annotated[Optional[Path], typer.Option("--output", "-o", help="结果 JSON 路径")] = None,
+):
+    """生成合成语料并运行基准测试"""
+    shapes = shapes or list(SHAPES)
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"scale": scale, "repeat": repeat, "latency": latency, "seed": seed, "hedge": hedge},
+        "benchmarks": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="epubot-bench-") as tmp:
+        workdir = Path(tmp)
+        for name in shapes:
+            epub_path = generate_epub(workdir / f"{name}.epub", scaled_shape(name, scale), seed=seed)
+            typer.echo(f"运行基准: {name}")
+            report["benchmarks"][name] = bench_shape(epub_path, workdir, repeat, latency, hedge=hedge)
+
+    output = output or RESULTS_DIR / f"{commit or 'local'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    typer.echo(f"结果已写入: {output}")
+
+
+def _importtime(args: List[str]) -> Dict[str, object]:
+    """使用 python -X importtime 运行命令，返回总导入耗时和最重的模块（微秒）"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", *args], capture_output=True, text=True)
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        if match:
+            modules.append((match.group(4), int(match.group(1)), int(match.group(2)), len(match.group(3))))
+    top_level = [m for m in modules if m[3] == 1]
+    heaviest = sorted(top_level, key=lambda m: m[2], reverse=True)[:10]
+    return {
+        "total_us": sum(m[2] for m in top_level),
+        "modules": len(modules),
+        "heaviest": {name: cumulative for name, _, cumulative, _ in heaviest},
+    }
+
+
+@app.command()
+def startup(
+    repeat: Annotated[int, typer.Option(help="重复次数")] = 10,
+    output: Annotated[Optional[Path], typer.Option("--output", "-o", help="结果 JSON 路径")] = None,
+):
+    """测量 CLI 启动耗时（--help / --version）以及 -X importtime 导入开销"""
+    commands = {"help": ["-m", "epubot.main", "--help"], "version": ["-m", "epubot.main", "--version"]}
+    report = {"commit": _git_commit(), "timestamp": datetime.now(timezone.utc).isoformat(), "startup": {}}
+    for name, args in commands.items():
+
+        def invoke():
+            subprocess.run([sys.executable, *args], capture_output=True, check=True)
+
+        stats = _measure(invoke, repeat)
+        stats["importtime"] = _importtime(args)
+        report["startup"][name] = stats
+        typer.echo(
+            f"{name:>8}: 中位 {stats['median'] * 1000:.1f}ms, 导入 {stats['importtime']['total_us'] / 1000:.1f}ms"
+        )
+
+    if output:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        typer.echo(f"结果已写入: {output}")
+
+
+@app.command()
+def compare(
+    baseline: Path,
+    current: Path,
+    threshold: Annotated[float, typer.Option(help="中位耗时变化超过该比例视为回归")] = 0.1,
+):
+    """对比两次基准测试结果，中位耗时变慢超过阈值时以非零状态退出"""
+    old = json.loads(baseline.read_text(encoding="utf-8"))["benchmarks"]
+    new = json.loads(current.read_text(encoding="utf-8"))["benchmarks"]
+    regressions = 0
+    for shape, benches in new.items():
+        for name, stats in benches.items():
+            before = old.get(shape, {}).get(name, {}).get("median")
+            after = stats.get("median")
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before else 0.0
+            flag = ""
+            if change > threshold:
+                flag = "  <-- 回归"
+                regressions += 1
+            typer.echo(f"{shape:>14} {name:<24} {before * 1000:10.2f}ms -> {after * 1000:10.2f}ms {change:+7.1%}{flag}")
+    if regressions:
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    app()
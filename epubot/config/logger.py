@@ -1,7 +1,10 @@
+import atexit
 import logging
 import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
 
 import structlog
 from structlog.types import Processor
@@ -9,9 +12,23 @@ from structlog.types import Processor
 # Import settings after the package structure is defined
 from epubot.config.settings import settings
 
+_listener: Optional[QueueListener] = None
+
+
+def _stop_listener() -> None:
+    """停止后台日志线程，并写出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_stop_listener)
+
 
 def setup_logger():
     """配置结构化日志并返回一个logger实例"""
+    global _listener
 
     # 创建日志目录（如果不存在）
     log_dir = os.path.dirname(settings.LOG_FILE)
@@ -23,14 +40,17 @@ def setup_logger():
     root_logger.setLevel(settings.LOG_LEVEL)
 
     # 清除任何现有的处理器
+    _stop_listener()
     if root_logger.handlers:
         root_logger.handlers.clear()
 
+    handlers: list[logging.Handler] = []
+
     # 添加控制台处理器
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(settings.LOG_LEVEL)
     console_handler.setFormatter(logging.Formatter("%(message)s"))
-    root_logger.addHandler(console_handler)
+    handlers.append(console_handler)
 
     # 添加文件处理器（使用RotatingFileHandler以防日志文件过大）
     file_handler = RotatingFileHandler(
@@ -41,7 +61,17 @@ def setup_logger():
     )
     file_handler.setLevel(settings.LOG_LEVEL)
     file_handler.setFormatter(logging.Formatter("%(message)s"))
-    root_logger.addHandler(file_handler)
+    handlers.append(file_handler)
+
+    if settings.LOG_QUEUE:
+        # 日志记录只入队，实际的控制台和文件写入由后台线程完成，避免阻塞事件循环
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        root_logger.addHandler(QueueHandler(log_queue))
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+    else:
+        for handler in handlers:
+            root_logger.addHandler(handler)
 
     # 定义共享处理器
     shared_processors: list[Processor] = [
@@ -1,5 +1,5 @@
 import os
-from typing import Literal
+from typing import List, Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -19,17 +19,159 @@ class Settings(BaseSettings):
     LOG_FORMAT: Literal["json", "console"] = "json"
     LOG_FILE: str = "logs/epubot.log"
     LOG_RENDER_JSON_LOGS: bool = True
+    LOG_QUEUE: bool = True  # 通过 QueueHandler/QueueListener 在后台线程写日志，避免阻塞事件循环
 
     # LLM API Keys
     deepseek_api_key: str = os.getenv("DEEPSEEK_API_KEY", "YOUR_DEEPSEEK_API_KEY")
     deepseek_model: str = os.getenv("DEEPSEEK_MODEL", "deepseek-reasoner")
     mistral_api_key: str = os.getenv("MISTRAL_API_KEY", "YOUR_MISTRAL_API_KEY")
     mistral_model: str = os.getenv("MISTRAL_MODEL", "mistral-small-latest")
+    mistral_server_url: Optional[str] = os.getenv("MISTRAL_SERVER_URL")  # 例如本地模拟服务 http://127.0.0.1:8765
     kimi_api_key: str = os.getenv("KIMI_API_KEY", "YOUR_KIMI_API_KEY")
     kimi_base_url: str = os.getenv("KIMI_BASE_URL", "https://api.moonshot.cn/v1")
     kimi_model: str = os.getenv("KIMI_MODEL", "moonshot-v1-auto")
+    deepseek_base_url: str = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+    TRANSLATION_PROVIDER: Literal["mistral", "deepseek", "kimi"] = "mistral"
 
     OUTPUT_DIR: str = "output"
 
+    # 翻译调度设置
+    MAX_CONCURRENT_REQUESTS: int = 1  # 同时进行中的翻译请求数
+    REQUEST_INTERVAL: float = 3.0  # 相邻两次请求的最小间隔（秒）
+    ITEM_CONCURRENCY: int = 4  # 同时处理的文档数
+    SINGLEFLIGHT_CACHE_SIZE: int = 1024  # 本次运行内复用的已完成译文数量
+    # 调度策略：lpt（最长优先，缩短整本书的完成时间）、fifo（提交顺序）、
+    # chapter（前面的章节先完成）、fair（多本书按 token 公平分配）
+    SCHEDULER_POLICY: Literal["lpt", "fifo", "chapter", "fair"] = "lpt"
+    SCHEDULER_LATENCY_OVERHEAD: float = 2.0  # 延迟模型：每个请求的固定耗时（秒）
+    SCHEDULER_SECONDS_PER_TOKEN: float = 0.01  # 延迟模型：每 token 耗时（秒），有自动调整的统计时使用观测值
+
+    # 共享连接池：同一进程内所有翻译任务复用到各后端的连接
+    HTTP_POOL_SIZE: int = 20  # 每个后端的最大连接数（同时也是保持 keep-alive 的连接数）
+    HTTP_KEEPALIVE: float = 60.0  # 空闲连接保持的时间（秒）
+    HTTP_CONNECT_TIMEOUT: float = 10.0  # 建立连接（含 TLS 握手）的超时（秒）
+    HTTP_READ_TIMEOUT: float = 120.0  # 读取、写入的超时（秒）
+    HTTP_POOL_TIMEOUT: float = 30.0  # 等待连接池空闲连接的超时（秒）
+    HTTP2: bool = True  # 安装了 h2 时使用 HTTP/2（单个连接上多路复用）
+
+    STREAMING: bool = True  # 使用流式接口，边接收边校验并记录首 token 延迟
+    # 提示词模板：full（详细说明）或 compact（精简，每个请求节省数百个 token）；
+    # 模板名称和版本是分块调整统计等缓存键的一部分
+    PROMPT_TEMPLATE: Literal["full", "compact"] = "full"
+
+    # 请求对冲：请求超过最近延迟的分位数仍未返回时发送副本，先返回的有效结果胜出
+    HEDGE_ENABLED: bool = False
+    HEDGE_PERCENTILE: float = 0.95
+    HEDGE_MIN_SAMPLES: int = 20  # 延迟样本少于该数量时不对冲
+    HEDGE_MIN_DELAY: float = 1.0  # 对冲等待时间下限（秒）
+    HEDGE_BUDGET: float = 0.1  # 对冲请求数占总请求数的上限
+    HEDGE_PROVIDER: Optional[Literal["mistral", "deepseek", "kimi"]] = None  # 对冲请求发往的后端，默认与主请求相同
+
+    # 模型级联：分块先交给快速、便宜的模型，未通过结构校验或质量检查的分块再升级到更强的模型
+    CASCADE_ENABLED: bool = False
+    CASCADE_TIERS: List[str] = ["mistral:mistral-small-latest", "deepseek"]  # “后端[:模型]”，从便宜到强排列
+    CASCADE_COMPLEX_MARKUP_RATIO: float = 0.5  # 标签和占位符数 / 单词数超过该值的分块直接使用最强的模型
+
+    # 分块大小自动调整：按后端（可选再按内容类型）根据最近的延迟、输出比例和失败率选择分块的 token 上限
+    CHUNK_TOKENS: int = 6000  # 默认的分块 token 上限
+    CHUNK_AUTO_TUNE: bool = False
+    CHUNK_TUNE_BY_CONTENT: bool = False  # 标签密集的内容与普通正文分别调整
+    CHUNK_TUNING_FILE: str = ".chunk_tuning.json"  # 跨运行保存的统计
+    CHUNK_MIN_TOKENS: int = 1000
+    CHUNK_MAX_TOKENS: int = 12000
+    CHUNK_MAX_OUTPUT_TOKENS: int = 8192  # 模型单次输出的 token 上限
+    CHUNK_TARGET_LATENCY: float = 60.0  # 单个请求的目标耗时（秒）
+    CHUNK_MAX_FAILURE_RATE: float = 0.1  # 失败率超过该值时缩小分块
+    CHUNK_TUNE_MIN_SAMPLES: int = 5  # 每积累多少个新样本调整一次
+
+    # 截止时间调度（--deadline）：预计无法按时完成时依次提高并发、改用更快的模型、增大分块
+    DEADLINE_MAX_CONCURRENCY: int = 4  # 可提高到的并发请求数上限
+    DEADLINE_FAST_TIER: Optional[str] = None  # 改用的更快后端，“后端[:模型]”；为空时不切换
+    DEADLINE_MAX_CHUNK_TOKENS: int = 12000  # 增大分块时的 token 上限
+    DEADLINE_BUILD_RESERVE: float = 30.0  # 为构建输出文件预留的时间（秒）
+    DEADLINE_CHECK_INTERVAL: float = 5.0  # 预测完成时间的间隔（秒）
+    DEADLINE_COOLDOWN: float = 30.0  # 两次调整之间至少观察的时间（秒）
+    DEADLINE_UNTRANSLATED_NOTICE: str = "（截止时间前未能完成翻译，以下为原文。）"  # 未翻译部分开头的提示，为空时不显示
+
+    # 译文质量检查（用于级联升级）
+    QUALITY_MIN_CHARS: int = 40  # 原文字母数少于该值时不检查
+    QUALITY_MAX_UNTRANSLATED: float = 0.5  # 原文单词原样出现在译文中的比例上限
+    QUALITY_MIN_LENGTH_RATIO: float = 0.15  # 译文/原文文字长度比例下限
+    QUALITY_MAX_LENGTH_RATIO: float = 3.0  # 译文/原文文字长度比例上限
+    QUALITY_MIN_TARGET_SCRIPT: float = 0.3  # 目标语言文字（如中文汉字）在译文文字中的最低占比
+
+    # 跳过不需要翻译的分块（图片页、页码列表、代码清单、已是目标语言的文本），原样保留
+    SKIP_ENABLED: bool = True
+    SKIP_MIN_LETTERS: int = 40  # 字母少于该值时不做语言识别和代码判断
+    SKIP_SAMPLE_CHARS: int = 2000  # 语言识别只看每个段落的前若干个字符
+    SKIP_CODE_RATIO: float = 0.12  # 代码符号在非空白字符中的占比超过该值视为代码
+
+    # 审校：只审校本地信号异常（长度比例、未翻译比例、结构接近失败、术语未使用）或随机抽中的分块，
+    # 与其他分块的翻译并发进行
+    REVIEW_ENABLED: bool = False
+    REVIEW_SAMPLE_RATE: float = 0.02  # 没有异常信号的分块被随机抽中审校的比例
+    REVIEW_MIN_LENGTH_RATIO: float = 0.3  # 译文/原文文字长度比例下限（比质量检查严格）
+    REVIEW_MAX_LENGTH_RATIO: float = 2.0  # 译文/原文文字长度比例上限
+    REVIEW_MAX_UNTRANSLATED: float = 0.2  # 原文单词原样出现在译文中的比例上限
+    REVIEW_NEAR_MISS_MARGIN: float = 0.15  # token 比例高于截断阈值不到该值时视为接近失败
+    REVIEW_SEED: Optional[int] = None  # 随机抽样的种子，便于复现
+
+    # 术语表：编译为 Aho-Corasick 自动机，每个分块只在提示词中放入其中出现的术语，译文再统一替换其他译法
+    GLOSSARY_FILE: Optional[str] = None  # .json/.csv/.tsv，为空时只使用固定替换项
+    GLOSSARY_CACHE_DIR: str = "~/.cache/epubot/glossary"  # 编译结果缓存目录
+    GLOSSARY_MAX_TERMS: int = 50  # 每个分块提示词中的术语数上限
+
+    # 译文结构校验
+    VALIDATION_ENABLED: bool = True
+    VALIDATION_RETRIES: int = 1  # 校验失败的分块单独重发的次数，之后对半拆分
+    VALIDATION_MAX_SPLIT_DEPTH: int = 3  # 最多拆分层数，仍失败时保留原文
+    VALIDATION_MIN_TOKEN_RATIO: float = 0.3  # 译文/原文 token 数低于该比例视为截断
+    VALIDATION_MIN_TOKENS: int = 200  # 原文少于该 token 数时不做比例检查
+
+    # 分词器设置
+    TOKENIZER_ENCODING: str = "cl100k_base"
+    TIKTOKEN_CACHE_DIR: str = "~/.cache/epubot/tiktoken"  # 预置 BPE 文件后可完全离线运行
+    TOKENIZER_FALLBACK: bool = True  # 无缓存且无法联网时使用近似分词器
+    TOKENIZER_OFFLINE: bool = False  # 为真时缓存缺失也不尝试下载
+
+    # 预处理缓存：按文档内容和替换、分块配置缓存占位符表、替换后的文档和分块表，重跑时跳过解析和分词
+    ARTIFACT_CACHE_ENABLED: bool = True
+    ARTIFACT_CACHE_DIR: str = "~/.cache/epubot/artifacts"
+    ARTIFACT_CACHE_MAX_MB: int = 1024  # 缓存目录的大小上限（MB），超出时淘汰最久未使用的文件，0 表示不限
+
+    # 低内存模式：翻译完成的文档暂存到磁盘，构建时流式读取
+    SPOOL_ENABLED: bool = False
+    SPOOL_DIR: Optional[str] = None  # 暂存目录，默认使用系统临时目录
+    SPOOL_MEMORY_BUDGET_MB: int = 256  # 同时处理中的文档工作集上限（MB）
+
+    # 渐进输出：翻译过程中按间隔原子地更新输出文件，已完成的章节可以先校对
+    PROGRESSIVE_INTERVAL: float = 0.0  # 更新间隔（秒），0 表示只在全部完成后输出
+    PROGRESSIVE_PENDING: Literal["source", "notice"] = "source"  # 未完成的章节保留原文或显示提示
+    PROGRESSIVE_NOTICE: str = "本章正在翻译中，稍后更新。"
+
+    # 录制与模拟服务：录制真实后端的请求、响应和耗时，本地模拟服务据此重放延迟并模拟限流和故障
+    CASSETTE_RECORD: Optional[str] = None  # 录制文件（JSONL），为空时不录制
+    MOCK_HOST: str = "127.0.0.1"
+    MOCK_PORT: int = 8765
+    MOCK_RPM: int = 60  # 每分钟请求数上限，超过时返回 429
+    MOCK_TPM: int = 500000  # 每分钟 token 数上限（输入 + 预计输出），超过时返回 429
+    MOCK_LATENCY: float = 1.0  # 没有录制数据时每个请求的耗时（秒）
+    MOCK_TIME_SCALE: float = 1.0  # 延迟的缩放比例，小于 1 时加速重放
+    MOCK_ERROR_RATE: float = 0.0  # 返回 500 的比例
+    MOCK_TIMEOUT_RATE: float = 0.0  # 挂起不响应的比例
+    MOCK_DISCONNECT_RATE: float = 0.0  # 响应中途断开连接的比例
+    MOCK_TRUNCATE_RATE: float = 0.0  # 输出截断（finish_reason=length）的比例
+
+    # 事件循环设置
+    IO_WORKERS: int = 4  # 执行阻塞 I/O（zip 读写、HTML 解析、状态保存）的线程数
+    LOOP_LAG_INTERVAL: float = 0.1  # 事件循环延迟采样间隔（秒）
+    LOOP_LAG_WARN_THRESHOLD: float = 0.2  # 事件循环被阻塞超过该时长（秒）时输出警告
+
+    # 性能分析设置
+    PROFILE_DIR: str = "profiles"
+    PROFILE_SAMPLE_RATE: float = 0.0  # 未指定 --profile 时，按该比例随机对任务开启性能分析
+    PROFILE_SAMPLE_INTERVAL: float = 0.005  # 栈采样间隔（秒）
+    PROFILE_CPU: bool = True  # 是否启用 cProfile（开销高于栈采样）
+
 
 settings = Settings()
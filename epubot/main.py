@@ -1,5 +1,7 @@
 import asyncio
 import os
+import random
+import time
 from pathlib import Path
 from typing import Optional
 
@@ -8,7 +10,10 @@ from typing_extensions import Annotated
 
 from epubot.config.logger import logger
 from epubot.config.settings import settings
-from epubot.services.coordinator import Coordinator
+from epubot.services.profiler import Profiler
+
+# 注意: Coordinator 依赖 mistralai、ebooklib、bs4、lxml、tiktoken 等重量级模块，
+# 只在真正执行翻译时导入，保证 --help / --version 等命令快速启动
 
 # 创建 Typer 应用
 app = typer.Typer(name="epubot", help="EPUB 自动翻译工具", no_args_is_help=True, add_completion=False)
@@ -32,7 +37,7 @@ InputEpubPath = Annotated[
 ]
 
 TargetLang = Annotated[
-    str, typer.Option("--target-lang", "-t", help="目标语言代码 (例如: zh, fr, es)", show_default=True)
+    str, typer.Option("--target-lang", "-t", help="目标语言代码，多个语言用逗号分隔 (例如: zh 或 zh,ja,fr)", show_default=True)
 ]
 
 OutputFile = Annotated[
@@ -52,8 +57,148 @@ OutputDir = Annotated[
     ),
 ]
 
+Profile = Annotated[
+    bool,
+    typer.Option(
+        "--profile",
+        help="按阶段收集性能数据（pstats、火焰图折叠栈、事件循环延迟和内存峰值）",
+        show_default=False,
+    ),
+]
+
+ProfileDir = Annotated[str, typer.Option("--profile-dir", help="性能分析结果保存目录", show_default=True)]
+
+Spool = Annotated[
+    bool,
+    typer.Option("--spool/--no-spool", help="低内存模式：文档暂存到磁盘，构建时流式读取", show_default=True),
+]
+
+MemoryBudget = Annotated[
+    int, typer.Option("--memory-budget", help="低内存模式下同时处理的文档工作集上限（MB）", show_default=True)
+]
+
+Deadline = Annotated[
+    Optional[str],
+    typer.Option(
+        "--deadline",
+        help="截止时间：时长（如 3600、90m、1h30m）或当天时刻（如 18:00）。预计超时时自动调整调度，"
+        "到时仍未翻译的部分保留原文并标记",
+        show_default=False,
+    ),
+]
+
+Progressive = Annotated[
+    float,
+    typer.Option(
+        "--progressive",
+        help="渐进输出：每隔指定秒数更新输出文件，已完成的章节使用译文（0 表示只在全部完成后输出）",
+        show_default=True,
+    ),
+]
+
+Record = Annotated[
+    Optional[str],
+    typer.Option(
+        "--record",
+        help="把发往翻译后端的请求、响应和耗时录制到指定文件（JSONL），供 mock-server 重放",
+        show_default=False,
+    ),
+]
+
+Glossary = Annotated[
+    Optional[str],
+    typer.Option(
+        "--glossary",
+        "-g",
+        help="术语表文件（.json/.csv/.tsv）：分块中出现的术语放入提示词，译文统一替换其他译法",
+        show_default=False,
+    ),
+]
+
+PromptName = Annotated[
+    str,
+    typer.Option(
+        "--prompt",
+        help="提示词模板：full（详细说明）或 compact（精简，减少每个请求的提示词开销）",
+        show_default=True,
+    ),
+]
+
+Review = Annotated[
+    bool,
+    typer.Option(
+        "--review/--no-review",
+        help="审校本地检查异常的分块和随机抽样的分块（抽样比例由 REVIEW_SAMPLE_RATE 设置）",
+        show_default=True,
+    ),
+]
+
+SchedulePolicy = Annotated[
+    str,
+    typer.Option(
+        "--schedule",
+        help="分块调度策略：lpt（最长优先）、fifo（提交顺序）、chapter（前面的章节先完成）、fair（多本书公平分配）",
+        show_default=True,
+    ),
+]
+
+POLICY_NAMES = ("lpt", "fifo", "chapter", "fair")
+
+
+def _validate_policy(policy: str) -> str:
+    if policy not in POLICY_NAMES:
+        typer.echo(f"错误: 未知的调度策略 '{policy}'，可选: {', '.join(POLICY_NAMES)}。", err=True)
+        raise typer.Exit(1)
+    return policy
+
+
+PROMPT_NAMES = ("full", "compact")
 
-async def _translate_async(input_epub: str | Path, target_lang: str, output_file: Optional[str], output_dir: str):
+
+def _validate_prompt(name: str) -> str:
+    if name not in PROMPT_NAMES:
+        typer.echo(f"错误: 未知的提示词模板 '{name}'，可选: {', '.join(PROMPT_NAMES)}。", err=True)
+        raise typer.Exit(1)
+    return name
+
+
+def _parse_deadline(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    from epubot.services.deadline import parse_deadline
+
+    try:
+        return parse_deadline(value)
+    except ValueError:
+        typer.echo(f"错误: 无法解析截止时间 '{value}'。", err=True)
+        raise typer.Exit(1)
+
+
+def _create_profiler(input_epub: str | Path, profile: bool, profile_dir: str) -> Profiler:
+    """根据 --profile 或 PROFILE_SAMPLE_RATE 采样比例创建性能分析器"""
+    enabled = profile or random.random() < settings.PROFILE_SAMPLE_RATE
+    run_dir = os.path.join(profile_dir, f"{Path(input_epub).stem}-{time.strftime('%Y%m%d-%H%M%S')}")
+    return Profiler(
+        run_dir,
+        enabled=enabled,
+        cpu=settings.PROFILE_CPU,
+        sample_interval=settings.PROFILE_SAMPLE_INTERVAL,
+    )
+
+
+async def _translate_async(
+    input_epub: str | Path,
+    target_lang: str,
+    output_file: Optional[str],
+    output_dir: str,
+    profiler: Optional[Profiler] = None,
+    spool: bool = False,
+    memory_budget: Optional[int] = None,
+    deadline: Optional[float] = None,
+    policy: Optional[str] = None,
+    progressive: Optional[float] = None,
+    batch_results: Optional[str] = None,
+):
     """异步执行翻译任务"""
     logger.info(
         "开始翻译", input_epub=str(input_epub), target_lang=target_lang, output_file=output_file, output_dir=output_dir
@@ -62,9 +207,30 @@ async def _translate_async(input_epub: str | Path, target_lang: str, output_file
     # 创建输出目录（如果不存在）
     if output_file is None and not os.path.exists(output_dir):
         os.makedirs(output_dir, exist_ok=True)
+    if output_file is None:
+        # 每个目标语言一个输出文件，{lang} 由 Coordinator 替换为语言代码
+        output_file = os.path.join(output_dir, f"{Path(input_epub).stem}-{{lang}}.epub")
+
+    from epubot.services.clients import close_clients
+    from epubot.services.coordinator import Coordinator
 
-    coordinator = Coordinator(str(input_epub))
-    await coordinator.process()
+    coordinator = Coordinator(
+        str(input_epub),
+        target_lang=target_lang,
+        output_file=output_file,
+        profiler=profiler,
+        spool=spool,
+        memory_budget_mb=memory_budget,
+        deadline=deadline,
+        policy=policy,
+        progressive=progressive,
+        batch_results=batch_results,
+    )
+    try:
+        await coordinator.process()
+    finally:
+        # 连接池在进程内共享，由最外层在退出前关闭
+        await close_clients()
 
 
 @app.command()
@@ -73,20 +239,231 @@ def translate(
     target_lang: TargetLang = "zh",
     output_file: OutputFile = None,
     output_dir: OutputDir = settings.OUTPUT_DIR,
+    profile: Profile = False,
+    profile_dir: ProfileDir = settings.PROFILE_DIR,
+    spool: Spool = settings.SPOOL_ENABLED,
+    memory_budget: MemoryBudget = settings.SPOOL_MEMORY_BUDGET_MB,
+    deadline: Deadline = None,
+    schedule: SchedulePolicy = settings.SCHEDULER_POLICY,
+    progressive: Progressive = settings.PROGRESSIVE_INTERVAL,
+    record: Record = settings.CASSETTE_RECORD,
+    glossary: Glossary = settings.GLOSSARY_FILE,
+    review: Review = settings.REVIEW_ENABLED,
+    prompt: PromptName = settings.PROMPT_TEMPLATE,
 ):
     """翻译 EPUB 文件到指定语言"""
+    deadline_seconds = _parse_deadline(deadline)
+    _validate_policy(schedule)
+    if glossary:
+        validate_input_file(glossary)
+    # 后端实例和术语表在首次使用时创建，此时读取录制和术语表设置
+    settings.CASSETTE_RECORD = record
+    settings.GLOSSARY_FILE = glossary
+    settings.REVIEW_ENABLED = review
+    settings.PROMPT_TEMPLATE = _validate_prompt(prompt)
+    profiler = _create_profiler(input_epub, profile, profile_dir)
     # 在同步函数中运行异步代码
-    asyncio.run(_translate_async(input_epub, target_lang, output_file, output_dir))
+    asyncio.run(
+        _translate_async(
+            input_epub,
+            target_lang,
+            output_file,
+            output_dir,
+            profiler,
+            spool,
+            memory_budget,
+            deadline_seconds,
+            schedule,
+            progressive,
+        )
+    )
+    if profiler.enabled:
+        typer.echo(f"性能分析结果: {profiler.output_dir}")
+
+
+@app.command()
+def simulate(
+    input_epub: InputEpubPath,
+    concurrency: Annotated[int, typer.Option("--concurrency", "-c", help="并发请求数")] = settings.MAX_CONCURRENT_REQUESTS,
+    interval: Annotated[float, typer.Option("--interval", help="相邻请求的最小间隔（秒）")] = settings.REQUEST_INTERVAL,
+):
+    """按延迟模型模拟各调度策略翻译整本书的预计耗时（不发送请求）"""
+    from epubot.services.coordinator import Coordinator
+    from epubot.services.policies import POLICIES, LatencyModel, get_policy
+    from epubot.services.policies import simulate as simulate_policy
+    from epubot.services.scheduler import Job
+
+    # 与翻译使用相同的标题表和分块上限预处理，共用预处理缓存，已翻译或模拟过的书不再重新分词
+    coordinator = Coordinator(str(input_epub), enable_resume=False, progressive=0)
+    book = coordinator.epub_parser.parse()
+    prepared = asyncio.run(coordinator.prepare_book(book))
+    spine = [entry[0] if isinstance(entry, tuple) else entry for entry in book.book.spine]
+    jobs = []
+    for item, chunks in prepared:
+        document = spine.index(item.id) if item.id in spine else len(spine)
+        for chunk in chunks:
+            tokens = chunk.tokens or 0
+            jobs.append(Job(key="", content="", placeholders=[], tokens=tokens, seq=len(jobs), document=document))
+
+    model = LatencyModel(settings.SCHEDULER_LATENCY_OVERHEAD, settings.SCHEDULER_SECONDS_PER_TOKEN)
+    typer.echo(f"{len(jobs)} 个分块，{sum(job.tokens for job in jobs)} 个 token，并发 {concurrency}，间隔 {interval} 秒")
+    for name in POLICIES:
+        result = simulate_policy(jobs, get_policy(name, model), concurrency, interval)
+        typer.echo(f"{name:8} 预计完成: {result['makespan']:>10.1f} 秒  首个文档完成: {result['first_document']:>10.1f} 秒")
+
+
+batch_app = typer.Typer(help="批量接口：导出待翻译分块的请求文件，导入批量结果并构建 EPUB", no_args_is_help=True)
+app.add_typer(batch_app, name="batch")
+
+BATCH_FORMATS = ("mistral", "openai")
+
+
+@batch_app.command("export")
+def batch_export(
+    input_epub: InputEpubPath,
+    output: Annotated[
+        Optional[str],
+        typer.Option("--output", "-o", help="请求文件路径（默认为 <书名>.batch.jsonl）", show_default=False),
+    ] = None,
+    target_lang: TargetLang = "zh",
+    fmt: Annotated[str, typer.Option("--format", help="请求文件格式：mistral 或 openai")] = "mistral",
+    glossary: Glossary = settings.GLOSSARY_FILE,
+    prompt: PromptName = settings.PROMPT_TEMPLATE,
+):
+    """导出全部待翻译分块（不发送请求），提交到批量接口后用 batch import 导入结果"""
+    if fmt not in BATCH_FORMATS:
+        typer.echo(f"错误: 未知的请求文件格式 '{fmt}'，可选: {', '.join(BATCH_FORMATS)}。", err=True)
+        raise typer.Exit(1)
+    if glossary:
+        validate_input_file(glossary)
+    # 导入时必须使用相同的提示词模板和术语表，请求 ID 和消息才能对应
+    settings.GLOSSARY_FILE = glossary
+    settings.PROMPT_TEMPLATE = _validate_prompt(prompt)
+    output = output or str(Path(input_epub).with_suffix(".batch.jsonl"))
+
+    from epubot.services.coordinator import Coordinator
+
+    coordinator = Coordinator(str(input_epub), target_lang=target_lang, progressive=0)
+    count = asyncio.run(coordinator.export_batch(output, fmt))
+    typer.echo(f"{count} 个请求（{int(coordinator.metrics.get('scheduler.chunks'))} 个分块），请求文件: {output}")
+
+
+@batch_app.command("import")
+def batch_import(
+    input_epub: InputEpubPath,
+    results: Annotated[str, typer.Argument(help="批量接口的结果文件（JSONL）", show_default=False)],
+    target_lang: TargetLang = "zh",
+    output_file: OutputFile = None,
+    output_dir: OutputDir = settings.OUTPUT_DIR,
+    glossary: Glossary = settings.GLOSSARY_FILE,
+    prompt: PromptName = settings.PROMPT_TEMPLATE,
+):
+    """导入批量结果并构建 EPUB：通过校验的结果直接使用，失败或缺失的分块重新交互翻译"""
+    validate_input_file(results)
+    if glossary:
+        validate_input_file(glossary)
+    settings.GLOSSARY_FILE = glossary
+    settings.PROMPT_TEMPLATE = _validate_prompt(prompt)
+    asyncio.run(_translate_async(input_epub, target_lang, output_file, output_dir, batch_results=results))
+
+
+@app.command("mock-server")
+def mock_server(
+    cassette: Annotated[
+        Optional[str],
+        typer.Option("--cassette", help="--record 录制的文件，重放其中的响应和延迟分布", show_default=False),
+    ] = None,
+    host: Annotated[str, typer.Option("--host", help="监听地址")] = settings.MOCK_HOST,
+    port: Annotated[int, typer.Option("--port", "-p", help="监听端口")] = settings.MOCK_PORT,
+    rpm: Annotated[int, typer.Option("--rpm", help="每分钟请求数上限（0 表示不限制）")] = settings.MOCK_RPM,
+    tpm: Annotated[int, typer.Option("--tpm", help="每分钟 token 数上限（0 表示不限制）")] = settings.MOCK_TPM,
+    latency: Annotated[float, typer.Option("--latency", help="没有录制数据时每个请求的耗时（秒）")] = settings.MOCK_LATENCY,
+    time_scale: Annotated[float, typer.Option("--time-scale", help="延迟缩放比例")] = settings.MOCK_TIME_SCALE,
+    error_rate: Annotated[float, typer.Option("--error-rate", help="返回 500 的比例")] = settings.MOCK_ERROR_RATE,
+    timeout_rate: Annotated[float, typer.Option("--timeout-rate", help="挂起不响应的比例")] = settings.MOCK_TIMEOUT_RATE,
+    disconnect_rate: Annotated[
+        float, typer.Option("--disconnect-rate", help="响应中途断开连接的比例")
+    ] = settings.MOCK_DISCONNECT_RATE,
+    truncate_rate: Annotated[
+        float, typer.Option("--truncate-rate", help="输出截断（finish_reason=length）的比例")
+    ] = settings.MOCK_TRUNCATE_RATE,
+    seed: Annotated[Optional[int], typer.Option("--seed", help="故障注入的随机种子", show_default=False)] = None,
+):
+    """启动本地模拟的 Mistral chat-completions 服务，用于离线压测重试、限流和并发设置"""
+    from epubot.services.cassette import Cassette
+    from epubot.services.mockserver import Faults, MockServer
+
+    if cassette:
+        validate_input_file(cassette)
+    server = MockServer(
+        host,
+        port,
+        cassette=Cassette(cassette) if cassette else None,
+        rpm=rpm,
+        tpm=tpm,
+        latency=latency,
+        time_scale=time_scale,
+        faults=Faults(error_rate, timeout_rate, disconnect_rate, truncate_rate),
+        seed=seed,
+    )
+    typer.echo(f"模拟服务: http://{host}:{port}  （设置 MISTRAL_SERVER_URL=http://{host}:{port} 后运行 translate）")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    typer.echo(f"请求统计: {dict(server.stats)}")
+
+
+@app.command("compile-glossary")
+def compile_glossary(glossary: Annotated[str, typer.Argument(help="术语表文件（.json/.csv/.tsv）")]):
+    """编译术语表并写入缓存，之后的翻译直接加载编译结果"""
+    from epubot.services.glossary import cache_path
+    from epubot.services.glossary import compile_glossary as compile_terms
+
+    validate_input_file(glossary)
+    started = time.monotonic()
+    try:
+        compiled = compile_terms(glossary)
+    except (ValueError, KeyError) as e:
+        typer.echo(f"错误: 无法读取术语表 '{glossary}': {e}", err=True)
+        raise typer.Exit(1)
+    typer.echo(f"{len(compiled)} 个术语，耗时 {time.monotonic() - started:.2f} 秒，缓存: {cache_path(glossary)}")
+
+
+@app.command("prepare-tokenizer")
+def prepare_tokenizer(
+    source: Annotated[
+        Optional[str],
+        typer.Option("--from", "-f", help="本地 .tiktoken 文件路径，不指定时联网下载", show_default=False),
+    ] = None,
+    encoding: Annotated[str, typer.Option("--encoding", "-e", help="分词器编码名称")] = settings.TOKENIZER_ENCODING,
+):
+    """预置本地分词器缓存，之后无需联网即可运行"""
+    from epubot.services.html.tokenizer import cache_path, get_encoding, seed_cache
+
+    if source:
+        validate_input_file(source)
+        seed_cache(source, encoding)
+    get_encoding.cache_clear()
+    try:
+        get_encoding(encoding, fallback=False)
+    except Exception as e:
+        typer.echo(f"错误: 无法加载分词器 '{encoding}': {e}", err=True)
+        raise typer.Exit(1)
+    typer.echo(f"分词器缓存已就绪: {cache_path(encoding)}")
 
 
 # 添加版本信息
-@app.callback()
+@app.callback(invoke_without_command=True)
 def version_callback(epubot_version: bool = typer.Option(None, "--version", "-v", is_eager=True)):
     """显示版本信息"""
     if epubot_version:
-        from importlib.metadata import version
+        from importlib.metadata import PackageNotFoundError, version
 
-        typer.echo(f"epubot v{version('epubot')}")
+        try:
+            typer.echo(f"epubot v{version('epubot')}")
+        except PackageNotFoundError:
+            typer.echo("epubot (未安装，无法获取版本号)")
         raise typer.Exit()
 
 
@@ -22,11 +22,15 @@ class EpubItem(BaseModel):
     manifest: bool
     item_type: int
     is_translatable: bool = False
+    # 导航文档（nav.xhtml）或 NCX：由标题表处理，不作为正文翻译
+    is_navigation: bool = False
 
     def __init__(self, **data):
         super().__init__(**data)
         if self.item_type in (ebooklib.ITEM_DOCUMENT, ebooklib.ITEM_NAVIGATION):
             self.is_translatable = True
+        if self.item_type == ebooklib.ITEM_NAVIGATION:
+            self.is_navigation = True
 
 
 class EpubBook(BaseModel):
@@ -0,0 +1,244 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from epubot.config.logger import logger
+from epubot.schemas.chunk import Chunk
+from epubot.services.html import HTMLReplacer, HTMLSplitter
+from epubot.services.metrics import RunMetrics
+
+# 文件格式或替换、分块算法变化时递增，旧缓存自动失效
+ARTIFACT_VERSION = 1
+MAGIC = b"EPBA"
+# 魔数、版本、字符串数、占位符数、标题占位符数、分块数
+HEADER = struct.Struct("<4sIIIII")
+# 影响替换结果的替换器配置
+REPLACER_CONFIG = f"{HTMLReplacer().parser}|{','.join(sorted(HTMLReplacer.IGNORE_TAGS | HTMLReplacer.HEADING_TAGS))}"
+
+
+@dataclass
+class Prepared:
+    """
+    一个文档的预处理结果：占位符替换后的文档、占位符表和分块表（含 token 数）。
+    字符串依次为：文档、占位符（键、值交替）、标题占位符（键、值交替）、分块（id、内容交替）。
+    """
+
+    content: str
+    placeholders: Dict[str, str]
+    title_holders: Dict[str, str]
+    chunks: List[Tuple[str, str, int]]  # (id, 内容, token 数)
+
+    @classmethod
+    def from_replacer(cls, content: str, replacer: HTMLReplacer, chunks: List[Chunk]) -> "Prepared":
+        return cls(
+            content=content,
+            placeholders=dict(replacer.placeholder.placer_map),
+            title_holders=dict(replacer.title_holders),
+            chunks=[(chunk.id, chunk.content, chunk.tokens or 0) for chunk in chunks],
+        )
+
+    def replacer(self, titles=None) -> HTMLReplacer:
+        """重建可以还原占位符的 HTMLReplacer"""
+        replacer = HTMLReplacer(titles=titles)
+        replacer.placeholder.placer_map = dict(self.placeholders)
+        replacer.placeholder.generated = {holder[1:-1] for holder in self.placeholders}
+        replacer.title_holders = dict(self.title_holders)
+        return replacer
+
+    def to_chunks(self, file_id: str = "") -> List[Chunk]:
+        return [Chunk(id=cid, file_id=file_id, content=content, tokens=tokens) for cid, content, tokens in self.chunks]
+
+    def dumps(self) -> bytes:
+        strings = [self.content]
+        for mapping in (self.placeholders, self.title_holders):
+            for key, value in mapping.items():
+                strings += [key, value]
+        for cid, content, _ in self.chunks:
+            strings += [cid, content]
+        blobs = [s.encode("utf-8") for s in strings]
+        offsets = [0]
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        header = HEADER.pack(
+            MAGIC, ARTIFACT_VERSION, len(strings), len(self.placeholders), len(self.title_holders), len(self.chunks)
+        )
+        return b"".join(
+            [
+                header,
+                struct.pack(f"<{len(offsets)}Q", *offsets),
+                struct.pack(f"<{len(self.chunks)}I", *(tokens for _, _, tokens in self.chunks)),
+                *blobs,
+            ]
+        )
+
+    @classmethod
+    def loads(cls, buffer) -> "Prepared":
+        """从 bytes 或 mmap 读取：偏移表和 token 表直接在缓冲区上解释，字符串从缓冲区切片解码，不复制整个文件"""
+        view = memoryview(buffer)
+        try:
+            magic, version, count, placeholders, titles, chunks = HEADER.unpack_from(view)
+            if magic != MAGIC or version != ARTIFACT_VERSION:
+                raise ValueError("artifact format mismatch")
+            position = HEADER.size
+            offsets = view[position : position + (count + 1) * 8].cast("Q")
+            position += (count + 1) * 8
+            tokens = view[position : position + chunks * 4].cast("I")
+            base = position + chunks * 4
+            strings = [str(view[base + offsets[i] : base + offsets[i + 1]], "utf-8") for i in range(count)]
+            token_counts = tokens.tolist()
+            offsets.release()
+            tokens.release()
+        finally:
+            view.release()
+
+        pairs = iter(strings[1:])
+        placeholder_map = {key: next(pairs) for key in _take(pairs, placeholders)}
+        title_holders = {key: next(pairs) for key in _take(pairs, titles)}
+        chunk_table = [(cid, next(pairs), token_counts[i]) for i, cid in enumerate(_take(pairs, chunks))]
+        return cls(strings[0], placeholder_map, title_holders, chunk_table)
+
+
+def _take(iterator, count: int):
+    for _ in range(count):
+        yield next(iterator)
+
+
+def artifact_key(content: str, chunk_tokens: int, encoding: str, titles: str = "") -> str:
+    """
+    缓存键：文档内容、分块 token 上限、分词器、替换器配置和标题表（正文标题的替换取决于标题表）的哈希
+    """
+    config = f"v{ARTIFACT_VERSION}|{chunk_tokens}|{encoding}|{REPLACER_CONFIG}|{titles}"
+    digest = hashlib.sha256(config.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(content.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """
+    以内容寻址的预处理结果缓存：每个文档一个紧凑的二进制文件，以缓存键命名。
+    读取时 mmap 文件，重跑和续传时跳过 BeautifulSoup 解析、占位符替换和逐字符的分词。
+    设置 max_bytes 时，写入后总大小超过上限则按最近使用时间（命中时更新文件的修改时间）淘汰最旧的文件。
+    """
+
+    # 淘汰到上限的该比例以下，留出余量，避免之后每次写入都扫描目录
+    PRUNE_RATIO = 0.9
+
+    def __init__(self, directory: str, max_bytes: Optional[int] = None, metrics: Optional[RunMetrics] = None):
+        self.directory = Path(os.path.expanduser(directory))
+        self.max_bytes = max_bytes
+        self.metrics = metrics or RunMetrics()
+        self._size: Optional[int] = None  # 缓存文件的总大小，首次写入时统计
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.bin"
+
+    def get(self, key: str) -> Optional[Prepared]:
+        path = self._path(key)
+        started = time.perf_counter()
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                prepared = Prepared.loads(mapped)
+        except FileNotFoundError:
+            self.metrics.incr("artifacts.misses")
+            return None
+        except Exception as e:
+            # 空文件无法 mmap，截断或格式不符的文件同样视为未命中
+            self.metrics.incr("artifacts.misses")
+            logger.warning("Ignoring unreadable artifact", path=str(path), error=str(e))
+            return None
+        self.metrics.incr("artifacts.hits")
+        self.metrics.observe("artifacts.load_seconds", time.perf_counter() - started)
+        if self.max_bytes:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return prepared
+
+    def put(self, key: str, prepared: Prepared) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = prepared.dumps()
+        # 先写临时文件再替换，并发或中断时不会留下不完整的缓存
+        fd, tmp_file = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_file, path)
+        self.metrics.incr("artifacts.bytes_written", len(data))
+        if self.max_bytes:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self.prune()
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        """(修改时间, 大小, 路径)，其他进程同时删除的文件跳过"""
+        entries = []
+        for path in self.directory.glob("*/*.bin"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def prune(self) -> int:
+        """淘汰最久未使用的缓存文件，直到总大小不超过上限的 PRUNE_RATIO，返回删除的文件数"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        limit = (self.max_bytes or 0) * self.PRUNE_RATIO
+        removed = 0
+        for _, size, path in entries:
+            if not self.max_bytes or total <= limit:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self._size = total
+        if removed:
+            self.metrics.incr("artifacts.evicted", removed)
+            logger.info("Pruned artifact cache", removed=removed, bytes=total)
+        return removed
+
+
+def prepare(
+    content: str,
+    splitter: HTMLSplitter,
+    chunk_tokens: Optional[int] = None,
+    titles=None,
+    titles_key: str = "",
+    cache: Optional[ArtifactCache] = None,
+) -> Tuple[HTMLReplacer, List[Chunk]]:
+    """
+    占位符替换并分块，启用缓存时先查缓存。
+    titles_key 为标题表的指纹（见 TitleTable.fingerprint），标题表不同时替换结果也不同。
+    """
+    chunk_tokens = chunk_tokens or splitter.count
+    key = None
+    if cache is not None:
+        key = artifact_key(content, chunk_tokens, splitter.tokenizer.name, titles_key)
+        prepared = cache.get(key)
+        if prepared is not None:
+            return prepared.replacer(titles), prepared.to_chunks()
+
+    replacer = HTMLReplacer(titles=titles)
+    replaced = replacer.replace(content)
+    chunks = splitter.split(replaced, chunk_tokens)
+    if cache is not None:
+        try:
+            cache.put(key, Prepared.from_replacer(replaced, replacer, chunks))
+        except OSError as e:
+            logger.warning("Failed to write artifact", error=str(e))
+    return replacer, chunks
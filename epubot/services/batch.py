@@ -0,0 +1,136 @@
+import hashlib
+import json
+from typing import Callable, Dict, List, Literal, Optional, Tuple
+
+from epubot.config.logger import logger
+from epubot.services.metrics import RunMetrics
+from epubot.services.singleflight import content_key, from_canonical, to_canonical
+from epubot.services.validator import validate
+
+BatchFormat = Literal["mistral", "openai"]
+# 构建请求消息：(分块文本, 目标语言代码) -> 消息列表
+MessagesFunc = Callable[[str, str], List[Dict[str, str]]]
+
+
+def stable_placeholders(count: int) -> List[str]:
+    """导出时使用的确定性占位符（每次运行的随机占位符不同，批量结果要能对应回来）"""
+    return [f"{{ph{i:06d}}}" for i in range(count)]
+
+
+def request_text(canonical: str, count: int) -> str:
+    return from_canonical(canonical, stable_placeholders(count))
+
+
+def batch_id(canonical: str, lang: Optional[str], prompt: str) -> str:
+    """
+    分块的稳定 ID：由提示词版本、目标语言和规范文本（占位符按出现顺序编号）的哈希得到，
+    重新解析、重新分块后内容相同的分块得到相同的 ID。
+    """
+    digest = hashlib.sha1(f"{prompt}|{lang or ''}|{content_key(canonical)}".encode("utf-8")).hexdigest()
+    return f"{lang or 'xx'}-{digest[:24]}"
+
+
+def batch_line(custom_id: str, messages: List[Dict[str, str]], model: str, fmt: BatchFormat = "mistral") -> dict:
+    """批量接口输入文件的一行"""
+    body = {"messages": messages, "temperature": 0.1}
+    if fmt == "openai":
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {"model": model, **body},
+        }
+    return {"custom_id": custom_id, "body": body}
+
+
+class BatchExporter:
+    """
+    导出模式下调度器的 lookup：记录每个待翻译分块的请求（相同 ID 只导出一次），
+    并以原文作为“译文”返回，使流程不发送任何请求地走完。
+    """
+
+    def __init__(self, messages: MessagesFunc, prompt: str, metrics: Optional[RunMetrics] = None):
+        self.messages = messages
+        self.prompt = prompt
+        self.metrics = metrics or RunMetrics()
+        self.requests: Dict[str, List[Dict[str, str]]] = {}
+
+    def lookup(self, content: str, canonical: str, placeholders: List[str], lang: Optional[str]) -> str:
+        custom_id = batch_id(canonical, lang, self.prompt)
+        if custom_id not in self.requests:
+            self.requests[custom_id] = self.messages(request_text(canonical, len(placeholders)), lang)
+            self.metrics.incr("batch.exported")
+        return content
+
+    def write(self, path: str, model: str, fmt: BatchFormat = "mistral") -> int:
+        """写出批量接口的 JSONL 输入文件（阻塞操作），返回请求数"""
+        with open(path, "w", encoding="utf-8") as f:
+            for custom_id, messages in self.requests.items():
+                f.write(json.dumps(batch_line(custom_id, messages, model, fmt), ensure_ascii=False) + "\n")
+        return len(self.requests)
+
+
+def parse_results(path: str, metrics: Optional[RunMetrics] = None) -> Dict[str, Tuple[str, Optional[str]]]:
+    """
+    读取批量接口的结果文件（Mistral 和 OpenAI 的格式相同：custom_id + response.body）。
+    Returns:
+        custom_id -> (输出, finish_reason)；出错的请求不包含在内，导入时重新交互翻译
+    """
+    metrics = metrics or RunMetrics()
+    results: Dict[str, Tuple[str, Optional[str]]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+                response = entry.get("response") or {}
+                status = response.get("status_code", 200)
+                if entry.get("error") or status != 200:
+                    raise ValueError(f"status={status} error={entry.get('error')}")
+                choice = response["body"]["choices"][0]
+                results[entry["custom_id"]] = (choice["message"]["content"] or "", choice.get("finish_reason"))
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                metrics.incr("batch.failed_results")
+                logger.warning("Skipping failed batch result", line=number, error=str(e))
+    return results
+
+
+class BatchResults:
+    """
+    导入模式下调度器的 lookup：用批量结果作为分块的译文。
+    结果经过与交互翻译相同的清理和结构校验，缺失或未通过校验的分块返回 None，由调度器交互翻译。
+    """
+
+    def __init__(
+        self,
+        results: Dict[str, Tuple[str, Optional[str]]],
+        prompt: str,
+        clean: Callable[[str, Optional[str]], str] = lambda text, lang: text,
+        metrics: Optional[RunMetrics] = None,
+    ):
+        self.results = results
+        self.prompt = prompt
+        self.clean = clean
+        self.metrics = metrics or RunMetrics()
+
+    def lookup(self, content: str, canonical: str, placeholders: List[str], lang: Optional[str]) -> Optional[str]:
+        custom_id = batch_id(canonical, lang, self.prompt)
+        entry = self.results.get(custom_id)
+        if entry is None:
+            self.metrics.incr("batch.missing")
+            return None
+        output, finish_reason = entry
+        # 结果中的确定性占位符换回本次运行的占位符
+        translated = from_canonical(
+            to_canonical(self.clean(output, lang), stable_placeholders(len(placeholders))), placeholders
+        )
+        reason = validate(content, translated, finish_reason)
+        if reason:
+            self.metrics.incr("batch.invalid")
+            self.metrics.incr(f"batch.invalid_{reason}")
+            logger.info("Batch result failed validation, translating interactively", id=custom_id, reason=reason)
+            return None
+        self.metrics.incr("batch.used")
+        return translated
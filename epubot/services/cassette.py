@@ -0,0 +1,187 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from epubot.config.logger import logger
+from epubot.services.html.tokenizer import get_encoding
+from epubot.services.loop import run_blocking_io
+from epubot.services.providers import Provider
+
+
+def request_key(messages: List[Dict[str, str]]) -> str:
+    """请求的键：只取消息的角色和内容，与模型无关（录制的响应可以用于其他模型的模拟）"""
+    payload = json.dumps([(m.get("role"), m.get("content")) for m in messages], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Interaction:
+    """一次录制的请求：响应和耗时（ttft 为首 token 延迟，非流式请求为空）"""
+
+    provider: str
+    model: str
+    key: str
+    prompt: str  # 最后一条用户消息，系统提示词不重复保存
+    response: str = ""
+    finish_reason: Optional[str] = None
+    stream: bool = False
+    status: int = 200
+    error: Optional[str] = None
+    ttft: Optional[float] = None
+    seconds: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    recorded_at: float = field(default_factory=time.time)
+
+    @property
+    def seconds_per_token(self) -> float:
+        """首 token 之后每个输出 token 的生成耗时"""
+        generation = self.seconds - (self.ttft or 0.0)
+        return max(generation, 0.0) / max(self.completion_tokens, 1)
+
+
+def error_status(error: BaseException) -> int:
+    """异常对应的 HTTP 状态码（SDK 和 httpx 的错误带有状态码），其他异常记为 0"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return int(status) if isinstance(status, int) else 0
+
+
+class Cassette:
+    """
+    录制文件：每行一个 Interaction 的 JSON（追加写入，中断时已录制的部分不会丢失）。
+    模拟服务从中读取响应和延迟分布。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.interactions: List[Interaction] = self._load()
+        self._lock = threading.Lock()
+
+    def _load(self) -> List[Interaction]:
+        if not os.path.exists(self.path):
+            return []
+        interactions = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    interactions.append(Interaction(**json.loads(line)))
+                except (json.JSONDecodeError, TypeError):
+                    logger.warning("Skipping malformed cassette entry", cassette=self.path)
+        return interactions
+
+    def __len__(self) -> int:
+        return len(self.interactions)
+
+    def _write(self, line: str) -> None:
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def append(self, interaction: Interaction) -> None:
+        self.interactions.append(interaction)
+        self._write(json.dumps(asdict(interaction), ensure_ascii=False))
+
+    async def append_async(self, interaction: Interaction) -> None:
+        """在线程池中追加写入，不阻塞事件循环"""
+        self.interactions.append(interaction)
+        await run_blocking_io(self._write, json.dumps(asdict(interaction), ensure_ascii=False))
+
+    def find(self, key: str) -> Optional[Interaction]:
+        """相同请求最近一次成功的响应"""
+        for interaction in reversed(self.interactions):
+            if interaction.key == key and interaction.status == 200 and interaction.error is None:
+                return interaction
+        return None
+
+    def successes(self) -> List[Interaction]:
+        return [i for i in self.interactions if i.status == 200 and i.error is None]
+
+
+class RecordingProvider(Provider):
+    """包装真实后端，把每个请求的响应、finish_reason、状态码和耗时追加到 cassette"""
+
+    def __init__(self, provider: Provider, cassette: Cassette):
+        self.provider = provider
+        self.cassette = cassette
+        self.name = provider.name
+        self.model = provider.model
+
+    def _interaction(self, messages, started: float, stream: bool) -> Interaction:
+        prompt = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        encoding = get_encoding()
+        return Interaction(
+            provider=self.name,
+            model=self.model,
+            key=request_key(messages),
+            prompt=prompt,
+            stream=stream,
+            seconds=round(time.monotonic() - started, 4),
+            prompt_tokens=sum(len(encoding.encode(m.get("content") or "")) for m in messages),
+        )
+
+    def _finish(self, interaction: Interaction, response: str, finish_reason: Optional[str]) -> Interaction:
+        interaction.response = response
+        interaction.finish_reason = finish_reason
+        interaction.completion_tokens = len(get_encoding().encode(response))
+        return interaction
+
+    def _fail(self, interaction: Interaction, error: BaseException) -> Interaction:
+        interaction.status = error_status(error)
+        interaction.error = f"{type(error).__name__}: {error}"[:500]
+        return interaction
+
+    async def complete(self, messages, **kwargs):
+        started = time.monotonic()
+        try:
+            content, finish_reason = await self.provider.complete(messages, **kwargs)
+        except Exception as e:
+            await self.cassette.append_async(self._fail(self._interaction(messages, started, False), e))
+            raise
+        interaction = self._interaction(messages, started, False)
+        await self.cassette.append_async(self._finish(interaction, content, finish_reason))
+        return content, finish_reason
+
+    @asynccontextmanager
+    async def stream(self, messages, **kwargs):
+        started = time.monotonic()
+        parts: List[str] = []
+        state = {"ttft": None, "finish_reason": None}
+
+        async def tap(deltas):
+            async for delta, finish_reason in deltas:
+                if delta and state["ttft"] is None:
+                    state["ttft"] = round(time.monotonic() - started, 4)
+                parts.append(delta)
+                state["finish_reason"] = finish_reason or state["finish_reason"]
+                yield delta, finish_reason
+
+        def streamed() -> Interaction:
+            interaction = self._interaction(messages, started, True)
+            interaction.ttft = state["ttft"]
+            return self._finish(interaction, "".join(parts), state["finish_reason"])
+
+        try:
+            async with self.provider.stream(messages, **kwargs) as deltas:
+                yield tap(deltas)
+        except Exception as e:
+            # 包括流式校验中止的请求：已收到的部分和首 token 延迟仍然记录
+            await self.cassette.append_async(self._fail(streamed(), e))
+            raise
+        await self.cassette.append_async(streamed())
+
+
+@functools.lru_cache(maxsize=None)
+def get_cassette(path: str) -> Cassette:
+    """按路径返回 cassette（进程内共享，多个后端录制到同一个文件）"""
+    return Cassette(path)
@@ -0,0 +1,156 @@
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from epubot.config.logger import logger
+from epubot.services.metrics import RunMetrics
+from epubot.services.providers import Provider
+from epubot.services.quality import is_complex
+
+
+def content_type(content: str) -> str:
+    """粗略的内容类型：标签密集的 markup 与普通的 prose"""
+    return "markup" if is_complex(content) else "prose"
+
+
+@dataclass
+class ChunkStats:
+    """某个后端（及内容类型）最近请求的指数滑动平均统计"""
+
+    size: int
+    requests: int = 0
+    decided_at: int = 0  # 上次调整分块大小时的请求数
+    seconds_per_token: float = 0.0
+    output_ratio: float = 0.0
+    failure_rate: float = 0.0
+    reasons: List[str] = field(default_factory=list)
+
+
+class ChunkTuner:
+    """
+    分块大小自动调整。
+    按后端（可选再按内容类型）记录每个请求的延迟、输出/输入 token 比例和失败情况，
+    每积累 min_samples 个新样本重新选择一次分块的 token 上限：
+    - 失败率过高（截断、结构错误、请求异常）时缩小，降低单次重试的代价；
+    - 按当前每 token 延迟预计单个请求会超过 target_latency 时缩小；
+    - 按输出比例预计会超过模型输出上限时缩小，避免截断；
+    - 以上都没有问题时逐步增大，减少系统提示词的重复开销和请求次数。
+    统计保存在 state_file 中，下次运行从上次的结果开始。
+    """
+
+    def __init__(
+        self,
+        state_file: Optional[str] = None,
+        default: int = 6000,
+        min_tokens: int = 1000,
+        max_tokens: int = 12000,
+        max_output_tokens: int = 8192,
+        target_latency: float = 60.0,
+        max_failure_rate: float = 0.1,
+        min_samples: int = 5,
+        by_content: bool = False,
+        alpha: float = 0.2,
+        metrics: Optional[RunMetrics] = None,
+        prompt: Optional[str] = None,
+    ):
+        self.state_file = state_file
+        self.default = default
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.max_output_tokens = max_output_tokens
+        self.target_latency = target_latency
+        self.max_failure_rate = max_failure_rate
+        self.min_samples = min_samples
+        self.by_content = by_content
+        self.alpha = alpha
+        self.metrics = metrics or RunMetrics()
+        # 提示词模板（名称和版本）：提示词变化后延迟和输出比例不再可比，统计重新开始
+        self.prompt = prompt
+        self.stats: Dict[str, ChunkStats] = self._load()
+
+    def _load(self) -> Dict[str, ChunkStats]:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return {key: ChunkStats(**value) for key, value in json.load(f).items()}
+        except (json.JSONDecodeError, IOError, TypeError):
+            return {}
+
+    def save(self) -> None:
+        """原子地写入统计文件（阻塞操作）"""
+        if not self.state_file:
+            return
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({key: asdict(stats) for key, stats in self.stats.items()}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.state_file)
+
+    def key(self, provider: Provider, content: Optional[str] = None) -> str:
+        key = f"{provider.name}/{provider.model}"
+        if self.prompt:
+            key = f"{key}@{self.prompt}"
+        if self.by_content and content is not None:
+            key = f"{key}:{content_type(content)}"
+        return key
+
+    def _get(self, key: str) -> ChunkStats:
+        if key not in self.stats:
+            self.stats[key] = ChunkStats(size=self.default)
+        return self.stats[key]
+
+    def _ewma(self, current: float, value: float, first: bool) -> float:
+        return value if first else current + self.alpha * (value - current)
+
+    def record(
+        self,
+        provider: Provider,
+        content: str,
+        tokens: int,
+        seconds: float,
+        output_tokens: Optional[int] = None,
+        failed: bool = False,
+    ) -> None:
+        """记录一次请求；失败的请求只计入失败率"""
+        stats = self._get(self.key(provider, content))
+        first = stats.requests == 0
+        stats.requests += 1
+        stats.failure_rate = self._ewma(stats.failure_rate, 1.0 if failed else 0.0, first)
+        if not failed and tokens:
+            stats.seconds_per_token = self._ewma(stats.seconds_per_token, seconds / tokens, not stats.seconds_per_token)
+            if output_tokens is not None:
+                stats.output_ratio = self._ewma(stats.output_ratio, output_tokens / tokens, not stats.output_ratio)
+
+    def _choose(self, stats: ChunkStats) -> Tuple[int, List[str]]:
+        size = float(stats.size)
+        reasons: List[str] = []
+        if stats.failure_rate > self.max_failure_rate:
+            size *= 0.75
+            reasons.append(f"failure_rate={stats.failure_rate:.2f}")
+        if stats.seconds_per_token and size * stats.seconds_per_token > self.target_latency:
+            size = self.target_latency / stats.seconds_per_token
+            reasons.append(f"latency={stats.size * stats.seconds_per_token:.1f}s")
+        if stats.output_ratio and size * stats.output_ratio > self.max_output_tokens * 0.9:
+            size = self.max_output_tokens * 0.9 / stats.output_ratio
+            reasons.append(f"output_ratio={stats.output_ratio:.2f}")
+        if not reasons and stats.failure_rate <= self.max_failure_rate / 2:
+            size *= 1.25
+            reasons.append("overhead")
+        clamped = int(min(max(size, self.min_tokens), self.max_tokens))
+        if clamped != int(size):
+            reasons.append("limit")
+        return clamped, reasons
+
+    def chunk_tokens(self, provider: Provider, content: Optional[str] = None) -> int:
+        """返回分块的 token 上限；样本足够时先重新调整"""
+        key = self.key(provider, content)
+        stats = self._get(key)
+        if stats.requests - stats.decided_at >= self.min_samples:
+            size, reasons = self._choose(stats)
+            if size != stats.size:
+                logger.info("Chunk size tuned", key=key, previous=stats.size, size=size, reasons=reasons)
+            stats.size, stats.reasons, stats.decided_at = size, reasons, stats.requests
+        self.metrics.set(f"chunking.{key}.tokens", stats.size)
+        self.metrics.set(f"chunking.{key}.reasons", list(stats.reasons))
+        return stats.size
@@ -0,0 +1,111 @@
+import re
+from typing import Dict, Optional
+
+from epubot.config.settings import settings
+from epubot.services.languages import language_code
+
+LETTER_PATTERN = re.compile(r"[^\W\d_]")
+
+# 文字系统：用于识别 CJK、韩文、西里尔和阿拉伯文字的文本
+SCRIPT_PATTERNS = {
+    "han": re.compile(r"[㐀-鿿豈-﫿]"),
+    "kana": re.compile(r"[぀-ヿ]"),
+    "hangul": re.compile(r"[가-힯ᄀ-ᇿ]"),
+    "cyrillic": re.compile(r"[Ѐ-ӿ]"),
+    "arabic": re.compile(r"[؀-ۿ]"),
+}
+LATIN_WORD_PATTERN = re.compile(r"[a-zà-öø-ÿ]+(?:'[a-z]+)?")
+CODE_PATTERN = re.compile(r"[{}()\[\];=<>|&*/\\]")
+# 块级元素的标签：分块按段落分别判断
+BLOCK_PATTERN = re.compile(
+    r"</?(?:p|div|pre|li|h[1-6]|blockquote|table|tr|td|th|dt|dd|section|article|figcaption)\b[^>]*>|<br\s*/?>",
+    re.IGNORECASE,
+)
+# 标签（含 XML 声明、DOCTYPE 和注释）、占位符和实体，一次替换去掉
+MARKUP_PATTERN = re.compile(r"<[^>]*>|\{[A-Za-z0-9]{8}\}|&[#\w]+;")
+
+# 拉丁文字语言的高频功能词，按命中数识别语言（不依赖外部模型）
+STOPWORDS: Dict[str, frozenset] = {
+    lang: frozenset(words.split())
+    for lang, words in {
+        "en": "the of and to in is that it for was with as on be by this are not have from at which you his he",
+        "fr": "le les des et est une que qui dans pour pas du au sur avec ce il elle sont nous vous mais",
+        "de": "der die das und ist nicht ein eine zu den von mit sich des auf dem im für auch wird sie",
+        "es": "el los las que y en una es por con para del se al lo como más pero sus le ya",
+        "it": "il di che è un una per non sono del della con gli le si nel alla questo anche ma",
+        "pt": "o os que e um uma não em para com do da no na se por mais como ao dos das",
+    }.items()
+}
+
+# 以文字系统为主的语言：该文字在字母中的最低占比
+SCRIPT_LANGUAGES = [("ko", "hangul", 0.5), ("zh", "han", 0.5), ("ru", "cyrillic", 0.5), ("ar", "arabic", 0.5)]
+
+
+def detect_language(text: str) -> Optional[str]:
+    """
+    基于文字系统统计和功能词的轻量语言识别（只看前 SKIP_SAMPLE_CHARS 个字符）。
+    Returns:
+        语言代码（zh / ja / ko / ru / ar / en / fr / de / es / it / pt），无法确定时返回 None
+    """
+    sample = text[: settings.SKIP_SAMPLE_CHARS]
+    letters = len(LETTER_PATTERN.findall(sample))
+    if letters < settings.SKIP_MIN_LETTERS:
+        return None
+    counts = {script: len(pattern.findall(sample)) for script, pattern in SCRIPT_PATTERNS.items()}
+    # 日文混用汉字和假名，少量假名即可区分
+    if counts["kana"] / letters > 0.1 and (counts["kana"] + counts["han"]) / letters > 0.5:
+        return "ja"
+    for lang, script, share in SCRIPT_LANGUAGES:
+        if counts[script] / letters > share:
+            return lang
+
+    words = LATIN_WORD_PATTERN.findall(sample.lower())
+    if not words:
+        return None
+    scores = sorted(
+        ((sum(word in stopwords for word in words), lang) for lang, stopwords in STOPWORDS.items()), reverse=True
+    )
+    (best, lang), (second, _) = scores[0], scores[1]
+    # 功能词足够多且明显领先第二名时才认定
+    if best >= 3 and best / len(words) >= 0.15 and best >= 1.5 * second:
+        return lang
+    return None
+
+
+def _classify(sample: str, target_lang: str) -> Optional[str]:
+    visible = len(sample) - sample.count(" ") - sample.count("\n")
+    if visible >= settings.SKIP_MIN_LETTERS and len(CODE_PATTERN.findall(sample)) / visible > settings.SKIP_CODE_RATIO:
+        return "code"
+    # zh-tw 等地区变体按主语言比较
+    if detect_language(sample) == language_code(target_lang):
+        return "target_language"
+    return None
+
+
+def skip_reason(content: str, target_lang: str) -> Optional[str]:
+    """
+    判断分块（占位符替换后）是否不需要翻译。
+    代码和语言按段落判断，所有段落结论一致时才跳过：
+    以代码清单或目标语言题记开头、后面是正文的分块照常翻译。
+    Returns:
+        no_text（只有标签、占位符、空白、数字或标点，如图片页和页码列表）、
+        code（代码清单）、target_language（已经是目标语言）；需要翻译时返回 None
+    """
+    # 按块级元素分段，字母太少的段落不参与判断；遇到需要翻译或结论不同的段落立即返回，
+    # 需要翻译的分块通常只检查第一段
+    verdict: Optional[str] = None
+    letters = False
+    for block in BLOCK_PATTERN.split(content):
+        text = MARKUP_PATTERN.sub(" ", block)
+        count = len(LETTER_PATTERN.findall(text))
+        letters = letters or count > 0
+        if count < settings.SKIP_MIN_LETTERS:
+            continue
+        reason = _classify(text, target_lang)
+        if reason is None or (verdict is not None and reason != verdict):
+            return None
+        verdict = reason
+    if not letters:
+        return "no_text"
+    # 没有足够长的段落时整体判断
+    return verdict or _classify(MARKUP_PATTERN.sub(" ", content), target_lang)
@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+import importlib.util
+import time
+import weakref
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from epubot.config.logger import logger
+from epubot.config.settings import settings
+from epubot.services.metrics import RunMetrics
+
+# 当前运行的指标：Coordinator.process 开始时绑定，其中创建的任务都会继承
+http_metrics: ContextVar[Optional[RunMetrics]] = ContextVar("http_metrics", default=None)
+
+
+def http2_available() -> bool:
+    """HTTP/2 需要安装 h2（pip install "httpx[http2]"），没有时使用 HTTP/1.1 keep-alive"""
+    return importlib.util.find_spec("h2") is not None
+
+
+class ConnectionTrace:
+    """
+    一个请求的连接建立耗时（httpcore 的 trace 扩展）：
+    复用已有连接时没有 connect_tcp 事件，耗时为 0。
+    """
+
+    def __init__(self):
+        self.started: Optional[float] = None
+        self.seconds = 0.0
+        self.connected = False
+
+    async def __call__(self, event: str, info: Dict[str, Any]) -> None:
+        if event == "connection.connect_tcp.started":
+            self.started = time.perf_counter()
+            self.connected = True
+        elif self.started is not None and event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            self.seconds = time.perf_counter() - self.started
+
+
+async def _trace_request(request: httpx.Request) -> None:
+    request.extensions["trace"] = ConnectionTrace()
+
+
+async def _record_response(response: httpx.Response) -> None:
+    trace = response.request.extensions.get("trace")
+    metrics = http_metrics.get()
+    if not isinstance(trace, ConnectionTrace) or metrics is None:
+        return
+    metrics.incr("http.requests")
+    metrics.incr("http.new_connections" if trace.connected else "http.reused_connections")
+    metrics.observe("http.connect_seconds", trace.seconds)
+    if response.http_version == "HTTP/2":
+        metrics.incr("http.http2_requests")
+
+
+class ClientRegistry:
+    """
+    进程内共享的 HTTP 客户端：每个事件循环、每个后端地址和密钥一个连接池（keep-alive，可用时使用 HTTP/2），
+    所有 Translator 和任务复用同一组连接，不再重复握手。
+    httpx 的连接绑定创建它的事件循环，因此按事件循环分别保存；close() 关闭当前事件循环的全部客户端。
+    """
+
+    def __init__(self):
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, Any]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, httpx.AsyncClient]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @staticmethod
+    def _key(base_url: str, api_key: Optional[str]) -> Tuple[str, str]:
+        # 密钥只以哈希参与键，不保存在注册表中
+        return base_url, hashlib.sha1((api_key or "").encode("utf-8")).hexdigest()
+
+    def _create_http(self, base_url: str, headers: Optional[Dict[str, str]]) -> httpx.AsyncClient:
+        http2 = settings.HTTP2 and http2_available()
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_POOL_SIZE,
+                max_keepalive_connections=settings.HTTP_POOL_SIZE,
+                keepalive_expiry=settings.HTTP_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(
+                settings.HTTP_READ_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT, pool=settings.HTTP_POOL_TIMEOUT
+            ),
+            event_hooks={"request": [_trace_request], "response": [_record_response]},
+        )
+        logger.debug("HTTP client created", base_url=base_url, http2=http2, pool=settings.HTTP_POOL_SIZE)
+        return client
+
+    def http(
+        self, base_url: str = "", api_key: Optional[str] = None, headers: Optional[Dict[str, str]] = None
+    ) -> httpx.AsyncClient:
+        """当前事件循环中 (base_url, api_key) 对应的连接池客户端"""
+        loop = asyncio.get_running_loop()
+        transports = self._transports.setdefault(loop, {})
+        key = self._key(base_url, api_key)
+        if key not in transports or transports[key].is_closed:
+            transports[key] = self._create_http(base_url, headers)
+        return transports[key]
+
+    def get(self, name: str, base_url: str, api_key: Optional[str], factory: Callable[[httpx.AsyncClient], Any]) -> Any:
+        """
+        当前事件循环中 SDK 客户端（如 Mistral）的共享实例，factory 接收共享的 httpx 客户端。
+        """
+        loop = asyncio.get_running_loop()
+        clients = self._clients.setdefault(loop, {})
+        key = (name, *self._key(base_url, api_key))
+        http = self.http(base_url, api_key)
+        if key not in clients or clients[key][0] is not http:
+            clients[key] = (http, factory(http))
+        return clients[key][1]
+
+    async def close(self) -> None:
+        """关闭当前事件循环的全部连接"""
+        loop = asyncio.get_running_loop()
+        transports = self._transports.pop(loop, {})
+        self._clients.pop(loop, None)
+        await asyncio.gather(*(client.aclose() for client in transports.values()), return_exceptions=True)
+
+
+registry = ClientRegistry()
+
+
+async def close_clients() -> None:
+    await registry.close()
@@ -1,124 +1,647 @@
-import json
-from typing import Union
+import asyncio
+import copy
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple, Union
 
+import ebooklib
 from ebooklib import epub
 from tqdm import tqdm
 
-from epubot.services.epub import EpubBuilder, EpubParser
+from epubot.config.logger import logger
+from epubot.config.settings import settings
+from epubot.schemas.chunk import Chunk
+from epubot.services.artifacts import ArtifactCache, prepare
+from epubot.services.batch import BatchExporter, BatchFormat, BatchResults, parse_results
+from epubot.services.chunking import ChunkTuner
+from epubot.services.clients import http_metrics
+from epubot.services.classifier import skip_reason
+from epubot.services.deadline import DeadlinePlanner, mark_untranslated
+from epubot.services.epub import EpubBuilder, EpubParser, ProgressiveOutput
+from epubot.services.events import BookBuilt, ChunkTranslated, Event, ItemRestored, ItemStarted, TranslationJob
 from epubot.services.html import HTMLBuilder, HTMLReplacer, HTMLSplitter
+from epubot.services.languages import language_name, output_path, parse_languages
+from epubot.services.loop import LoopLagMonitor, run_blocking_io
+from epubot.services.metrics import RunMetrics
+from epubot.services.policies import LatencyModel, get_policy
+from epubot.services.profiler import Profiler
+from epubot.services.prompts import get_prompt
+from epubot.services.providers import parse_tier
 from epubot.services.resume import Resume
+from epubot.services.review import ReviewGate
+from epubot.services.scheduler import Scheduler
+from epubot.services.spool import MemoryBudget, Spool, peak_rss_mb
+from epubot.services.titles import TitleTable
 from epubot.services.translator import Translator
 
 
+@dataclass
+class Target:
+    """一个目标语言的输出：标题表、断点续传状态、译文和渐进输出"""
+
+    lang: str
+    output_file: str
+    titles: TitleTable
+    resume_key: str
+    processed_files: Set[str] = field(default_factory=set)
+    translations: Dict[str, str] = field(default_factory=dict)  # 未启用暂存时的译文：条目 id -> 译文
+    toc: Optional[list] = None  # 本语言的目录副本
+    progressive: Optional[ProgressiveOutput] = None
+
+    @property
+    def spool_prefix(self) -> str:
+        return f"{self.lang}:"
+
+    def builder_options(self) -> Dict:
+        return {
+            "language": self.lang,
+            "toc": self.toc,
+            "translations": self.translations,
+            "spool_prefix": self.spool_prefix,
+        }
+
+
 class Coordinator:
     def __init__(
         self,
         input_epub: str,
-        target_lang: str = "zh",
+        target_lang: Union[str, List[str]] = "zh",
         output_file: Union[str, None] = None,
         enable_resume: bool = True,
+        profiler: Optional[Profiler] = None,
+        spool: Optional[bool] = None,
+        memory_budget_mb: Optional[int] = None,
+        deadline: Optional[float] = None,
+        policy: Optional[str] = None,
+        progressive: Optional[float] = None,
+        batch_results: Optional[str] = None,
     ) -> None:
         self.input_epub = input_epub
-        self.target_lang = target_lang
-        self.output_file = output_file or input_epub.replace(".epub", "-zh.epub")
+        # 多个目标语言（"zh,ja,fr"）共用一次解析、替换和分块，分块按语言分别提交给同一个调度器
+        self.languages = parse_languages(target_lang)
+        self.target_lang = self.languages[0]
         self.epub_parser = EpubParser(input_epub)
-        self.html_splitter = HTMLSplitter()
+        self.html_splitter = HTMLSplitter(settings.CHUNK_TOKENS)
         self.html_builder = HTMLBuilder()
-        self.translator = Translator()
+        self.metrics = RunMetrics()
+        # 分块大小自动调整，未启用时使用固定的 CHUNK_TOKENS
+        self.tuner = (
+            ChunkTuner(
+                settings.CHUNK_TUNING_FILE,
+                default=settings.CHUNK_TOKENS,
+                min_tokens=settings.CHUNK_MIN_TOKENS,
+                max_tokens=settings.CHUNK_MAX_TOKENS,
+                max_output_tokens=settings.CHUNK_MAX_OUTPUT_TOKENS,
+                target_latency=settings.CHUNK_TARGET_LATENCY,
+                max_failure_rate=settings.CHUNK_MAX_FAILURE_RATE,
+                min_samples=settings.CHUNK_TUNE_MIN_SAMPLES,
+                by_content=settings.CHUNK_TUNE_BY_CONTENT,
+                metrics=self.metrics,
+                prompt=get_prompt().key,
+            )
+            if settings.CHUNK_AUTO_TUNE
+            else None
+        )
+        self.translator = Translator(metrics=self.metrics, tuner=self.tuner)
+        self.scheduler = Scheduler(
+            lambda content, target_lang=None: self.translator.translate(
+                content, target_lang=language_name(target_lang or self.target_lang)
+            ),
+            concurrency=settings.MAX_CONCURRENT_REQUESTS,
+            metrics=self.metrics,
+            cache_size=settings.SINGLEFLIGHT_CACHE_SIZE,
+            policy=get_policy(policy or settings.SCHEDULER_POLICY, self._latency_model()),
+        )
+        # 审校：分块译文完成后按本地信号和随机抽样选择需要审校的分块，与其他分块的翻译并发进行；
+        # 在调度器的任务内执行，内容相同的分块只审校一次并得到相同的译文
+        self.reviewer = (
+            ReviewGate(
+                lambda source, translated, lang, issues: self.translator.review(
+                    source, translated, target_lang=language_name(lang), issues=issues
+                ),
+                glossaries=self.translator.glossaries,
+                sample_rate=settings.REVIEW_SAMPLE_RATE,
+                metrics=self.metrics,
+                seed=settings.REVIEW_SEED,
+            )
+            if settings.REVIEW_ENABLED
+            else None
+        )
+        if self.reviewer is not None:
+            self.scheduler.review = lambda source, translated, lang: self.reviewer(
+                source, translated, lang or self.target_lang
+            )
+        # 预处理缓存：占位符替换和分块的结果按文档内容缓存到磁盘
+        self.artifacts = (
+            ArtifactCache(
+                settings.ARTIFACT_CACHE_DIR,
+                max_bytes=settings.ARTIFACT_CACHE_MAX_MB * 1024 * 1024 or None,
+                metrics=self.metrics,
+            )
+            if settings.ARTIFACT_CACHE_ENABLED
+            else None
+        )
+        # 批量接口：导入时先使用结果文件中通过校验的译文，其余分块交互翻译；导出时只收集请求不翻译
+        self.batch: Optional[BatchResults] = None
+        if batch_results:
+            translator = self.translator
+            self.batch = BatchResults(
+                parse_results(batch_results, self.metrics),
+                prompt=translator.prompt.key,
+                clean=lambda text, lang: translator._replace_designation(text, language_name(lang or self.target_lang)),
+                metrics=self.metrics,
+            )
+            self.scheduler.lookup = self.batch.lookup
+        self.exporting = False
+        # 跳过的分块：(文件名, 语言) -> 各原因的分块数
+        self.skipped: Dict[Tuple[str, str], Counter] = {}
+        self.titles_key = ""  # 标题表收集完成后的指纹，作为预处理缓存键的一部分
+        self.document_order: Dict[str, int] = {}  # 文档 id -> 书脊中的位置
+        self.targets = [self._create_target(lang, output_file) for lang in self.languages]
+        # 第一个目标语言的输出和标题表（单语言时即唯一的输出）
+        self.output_file = self.targets[0].output_file
+        self.titles = self.targets[0].titles
+        self.profiler = profiler or Profiler(enabled=False)
+        self.loop_monitor = LoopLagMonitor(
+            interval=settings.LOOP_LAG_INTERVAL,
+            warn_threshold=settings.LOOP_LAG_WARN_THRESHOLD,
+            max_samples=10000,
+        )
+        # 性能分析的事件循环延迟统计取自同一个监控
+        self.profiler.use_lag_monitor(self.loop_monitor)
+
+        # 低内存模式：文档内容暂存到磁盘，同时驻留内存的工作集受预算限制
+        self.enable_spool = settings.SPOOL_ENABLED if spool is None else spool
+        self.spool: Optional[Spool] = None
+        budget_mb = settings.SPOOL_MEMORY_BUDGET_MB if memory_budget_mb is None else memory_budget_mb
+        self.memory_budget = MemoryBudget(budget_mb * 1024 * 1024 if self.enable_spool and budget_mb else None)
+
+        # 截止时间（距现在的秒数），预计超时时由 DeadlinePlanner 调整调度
+        self.deadline_at = time.monotonic() + deadline if deadline is not None else None
+        self.planner: Optional[DeadlinePlanner] = None
+        self.chunk_boost = 1  # 截止时间调度增大分块的倍数
+
+        # 渐进输出：按间隔把已完成的文档写入输出文件
+        self.progressive_interval = settings.PROGRESSIVE_INTERVAL if progressive is None else progressive
 
-        # 断点续传相关
+        # translate_stream() 创建的任务：接收事件、控制暂停；为空时通过进度条和 print 报告进度
+        self.job: Optional[TranslationJob] = None
+
+        # 断点续传相关，每个目标语言分别记录已处理的文件
         self.enable_resume = enable_resume
         self.resume = Resume() if enable_resume else None
-        self.processed_files = set()
-
         if enable_resume and self.resume:
-            self.processed_files = self.resume.get_processed_files(input_epub)
+            for target in self.targets:
+                target.processed_files = self.resume.get_processed_files(target.resume_key)
+        self.processed_files = self.targets[0].processed_files
+
+    def _create_target(self, lang: str, output_file: Optional[str]) -> Target:
+        multiple = len(self.languages) > 1
+        if output_file:
+            path = output_path(output_file, lang, multiple)
+        else:
+            path = self.input_epub.replace(".epub", f"-{lang}.epub")
+        # 目录、导航和正文标题共用的标题表，每个不同的标题只翻译一次；
+        # 所有文档还原前都要等待标题表，标题批次最先派发
+        titles = TitleTable(
+            lambda chunk, lang=lang: self.scheduler.submit(chunk, priority=-1, lang=lang),
+            self.html_splitter.get_token_count,
+            batch_tokens=self.html_splitter.count,
+            metrics=self.metrics,
+        )
+        # 中文是原先唯一的目标语言，沿用以文件路径为键的续传状态
+        resume_key = self.input_epub if lang == "zh" else f"{self.input_epub}#{lang}"
+        return Target(lang=lang, output_file=path, titles=titles, resume_key=resume_key)
 
-    def _update_toc(self, original_toc, translated_toc):
+    def _latency_model(self) -> LatencyModel:
+        """当前后端的请求耗时模型，分块大小自动调整有统计时使用观测值"""
+        model = LatencyModel(settings.SCHEDULER_LATENCY_OVERHEAD, settings.SCHEDULER_SECONDS_PER_TOKEN)
+        if self.tuner is not None:
+            stats = self.tuner.stats.get(self.tuner.key(self.translator.tiers[0]))
+            if stats is not None and stats.seconds_per_token:
+                model.seconds_per_token = stats.seconds_per_token
+        return model
+
+    def _spool_book(self, book) -> None:
+        """
+        将所有条目内容写入暂存区并释放内存中的副本（包括 ebooklib 持有的原始内容）。
+        这是阻塞操作，需通过 run_blocking_io 执行。
+        """
+        for item in book.items:
+            self.spool.put(item.id, item.content)
+            item.content = "" if isinstance(item.content, str) else b""
+        for original in book.book.get_items():
+            if not isinstance(original, (epub.EpubNav, epub.EpubNcx)):
+                original.content = b""
+
+    async def _load_content(self, item) -> str:
+        if self.spool is not None and item.id in self.spool:
+            return await self.spool.get_async(item.id)
+        return item.content
+
+    def _item_size(self, item) -> int:
+        """文档原文大小，作为截止时间调度的进度单位"""
+        if self.spool is not None and item.id in self.spool:
+            return self.spool.size(item.id)
+        return len(item.content)
+
+    def _chunk_tokens(self, content: str) -> int:
+        """文档的分块 token 上限：自动调整的结果（或固定值），截止时间调度可将其增大"""
+        if self.tuner is not None:
+            count = self.tuner.chunk_tokens(self.translator.tiers[0], content)
+        else:
+            count = self.html_splitter.count
+        return max(count, min(count * self.chunk_boost, settings.DEADLINE_MAX_CHUNK_TOKENS))
+
+    def translate_stream(self, maxsize: int = 16) -> TranslationJob:
         """
-        递归地将翻译后的标题替换回原始的 Link 对象结构中。
-        要求 original_toc 和 translated_toc 具有完全相同的嵌套和顺序。
+        以事件流的形式运行完整的翻译流程（解析、翻译、构建）：
+
+            job = coordinator.translate_stream()
+            async for event in job:
+                ...
+
+        依次产出 ItemStarted、ChunkTranslated、ItemRestored 和 BookBuilt；
+        可以随时 job.pause()、job.resume() 或 job.cancel()，事件队列满时翻译等待消费者（背压）。
         """
-        if isinstance(original_toc, (epub.Link, epub.Section)):
-            # 如果是 Link 对象，直接更新其 title 属性
-            # original_toc 是 Link 对象本身，所以可以直接修改
-            original_toc.title = translated_toc
-            return (
-                original_toc  # 返回修改后的 Link 对象（虽然是原地修改，返回方便理解）
+        self.job = TranslationJob(self.process, maxsize, running=self.scheduler.running)
+        return self.job
+
+    async def _emit(self, event: Event) -> None:
+        if self.job is not None:
+            await self.job.emit(event)
+
+    async def _checkpoint(self) -> None:
+        if self.job is not None:
+            await self.job.checkpoint()
+
+    def _print(self, message: str) -> None:
+        # 作为库使用（事件流）时不输出到终端
+        if self.job is None:
+            print(message)
+
+    async def _submit(
+        self, item, chunk: Chunk, index: int, total: int, weight: float, lang: str, skip: Optional[str] = None
+    ) -> str:
+        if skip:
+            # 不需要翻译的分块原样保留
+            result = chunk.content
+        else:
+            document = self.document_order.get(item.id, len(self.document_order))
+            result = await self.scheduler.submit(chunk, document=document, book=self.input_epub, lang=lang)
+        if self.planner is not None:
+            self.planner.advance(weight)
+        if self.job is not None:
+            await self._emit(
+                ChunkTranslated(
+                    item_id=item.id,
+                    file_name=item.file_name,
+                    lang=lang,
+                    index=index,
+                    total=total,
+                    input_tokens=chunk.tokens or self.html_splitter.get_token_count(chunk.content),
+                    output_tokens=self.html_splitter.get_token_count(result),
+                )
             )
-        elif isinstance(original_toc, (list, tuple)) and isinstance(
-            translated_toc, list
-        ):
-            # 如果都是列表，遍历并递归处理每个元素
-            for i in range(len(original_toc)):
-                # 确保两个结构的长度匹配，否则会有 IndexError
-                if i < len(translated_toc):
-                    self._update_toc(original_toc[i], translated_toc[i])
-            return original_toc  # 返回修改后的列表
+        return result
+
+    def _skip_reasons(self, item, chunks: List[Chunk], lang: str) -> List[Optional[str]]:
+        """各分块不需要翻译的原因（需要翻译时为 None），按文档和语言记录"""
+        if not settings.SKIP_ENABLED:
+            return [None] * len(chunks)
+        reasons = [skip_reason(chunk.content, lang) for chunk in chunks]
+        counts = Counter(reason for reason in reasons if reason)
+        if counts:
+            self.skipped[(item.file_name, lang)] = counts
+            self.metrics.incr("skip.chunks", sum(counts.values()))
+            for reason, count in counts.items():
+                self.metrics.incr(f"skip.{reason}", count)
+            if len(chunks) == sum(counts.values()):
+                self.metrics.incr("skip.items")
+            logger.info("Skipping chunks that need no translation", file=item.file_name, lang=lang, **counts)
+        return reasons
+
+    async def _translate_target(self, item, chunks: List[Chunk], html_replacer: HTMLReplacer, target: Target) -> None:
+        """将同一组分块翻译为一个目标语言，按原顺序组装并还原"""
+        weight = self._item_size(item) / max(len(chunks), 1)
+        skips = self._skip_reasons(item, chunks, target.lang)
+        results = await asyncio.gather(
+            *(
+                self._submit(item, chunk, i, len(chunks), weight, target.lang, skip)
+                for i, (chunk, skip) in enumerate(zip(chunks, skips))
+            )
+        )
+        translated_chunks = [chunk.model_copy(update={"translated": result}) for chunk, result in zip(chunks, results)]
+
+        # 正文中与目录相同的标题使用本语言标题表的译文
+        await target.titles.wait()
+        translated = await run_blocking_io(
+            html_replacer.restore, self.html_builder.build(translated_chunks), target.titles
+        )
+        await self._store_translated(target, item, translated)
+        await self._emit(ItemRestored(item_id=item.id, file_name=item.file_name, lang=target.lang, content=translated))
+
+    def _prepare(self, content: str) -> Tuple[HTMLReplacer, List[Chunk]]:
+        """占位符替换并分块（阻塞操作）；翻译和 prepare_book 使用相同的参数，预处理缓存的键一致"""
+        return prepare(
+            content,
+            self.html_splitter,
+            self._chunk_tokens(content),
+            titles=self.titles,
+            titles_key=self.titles_key,
+            cache=self.artifacts,
+        )
+
+    async def _collect_titles(self, book) -> list:
+        """目录、导航文档中的标签收集到标题表，返回导航文档"""
+        nav_items = [
+            item for item in book.items if item.is_navigation and item.item_type == ebooklib.ITEM_DOCUMENT
+        ]
+        self.titles.collect_toc(book.book.toc)
+        for item in nav_items:
+            await run_blocking_io(self.titles.collect_nav, await self._load_content(item))
+        self.titles_key = self.titles.fingerprint()
+        return nav_items
+
+    async def prepare_book(self, book) -> List[Tuple[object, List[Chunk]]]:
+        """
+        只做预处理（收集标题、占位符替换和分块），不翻译：返回每个可翻译文档及其分块。
+        与翻译共用预处理缓存，供 simulate 估算耗时。
+        """
+        await self._collect_titles(book)
+        prepared = []
+        for item in book.items:
+            if item.is_translatable and not item.is_navigation:
+                _, chunks = await run_blocking_io(self._prepare, await self._load_content(item))
+                prepared.append((item, chunks))
+        return prepared
+
+    async def _translate_item(self, item, targets: List[Target]) -> None:
+        """翻译单个文档：占位符替换、分块只做一次，分块按目标语言分别提交调度器翻译后还原"""
+        content = await self._load_content(item)
+        # 文档在处理期间的工作集约为原文的数倍（soup、替换结果、分块，以及每种语言的译文）
+        async with self.memory_budget.reserve(len(content) * (2 + 2 * len(targets))):
+            html_replacer, chunks = await run_blocking_io(self._prepare, content)
+            for chunk in chunks:
+                chunk.file_id = item.file_name
+            languages = [target.lang for target in targets]
+            await self._emit(ItemStarted(item.id, item.file_name, chunks=len(chunks), languages=languages))
+            await asyncio.gather(*(self._translate_target(item, chunks, html_replacer, target) for target in targets))
+
+    async def _store_translated(self, target: Target, item, translated: str) -> None:
+        if self.spool is not None:
+            # 译文写入暂存区后立即释放，构建时再从磁盘读取
+            await self.spool.put_async(f"{target.spool_prefix}{item.id}", translated)
         else:
-            return original_toc
+            target.translations[item.id] = translated
+        if target.progressive is not None:
+            target.progressive.mark(item)
 
-    async def translate_toc(self, book):
-        try:
-            toc_content = self.epub_parser.parse_toc(toc=book.toc)
-            print(f"toc_content: {toc_content}")
-            translated = await self.translator.translate(json.dumps(toc_content))
-            translated = translated.strip()
-            print(f"translated is: {translated}")
-            translated = json.loads(translated)
-            self._update_toc(book.toc, translated)
-        except Exception as e:
-            print("TOC translate error.")
+    async def _localize_navigation(self, target: Target, nav_items) -> None:
+        """将标题表的译文写回本语言的目录副本（用于生成 NCX）和导航文档，不再单独请求翻译"""
+        await target.titles.wait()
+        target.titles.apply_toc(target.toc)
+        for item in nav_items:
+            content = await self._load_content(item)
+            await self._store_translated(target, item, await run_blocking_io(target.titles.localize_nav, content))
+
+    def _raise_concurrency(self) -> Optional[str]:
+        current = self.scheduler.concurrency
+        concurrency = max(current, settings.DEADLINE_MAX_CONCURRENCY)
+        if concurrency <= current:
+            return None
+        self.scheduler.resize(concurrency)
+        self.translator.raise_concurrency(concurrency)
+        return f"concurrency {current} -> {concurrency}"
+
+    def _switch_to_fast_tier(self) -> Optional[str]:
+        if not settings.DEADLINE_FAST_TIER:
+            return None
+        provider = parse_tier(settings.DEADLINE_FAST_TIER)
+        # 按后端和模型比较：已经只用该模型时不算一次调整
+        if [(tier.name, tier.model) for tier in self.translator.tiers] == [(provider.name, provider.model)]:
+            return None
+        self.translator.use_provider(provider)
+        return f"provider -> {provider.name}/{provider.model}"
+
+    def _enlarge_chunks(self) -> Optional[str]:
+        if self.chunk_boost > 1:
+            return None
+        # 只影响尚未拆分的文档
+        self.chunk_boost = 2
+        return f"chunk tokens x2 (up to {settings.DEADLINE_MAX_CHUNK_TOKENS})"
+
+    def _create_planner(self, pending) -> DeadlinePlanner:
+        return DeadlinePlanner(
+            self.deadline_at - time.monotonic(),
+            total=sum(self._item_size(item) * len(targets) for item, targets in pending),
+            actions=[self._raise_concurrency, self._switch_to_fast_tier, self._enlarge_chunks],
+            expire=lambda: self.scheduler.expire(mark_untranslated),
+            reserve=settings.DEADLINE_BUILD_RESERVE,
+            interval=settings.DEADLINE_CHECK_INTERVAL,
+            cooldown=settings.DEADLINE_COOLDOWN,
+            metrics=self.metrics,
+        )
+
+    async def _update_progressive(self) -> None:
+        """渐进输出的后台任务：每隔一段时间把新完成的文档写入输出文件"""
+        while True:
+            await asyncio.sleep(self.progressive_interval)
+            for target in self.targets:
+                dirty = target.progressive.take()
+                if not dirty:
+                    continue
+                started = time.monotonic()
+                await run_blocking_io(target.progressive.flush, dirty)
+                self.metrics.incr("progressive.snapshots")
+                self.metrics.incr("progressive.documents", len(dirty))
+                self.metrics.observe("progressive.write_seconds", time.monotonic() - started)
+                logger.info("Partial output updated", documents=len(dirty), output=target.output_file)
 
     async def translate(self, book) -> None:
         """翻译 EPUB 内容"""
-        await self.translate_toc(book=book.book)
-        # 获取所有可翻译项
-        translatable_items = [item for item in book.items if item.is_translatable]
+        spine = [entry[0] if isinstance(entry, tuple) else entry for entry in book.book.spine]
+        self.document_order = {idref: i for i, idref in enumerate(spine)}
 
-        # 创建进度条
-        with tqdm(translatable_items, desc="翻译进度", unit="文件") as pbar:
-            for item in pbar:
-                # 如果启用了断点续传且已处理过，则跳过
-                if self.enable_resume and item.file_name in self.processed_files:
-                    pbar.set_postfix_str(f"跳过已处理: {item.file_name}")
-                    continue
+        # 目录、导航文档中的标签先收集到标题表，与正文一起由调度器翻译；其他语言的标题表沿用同一份原文
+        nav_items = await self._collect_titles(book)
+        for target in self.targets:
+            target.toc = copy.deepcopy(book.book.toc)
+            if target.titles is not self.titles:
+                target.titles.extend(self.titles)
 
-                pbar.set_postfix_str(f"正在处理: {item.file_name}")
+        # 获取所有可翻译项（导航文档和 NCX 由标题表处理）
+        translatable_items = [item for item in book.items if item.is_translatable and not item.is_navigation]
+        # 如果启用了断点续传且已处理过，则跳过；每个文档只翻译到尚未完成的语言
+        pending = []
+        for item in translatable_items:
+            targets = [
+                target
+                for target in self.targets
+                if not (self.enable_resume and item.file_name in target.processed_files)
+            ]
+            if targets:
+                pending.append((item, targets))
+        item_semaphore = asyncio.Semaphore(settings.ITEM_CONCURRENCY)
+        if self.deadline_at is not None:
+            self.planner = self._create_planner(pending)
 
-                parser = "html.parser"
-                if "nav.xhtml" in item.file_name:
-                    parser = "lxml"
-                html_replacer = HTMLReplacer(parser)
-                content = html_replacer.replace(item.content)
-                chunks = self.html_splitter.split(content)
-                translated_chunks = []
+        # 创建进度条
+        with tqdm(
+            total=len(translatable_items),
+            initial=len(translatable_items) - len(pending),
+            desc="翻译进度",
+            unit="文件",
+            disable=self.job is not None,
+        ) as pbar:
 
-                # 分块翻译
-                for chunk in chunks:
-                    chunk.translated = await self.translator.translate(chunk.content)
-                    translated_chunks.append(chunk)
+            async def run(item, targets: List[Target]) -> None:
+                async with item_semaphore:
+                    await self._checkpoint()
+                    await self._translate_item(item, targets)
 
-                item.translated = html_replacer.restore(
-                    self.html_builder.build(translated_chunks)
-                )
+                # 标记为已处理（截止时间到达后完成的文档可能含未翻译的部分，留待续传）
+                expired = self.planner is not None and self.planner.expired
+                if self.enable_resume and self.resume and not expired and not self.exporting:
+                    for target in targets:
+                        await self.resume.mark_file_processed_async(target.resume_key, item.file_name)
+                        target.processed_files.add(item.file_name)
+                pbar.set_postfix_str(f"已完成: {item.file_name}")
+                pbar.update(1)
 
-                # 标记为已处理
-                if self.enable_resume and self.resume:
-                    self.resume.mark_file_processed(self.input_epub, item.file_name)
-                    self.processed_files.add(item.file_name)
+            async with self.scheduler:
+                monitor = asyncio.create_task(self.planner.run()) if self.planner is not None else None
+                writer = asyncio.create_task(self._update_progressive()) if self.progressive_interval > 0 else None
+                try:
+                    # 标题批次与正文分块一起进入调度队列，不再是正文翻译前的串行步骤
+                    await asyncio.gather(
+                        *(target.titles.translate() for target in self.targets),
+                        *(self._localize_navigation(target, nav_items) for target in self.targets),
+                        *(run(item, targets) for item, targets in pending),
+                    )
+                finally:
+                    if writer is not None:
+                        writer.cancel()
+                    if monitor is not None:
+                        monitor.cancel()
+                        self.planner.finish()
+
+    async def export_batch(self, path: str, fmt: BatchFormat = "mistral") -> int:
+        """
+        导出批量接口的输入文件：流程照常解析、替换和分块（断点续传已完成的文档和不需要翻译的分块不导出），
+        但不发送请求、不记录续传状态、不构建 EPUB。返回导出的请求数。
+        """
+        exporter = BatchExporter(
+            lambda text, lang: self.translator.build_messages(text, "English", language_name(lang or self.target_lang)),
+            prompt=self.translator.prompt.key,
+            metrics=self.metrics,
+        )
+        # 导出时不审校
+        review, self.scheduler.review = self.scheduler.review, None
+        self.scheduler.lookup = exporter.lookup
+        self.exporting = True
+        self.progressive_interval = 0
+        try:
+            book = await run_blocking_io(self.epub_parser.parse)
+            await self.translate(book)
+            count = await run_blocking_io(exporter.write, path, self.translator.provider.model, fmt)
+        finally:
+            self.exporting = False
+            self.scheduler.review = review
+            self.scheduler.lookup = self.batch.lookup if self.batch is not None else None
+        logger.info("Batch requests exported", path=path, requests=count, chunks=int(self.metrics.get("scheduler.chunks")))
+        return count
 
     async def process(self) -> None:
         """
         运行 EPUB 翻译工作流。
         """
-        # 解析 EPUB 文件
-        book = self.epub_parser.parse()
+        self.loop_monitor.start()
+        self.profiler.start()
+        # 本次运行的请求（包括调度器中的任务）把连接建立耗时记入 self.metrics
+        metrics_token = http_metrics.set(self.metrics)
+        try:
+            # 解析 EPUB 文件（阻塞的 zip 读取在线程池中执行）
+            book = await run_blocking_io(self.profiler.wrap("parse", self.epub_parser.parse, memory=True))
+            if self.enable_spool:
+                self.spool = Spool(settings.SPOOL_DIR)
+                await run_blocking_io(self._spool_book, book)
+            if self.progressive_interval > 0:
+                for target in self.targets:
+                    target.progressive = ProgressiveOutput(
+                        book,
+                        target.output_file,
+                        spool=self.spool,
+                        pending=settings.PROGRESSIVE_PENDING,
+                        notice=settings.PROGRESSIVE_NOTICE,
+                        language=target.lang,
+                        translations=target.translations,
+                        spool_prefix=target.spool_prefix,
+                    )
+                    # 断点续传跳过的文档不显示提示
+                    skipped = [
+                        item.id for item in book.items if self.enable_resume and item.file_name in target.processed_files
+                    ]
+                    await run_blocking_io(target.progressive.start, skipped)
 
-        # 翻译
-        await self.translate(book)
+            # 翻译
+            with self.profiler.stage("translate"):
+                await self.translate(book)
 
-        # 构建新的 EPUB 文件
-        epub_builder = EpubBuilder(book, self.output_file)
-        epub_builder.build()
-        print(f"翻译完成，输出文件: {self.output_file}")
+            # 每个目标语言构建一个 EPUB 文件
+            for target in self.targets:
+                epub_builder = EpubBuilder(book, target.output_file, spool=self.spool, **target.builder_options())
+                stage = "build" if len(self.targets) == 1 else f"build-{target.lang}"
+                await run_blocking_io(self.profiler.wrap(stage, epub_builder.build, memory=True))
+                await self._emit(BookBuilt(lang=target.lang, output_file=target.output_file))
+        finally:
+            http_metrics.reset(metrics_token)
+            self.profiler.stop()
+            self.loop_monitor.stop()
+            logger.info("Event loop lag", **self.loop_monitor.summary())
+            if self.tuner is not None:
+                await run_blocking_io(self.tuner.save)
+            self.metrics.log()
+            if self.spool is not None:
+                logger.info(
+                    "Spool released",
+                    spooled_bytes=self.spool.bytes_written,
+                    budget_peak=self.memory_budget.peak,
+                    peak_rss_mb=round(peak_rss_mb(), 1),
+                )
+                self.spool.close()
+                self.spool = None
+        saved = self.metrics.get("singleflight.saved_requests")
+        if saved:
+            self._print(
+                f"重复分块合并: 节省 {int(saved)} 次请求，"
+                f"{int(self.metrics.get('singleflight.saved_tokens'))} 个 token"
+            )
+        overhead = int(self.metrics.get("prompt.overhead_tokens"))
+        if overhead:
+            content_tokens = int(self.metrics.get("prompt.content_tokens"))
+            self._print(
+                f"提示词开销: {overhead} 个 token（原文 {content_tokens} 个，"
+                f"开销占输入的 {overhead / (overhead + content_tokens):.1%}）"
+            )
+        skipped = int(self.metrics.get("skip.chunks"))
+        if skipped:
+            self._print(f"不需要翻译: 跳过 {skipped} 个分块（{int(self.metrics.get('skip.items'))} 个文档全部跳过）")
+        if self.reviewer is not None:
+            reviewed = int(self.metrics.get("review.chunks"))
+            calls = int(self.metrics.get("review.calls"))
+            self._print(
+                f"审校: {calls}/{reviewed} 个分块（{calls / max(reviewed, 1):.1%}），"
+                f"修改 {int(self.metrics.get('review.revised'))} 个"
+            )
+        if self.batch is not None:
+            self._print(
+                f"批量结果: 使用 {int(self.metrics.get('batch.used'))} 个分块，"
+                f"{int(self.metrics.get('batch.invalid'))} 个未通过校验、"
+                f"{int(self.metrics.get('batch.missing'))} 个缺失的分块已重新翻译"
+            )
+        expired = int(self.metrics.get("scheduler.expired"))
+        if expired:
+            self._print(f"已到截止时间: {expired} 个分块未翻译，保留原文并以 <!-- epubot:untranslated --> 注释标记")
+        self._print(f"翻译完成，输出文件: {', '.join(target.output_file for target in self.targets)}")
@@ -0,0 +1,169 @@
+import asyncio
+import html
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from epubot.config.logger import logger
+from epubot.config.settings import settings
+from epubot.services.metrics import RunMetrics
+
+# 截止时间到达后仍未翻译的分块原样保留，并用注释包裹标记（供程序识别），开头加一段读者可见的提示
+UNTRANSLATED_BEGIN = "<!-- epubot:untranslated -->"
+UNTRANSLATED_END = "<!-- /epubot:untranslated -->"
+UNTRANSLATED_CLASS = "epubot-untranslated"
+
+DURATION_PATTERN = re.compile(r"^(?:(\d+(?:\.\d+)?)h)?(?:(\d+(?:\.\d+)?)m)?(?:(\d+(?:\.\d+)?)s)?$")
+CLOCK_PATTERN = re.compile(r"^(\d{1,2}):(\d{2})$")
+XML_DECLARATION_PATTERN = re.compile(r"^\s*<\?xml[^>]*\?>")
+BODY_OPEN_PATTERN = re.compile(r"<body[^>]*>", re.IGNORECASE)
+
+
+def parse_deadline(value: str, now: Optional[datetime] = None) -> float:
+    """
+    解析 --deadline 参数，返回距离截止时间的秒数。
+    支持时长（3600、90m、1h30m）和当天的时刻（18:00，已过则为次日）。
+    """
+    value = value.strip().lower()
+    clock = CLOCK_PATTERN.match(value)
+    if clock:
+        now = now or datetime.now()
+        target = now.replace(hour=int(clock.group(1)), minute=int(clock.group(2)), second=0, microsecond=0)
+        if target <= now:
+            target += timedelta(days=1)
+        return (target - now).total_seconds()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    duration = DURATION_PATTERN.match(value)
+    if not value or not duration:
+        raise ValueError(f"invalid deadline: {value!r}")
+    hours, minutes, seconds = (float(part or 0) for part in duration.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def mark_untranslated(content: str, notice: Optional[str] = None) -> str:
+    """
+    标记未翻译的分块。
+    notice 为读者可见的提示（默认 settings.DEADLINE_UNTRANSLATED_NOTICE，为空时只加注释）；
+    分块是完整文档时提示放在 <body> 开头。
+    """
+    # XML 声明必须位于文档开头，标记放在声明之后
+    declaration = XML_DECLARATION_PATTERN.match(content)
+    prolog = declaration.group(0) if declaration else ""
+    content = content[len(prolog):]
+    notice = settings.DEADLINE_UNTRANSLATED_NOTICE if notice is None else notice
+    if notice:
+        paragraph = f'<p class="{UNTRANSLATED_CLASS}">{html.escape(notice)}</p>'
+        body = BODY_OPEN_PATTERN.search(content)
+        position = body.end() if body else 0
+        content = f"{content[:position]}{paragraph}{content[position:]}"
+    return f"{prolog}{UNTRANSLATED_BEGIN}{content}{UNTRANSLATED_END}"
+
+
+class DeadlinePlanner:
+    """
+    截止时间调度：根据已观测的吞吐量持续预测完成时间，预计超时时按顺序采取措施：
+    1. 提高并发（不超过上限）；
+    2. 剩余分块改用更快的后端或模型；
+    3. 增大尚未拆分文档的分块，减少每个请求的固定开销。
+    每项措施执行后至少观察 cooldown 秒再决定下一项；
+    到达截止时间（预留构建时间）后仍未完成的分块保留原文并标记，保证按时输出。
+
+    进度以原文大小计：total 为待翻译文档的总长度，每个分块完成时 advance() 其所占份额。
+    """
+
+    def __init__(
+        self,
+        budget: float,
+        total: float,
+        actions: Optional[List[Callable[[], Optional[str]]]] = None,
+        expire: Optional[Callable[[], None]] = None,
+        reserve: float = 30.0,
+        interval: float = 5.0,
+        cooldown: float = 30.0,
+        min_progress: float = 0.02,
+        metrics: Optional[RunMetrics] = None,
+    ):
+        self.started = time.monotonic()
+        self.deadline = self.started + budget
+        self.total = total
+        self.done = 0.0
+        # 每个措施返回执行说明；无法执行（已达上限、未配置等）时返回 None，继续尝试下一项
+        self.actions = list(actions or [])
+        self.expire = expire
+        self.reserve = reserve
+        self.interval = interval
+        self.cooldown = cooldown
+        self.min_progress = min_progress
+        self.metrics = metrics or RunMetrics()
+        self.expired = False
+        self.decisions: List[str] = []
+        self._last_action = float("-inf")
+        self.metrics.set("deadline.budget_seconds", round(budget, 1))
+
+    def advance(self, amount: float) -> None:
+        self.done += amount
+
+    def projected_finish(self, now: Optional[float] = None) -> Optional[float]:
+        """按目前的平均吞吐量预测完成时刻（monotonic），进度不足时无法预测"""
+        now = time.monotonic() if now is None else now
+        if self.done >= self.total:
+            return now
+        if self.total <= 0 or self.done / self.total < self.min_progress:
+            return None
+        throughput = self.done / max(now - self.started, 1e-6)
+        return now + (self.total - self.done) / throughput
+
+    def _decide(self, projected: float, now: float) -> None:
+        while self.actions:
+            action = self.actions.pop(0)
+            decision = action()
+            if decision:
+                self._last_action = now
+                self.decisions.append(decision)
+                self.metrics.set("deadline.decisions", list(self.decisions))
+                logger.info(
+                    "Deadline at risk",
+                    decision=decision,
+                    projected_overrun=round(projected - self.deadline, 1),
+                    remaining_seconds=round(self.deadline - now, 1),
+                    progress=round(self.done / self.total, 3),
+                )
+                return
+
+    def check(self, now: Optional[float] = None) -> None:
+        """检查一次进度，必要时执行下一项措施或标记剩余分块过期"""
+        now = time.monotonic() if now is None else now
+        if self.expired:
+            return
+        if now >= self.deadline - self.reserve:
+            self.expired = True
+            self.metrics.set("deadline.expired", True)
+            logger.warning(
+                "Deadline reached, keeping remaining chunks untranslated",
+                progress=round(self.done / self.total, 3) if self.total else 1.0,
+            )
+            if self.expire is not None:
+                self.expire()
+            return
+
+        projected = self.projected_finish(now)
+        if projected is None:
+            return
+        self.metrics.set("deadline.projected_seconds", round(projected - self.started, 1))
+        if projected > self.deadline - self.reserve and now - self._last_action >= self.cooldown:
+            self._decide(projected, now)
+
+    def finish(self) -> None:
+        now = time.monotonic()
+        self.metrics.set("deadline.finished_seconds", round(now - self.started, 1))
+        self.metrics.set("deadline.met", not self.expired and now <= self.deadline)
+
+    async def run(self) -> None:
+        """后台监控任务，在翻译完成后由调用方取消"""
+        while not self.expired:
+            await asyncio.sleep(self.interval)
+            self.check()
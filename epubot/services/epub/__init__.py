@@ -1,7 +1,9 @@
 from .builder import EpubBuilder
 from .parser import EpubParser
+from .progressive import ProgressiveOutput
 
 __all__ = [
     "EpubBuilder",
     "EpubParser",
+    "ProgressiveOutput",
 ]
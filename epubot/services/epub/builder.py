@@ -1,32 +1,92 @@
-from typing import List
+import os
+from typing import BinaryIO, Dict, List, Optional, Union
 
 import ebooklib
 from ebooklib import epub
 
 from epubot.schemas.epub import EpubBook, EpubItem
+from epubot.services.spool import Spool, SpooledItem
 
 
 class EpubBuilder:
 
-    def __init__(self, epubook: EpubBook, output: str) -> None:
+    def __init__(
+        self,
+        epubook: EpubBook,
+        output: Union[str, BinaryIO],
+        spool: Optional[Spool] = None,
+        language: str = "zh",
+        toc=None,
+        translations: Optional[Dict[str, str]] = None,
+        spool_prefix: str = "",
+    ) -> None:
         self.origin_book = epubook.book
         self.items: List[EpubItem] = epubook.items
         self.book = epub.EpubBook()
         self.output = output
+        # 启用暂存时，条目内容在写出时才从磁盘逐个读取
+        self.spool = spool
+        # 多目标语言时每种语言一个构建器：各自的目录副本、译文（条目 id -> 译文）和暂存区键前缀
+        self.language = language
+        self.toc = toc if toc is not None else self.origin_book.toc
+        self.translations = translations if translations is not None else {}
+        self.spool_prefix = spool_prefix
+
+    def spool_key(self, item: EpubItem) -> Optional[str]:
+        """条目在暂存区中的键：优先使用本语言的译文，其次是原文"""
+        if self.spool is None:
+            return None
+        for key in (f"{self.spool_prefix}{item.id}", item.id):
+            if key in self.spool:
+                return key
+        return None
+
+    def content(self, item: EpubItem) -> Union[str, bytes]:
+        """条目的输出内容：本语言的译文、条目上的译文或原文"""
+        key = self.spool_key(item)
+        if key is not None:
+            return self.spool.get(key)
+        if item.id in self.translations:
+            return self.translations[item.id]
+        return item.translated if item.translated else item.content
+
+    def _ensure_toc_uids(self, toc, counter=None) -> None:
+        """ebooklib 生成 NCX 时以 uid 作为 navPoint id，从 nav 文档读取的目录项可能没有 uid"""
+        counter = counter if counter is not None else [0]
+        for entry in toc:
+            if isinstance(entry, (list, tuple)):
+                self._ensure_toc_uids(entry, counter)
+            elif isinstance(entry, (epub.Link, epub.Section)):
+                counter[0] += 1
+                if not getattr(entry, "uid", None):
+                    entry.uid = f"navpoint-{counter[0]}"
 
     def build(self) -> None:
         self.book.metadata = self.origin_book.metadata
-        self.book.set_language("zh")
-        self.book.toc = self.origin_book.toc
+        # NCX 的 dtb:uid 和 docTitle 取自这两个属性
+        self.book.uid = self.origin_book.uid
+        self.book.title = self.origin_book.title
+        self.book.set_language(self.language)
+        self.book.toc = self.toc
+        self._ensure_toc_uids(self.book.toc)
         self.book.spine = self.origin_book.spine
 
         for item in self.items:
-            if item.item_type == ebooklib.ITEM_DOCUMENT:
+            key = self.spool_key(item)
+            if key is not None and item.item_type != ebooklib.ITEM_NAVIGATION:
+                c = SpooledItem(
+                    self.spool,
+                    key,
+                    uid=item.id,
+                    file_name=item.file_name,
+                    media_type=item.media_type,
+                )
+            elif item.item_type == ebooklib.ITEM_DOCUMENT:
                 c = epub.EpubItem(
                     uid=item.id,
                     file_name=item.file_name,
                     media_type=item.media_type,
-                    content=item.translated if item.translated else item.content,
+                    content=self.content(item),
                 )
             elif item.item_type == ebooklib.ITEM_IMAGE:
                 c = epub.EpubImage(
@@ -36,11 +96,8 @@ class EpubBuilder:
                     content=item.content,
                 )
             elif item.item_type == ebooklib.ITEM_NAVIGATION:
-                c = epub.EpubNav(
-                    uid=item.id,
-                    file_name=item.file_name,
-                    media_type=item.media_type,
-                )
+                # NCX 由 ebooklib 根据（已翻译的）目录重新生成
+                c = epub.EpubNcx(uid=item.id, file_name=item.file_name)
             else:
                 c = epub.EpubItem(
                     uid=item.id,
@@ -48,12 +105,17 @@ class EpubBuilder:
                     media_type=item.media_type,
                     content=item.content,
                 )
+            if item.is_navigation and item.item_type == ebooklib.ITEM_DOCUMENT:
+                # 导航文档保留本地化后的原有内容，manifest 中仍需标记为 nav
+                c.properties = ["nav"]
             self.book.add_item(c)
-        epub.write_epub(
-            self.output,
-            self.book,
-            {"pretty_print": True},
-        )
+        if not isinstance(self.output, str):
+            epub.write_epub(self.output, self.book, {"pretty_print": True})
+            return
+        # 先写临时文件再替换，渐进输出时读者不会看到写了一半的文件
+        tmp_file = f"{self.output}.tmp"
+        epub.write_epub(tmp_file, self.book, {"pretty_print": True})
+        os.replace(tmp_file, self.output)
 
 
 if __name__ == "__main__":
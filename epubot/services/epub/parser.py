@@ -48,6 +48,7 @@ class EpubParser:
                 manifest=item.manifest,
                 content=content,
                 item_type=item.get_type(),
+                is_navigation=isinstance(item, epub.EpubNav),
             )
             epub_items.append(item)
         return epub_items
@@ -0,0 +1,187 @@
+import io
+import os
+import re
+import struct
+import time
+import zipfile
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+import ebooklib
+
+from epubot.schemas.epub import EpubBook, EpubItem
+from epubot.services.epub.builder import EpubBuilder
+from epubot.services.spool import Spool
+
+BODY_PATTERN = re.compile(r"(<body[^>]*>).*(</body>)", re.DOTALL | re.IGNORECASE)
+
+
+def pending_notice(content: Union[str, bytes], notice: str) -> str:
+    """将尚未翻译的文档正文替换为提示"""
+    if isinstance(content, bytes):
+        content = content.decode("utf-8")
+    return BODY_PATTERN.sub(lambda m: f'{m.group(1)}<p class="epubot-pending">{notice}</p>{m.group(2)}', content, 1)
+
+
+@dataclass
+class ZipMember:
+    """已压缩的 zip 成员，写入快照时原样复制"""
+
+    name: str
+    method: int
+    crc: int
+    compressed_size: int
+    size: int
+    dos_time: int
+    dos_date: int
+    data: bytes
+
+
+class ZipSnapshot:
+    """
+    保存 zip 中每个成员的压缩数据。更新成员时只压缩新内容，
+    写出时其余成员直接复制压缩后的字节，不再重新序列化和压缩。
+    """
+
+    def __init__(self, members: Iterable[ZipMember]):
+        self.members: Dict[str, ZipMember] = {member.name: member for member in members}
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "ZipSnapshot":
+        members: List[ZipMember] = []
+        with zipfile.ZipFile(io.BytesIO(payload)) as archive:
+            for info in archive.infolist():
+                # 本地文件头长度 30 字节，其后是文件名和扩展字段
+                offset = info.header_offset
+                name_length, extra_length = struct.unpack("<HH", payload[offset + 26 : offset + 30])
+                start = offset + 30 + name_length + extra_length
+                year, month, day, hour, minute, second = info.date_time
+                members.append(
+                    ZipMember(
+                        name=info.filename,
+                        method=info.compress_type,
+                        crc=info.CRC,
+                        compressed_size=info.compress_size,
+                        size=info.file_size,
+                        dos_time=(hour << 11) | (minute << 5) | (second // 2),
+                        dos_date=((year - 1980) << 9) | (month << 5) | day,
+                        data=payload[start : start + info.compress_size],
+                    )
+                )
+        return cls(members)
+
+    def put(self, name: str, content: bytes) -> None:
+        """替换（或追加）成员内容，只压缩这一个成员"""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        data = compressor.compress(content) + compressor.flush()
+        now = time.localtime()
+        self.members[name] = ZipMember(
+            name=name,
+            method=8,
+            crc=zlib.crc32(content),
+            compressed_size=len(data),
+            size=len(content),
+            dos_time=(now.tm_hour << 11) | (now.tm_min << 5) | (now.tm_sec // 2),
+            dos_date=((now.tm_year - 1980) << 9) | (now.tm_mon << 5) | now.tm_mday,
+            data=data,
+        )
+
+    def write(self, path: str) -> None:
+        """写入临时文件后原子替换，读者不会看到写了一半的文件"""
+        tmp_path = f"{path}.tmp"
+        central: List[bytes] = []
+        with open(tmp_path, "wb") as f:
+            for member in self.members.values():
+                name = member.name.encode("utf-8")
+                offset = f.tell()
+                header = (20, 0x800, member.method, member.dos_time, member.dos_date)
+                sizes = (member.crc, member.compressed_size, member.size, len(name))
+                f.write(struct.pack("<4sHHHHHIIIHH", b"PK\x03\x04", *header, *sizes, 0))
+                f.write(name)
+                f.write(member.data)
+                central.append(
+                    struct.pack("<4sHHHHHHIIIHHHHHII", b"PK\x01\x02", 20, *header, *sizes, 0, 0, 0, 0, 0, offset)
+                    + name
+                )
+            directory_offset = f.tell()
+            directory = b"".join(central)
+            f.write(directory)
+            count = len(central)
+            f.write(struct.pack("<4sHHHHIIH", b"PK\x05\x06", 0, 0, count, count, len(directory), directory_offset, 0))
+        os.replace(tmp_path, path)
+
+
+class ProgressiveOutput:
+    """
+    渐进输出：翻译过程中定期原子地更新输出 EPUB。
+    已完成的文档使用译文，未完成的文档保留原文（或替换为提示）。
+    首次快照由 EpubBuilder 完整构建，之后每次只压缩新完成的文档，其余成员原样复制；
+    导航和 NCX 在最终构建时才更新。
+    """
+
+    def __init__(
+        self,
+        book: EpubBook,
+        output: str,
+        spool: Optional[Spool] = None,
+        pending: str = "source",
+        notice: str = "",
+        **builder_options,
+    ):
+        self.book = book
+        self.output = output
+        self.spool = spool
+        self.pending = pending
+        self.notice = notice
+        # 传给 EpubBuilder 的目标语言、目录和译文等参数
+        self.builder_options = builder_options
+        self.builder: Optional[EpubBuilder] = None
+        self.snapshot: Optional[ZipSnapshot] = None
+        self.members: Dict[str, str] = {}  # 条目 id -> zip 成员名
+        self.dirty: Set[str] = set()
+        self.writes = 0
+
+    def start(self, translated: Iterable[str] = ()) -> None:
+        """构建并写出首个快照（阻塞操作）；translated 为已完成（如断点续传）的文档 id"""
+        buffer = io.BytesIO()
+        builder = self.builder = EpubBuilder(self.book, buffer, spool=self.spool, **self.builder_options)
+        builder.build()
+        self.snapshot = ZipSnapshot.from_bytes(buffer.getvalue())
+        folder = builder.book.FOLDER_NAME
+        for item in self.book.items:
+            name = f"{folder}/{item.file_name}"
+            if item.item_type == ebooklib.ITEM_DOCUMENT and name in self.snapshot.members:
+                self.members[item.id] = name
+        if self.pending == "notice":
+            done = set(translated)
+            for item in self.book.items:
+                if item.id in self.members and item.is_translatable and not item.is_navigation and item.id not in done:
+                    content = pending_notice(self._content(item), self.notice)
+                    self.snapshot.put(self.members[item.id], content.encode("utf-8"))
+        self.snapshot.write(self.output)
+        self.writes += 1
+
+    def _content(self, item: EpubItem) -> Union[str, bytes]:
+        return self.builder.content(item)
+
+    def mark(self, item: EpubItem) -> None:
+        """文档译文已保存（在事件循环线程中调用）"""
+        if item.id in self.members:
+            self.dirty.add(item.id)
+
+    def take(self) -> Set[str]:
+        dirty, self.dirty = self.dirty, set()
+        return dirty
+
+    def flush(self, dirty: Set[str]) -> int:
+        """将已完成的文档写入新快照（阻塞操作），返回更新的文档数"""
+        if not dirty or self.snapshot is None:
+            return 0
+        items = {item.id: item for item in self.book.items}
+        for item_id in dirty:
+            content = self._content(items[item_id])
+            self.snapshot.put(self.members[item_id], content.encode("utf-8") if isinstance(content, str) else content)
+        self.snapshot.write(self.output)
+        self.writes += 1
+        return len(dirty)
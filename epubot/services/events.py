@@ -0,0 +1,121 @@
+import asyncio
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+
+
+@dataclass(frozen=True)
+class Event:
+    """翻译过程中的事件"""
+
+
+@dataclass(frozen=True)
+class ItemStarted(Event):
+    """文档已完成占位符替换和分块，开始翻译"""
+
+    item_id: str
+    file_name: str
+    chunks: int
+    languages: List[str]
+
+
+@dataclass(frozen=True)
+class ChunkTranslated(Event):
+    """一个分块翻译完成；token 数按本地分词器计算"""
+
+    item_id: str
+    file_name: str
+    lang: str
+    index: int
+    total: int
+    input_tokens: int
+    output_tokens: int
+
+
+@dataclass(frozen=True)
+class ItemRestored(Event):
+    """文档的一个目标语言已还原并保存，content 为还原后的译文"""
+
+    item_id: str
+    file_name: str
+    lang: str
+    content: str
+
+
+@dataclass(frozen=True)
+class BookBuilt(Event):
+    """一个目标语言的 EPUB 已写出"""
+
+    lang: str
+    output_file: str
+
+
+class TranslationJob:
+    """
+    以异步迭代器的形式运行翻译任务，按发生顺序产出事件。
+
+    事件队列有上限：消费者处理不过来时，翻译在发出下一个事件处等待（背压）。
+    pause() 后不再派发新的分块和文档（已发出的请求照常完成），resume() 继续；
+    cancel() 取消任务，迭代随之结束。翻译中的异常在迭代时抛出。
+    """
+
+    def __init__(
+        self, run: Callable[[], Awaitable[None]], maxsize: int = 16, running: Optional[asyncio.Event] = None
+    ):
+        self._run = run
+        self.queue: "asyncio.Queue[Event]" = asyncio.Queue(maxsize)
+        # 与调度器共用：暂停时调度器也停止派发已排队的分块
+        self.running = running or asyncio.Event()
+        self.running.set()
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def paused(self) -> bool:
+        return not self.running.is_set()
+
+    def pause(self) -> None:
+        self.running.clear()
+
+    def resume(self) -> None:
+        self.running.set()
+
+    def cancel(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+        # 暂停中的任务也要能响应取消
+        self.running.set()
+
+    async def emit(self, event: Event) -> None:
+        await self.queue.put(event)
+
+    async def checkpoint(self) -> None:
+        """派发新工作前调用，暂停时在此等待"""
+        await self.running.wait()
+
+    def __aiter__(self) -> AsyncIterator[Event]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[Event]:
+        if self.task is not None:
+            raise RuntimeError("translation job can only be iterated once")
+        self.task = asyncio.create_task(self._run())
+        getter: Optional[asyncio.Future] = None
+        try:
+            while True:
+                getter = asyncio.ensure_future(self.queue.get())
+                done, _ = await asyncio.wait({getter, self.task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    yield getter.result()
+                    continue
+                getter.cancel()
+                # 任务结束后取出剩余的事件
+                while not self.queue.empty():
+                    yield self.queue.get_nowait()
+                if not self.task.cancelled():
+                    self.task.result()
+                return
+        finally:
+            if getter is not None:
+                getter.cancel()
+            if not self.task.done():
+                self.task.cancel()
+                await asyncio.gather(self.task, return_exceptions=True)
@@ -0,0 +1,295 @@
+import csv
+import functools
+import hashlib
+import json
+import os
+import pickle
+import re
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from epubot.config.logger import logger
+from epubot.config.settings import settings
+from epubot.services.languages import language_code
+
+# 中文译文的固定替换（原先写在 Translator._replace_designation 中），中文术语表都包含
+DEFAULT_REPLACEMENTS = {"您": "你", "大型语言模型": " LLM "}
+TAG_PATTERN = re.compile(r"<[^>]*>")
+CACHE_VERSION = 2  # 编译结果的格式变化时递增，旧缓存自动失效
+DEFAULT_LANGUAGE = "zh"  # 没有标明语言的术语（多语言之前的术语表）属于中文
+
+
+@dataclass(frozen=True)
+class Term:
+    """术语：原文、规定的译文（lang 为译文的语言代码），以及需要在译文中统一替换为规定译文的其他译法"""
+
+    source: str
+    target: str
+    variants: Tuple[str, ...] = ()
+    lang: str = DEFAULT_LANGUAGE
+
+
+class Automaton:
+    """
+    Aho-Corasick 自动机：一次扫描找出文本中出现的所有模式串（包括相互重叠的），
+    耗时与文本长度和匹配数成正比，与模式串数量无关。
+    """
+
+    def __init__(self, patterns: List[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[Tuple[int, ...]] = [()]  # 在该状态结束的模式串（含后缀链接上的）
+        self.lengths = [len(pattern) for pattern in patterns]
+        for index, pattern in enumerate(patterns):
+            if pattern:
+                self._insert(pattern, index)
+        self._link()
+
+    def _insert(self, pattern: str, index: int) -> None:
+        state = 0
+        for char in pattern:
+            if char not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(())
+                self.goto[state][char] = len(self.goto) - 1
+            state = self.goto[state][char]
+        self.output[state] += (index,)
+
+    def _link(self) -> None:
+        """按广度优先计算失败链接，并把后缀状态的输出合并进来"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                self.output[child] += self.output[self.fail[child]]
+
+    def search(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """产出 (起始位置, 结束位置, 模式串序号)"""
+        goto, fail, output, lengths = self.goto, self.fail, self.output, self.lengths
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield position + 1 - lengths[index], position + 1, index
+
+
+def _is_word(char: str) -> bool:
+    return char.isascii() and (char.isalnum() or char == "_")
+
+
+def _text_segments(html: str) -> Iterator[Tuple[int, str]]:
+    """标签之间的文本片段及其偏移，术语匹配和替换都不进入标签和属性"""
+    position = 0
+    for match in TAG_PATTERN.finditer(html):
+        if match.start() > position:
+            yield position, html[position : match.start()]
+        position = match.end()
+    if position < len(html):
+        yield position, html[position:]
+
+
+class Glossary:
+    """
+    编译后的单一目标语言（lang）的术语表。原文术语和译文替换项编入同一个自动机：
+    find() 扫描分块原文，只把其中出现的术语放入该分块的提示词；
+    enforce() 扫描译文，把其他译法和固定替换项统一替换为规定的写法。
+    匹配不区分大小写，以字母或数字开头/结尾的模式串需要在单词边界上。
+    """
+
+    def __init__(
+        self, terms: List[Term], replacements: Optional[Dict[str, str]] = None, lang: str = DEFAULT_LANGUAGE
+    ):
+        self.terms = terms
+        self.lang = lang
+        defaults = DEFAULT_REPLACEMENTS if language_code(lang) == "zh" else {}
+        replacements = {**defaults, **(replacements or {})}
+        for term in terms:
+            for variant in term.variants:
+                replacements.setdefault(variant, term.target)
+        self.replacements = list(replacements.items())
+        # 模式串序号小于 len(terms) 的是原文术语，其余是替换项
+        patterns = [term.source.lower() for term in terms] + [variant.lower() for variant, _ in self.replacements]
+        self.automaton = Automaton(patterns)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def _matches(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        lowered = text.lower()
+        # 个别字符小写后长度变化时按原文匹配，保证位置对应
+        haystack = lowered if len(lowered) == len(text) else text
+        for start, end, index in self.automaton.search(haystack):
+            if start > 0 and _is_word(text[start]) and _is_word(text[start - 1]):
+                continue
+            if end < len(text) and _is_word(text[end - 1]) and _is_word(text[end]):
+                continue
+            yield start, end, index
+
+    def find(self, html: str, limit: Optional[int] = None) -> List[Term]:
+        """分块中出现的术语（按首次出现的顺序去重），最多 limit 个"""
+        found: Dict[int, Term] = {}
+        count = len(self.terms)
+        for _, segment in _text_segments(html):
+            for _, _, index in self._matches(segment):
+                if index < count and index not in found:
+                    found[index] = self.terms[index]
+                    if limit is not None and len(found) >= limit:
+                        return list(found.values())
+        return list(found.values())
+
+    def enforce(self, html: str) -> str:
+        """把译文中的其他译法替换为规定写法：同一位置取最长匹配，匹配互不重叠"""
+        count = len(self.terms)
+        parts: List[str] = []
+        position = 0
+        for offset, segment in _text_segments(html):
+            matches = sorted(
+                ((start, end, index) for start, end, index in self._matches(segment) if index >= count),
+                key=lambda match: (match[0], -match[1]),
+            )
+            cursor = 0
+            for start, end, index in matches:
+                if start < cursor:
+                    continue
+                parts.append(html[position : offset + start])
+                parts.append(self.replacements[index - count][1])
+                position = offset + end
+                cursor = end
+        parts.append(html[position:])
+        return "".join(parts)
+
+    @staticmethod
+    def prompt(terms: List[Term]) -> str:
+        """放入提示词的术语说明"""
+        lines = "\n".join(f"- {term.source} => {term.target}" for term in terms)
+        return f"Use these translations for the following terms:\n{lines}"
+
+
+class GlossarySet:
+    """按目标语言分开编译的术语表，get() 取某个目标语言的术语表"""
+
+    def __init__(self, glossaries: Optional[Dict[str, Glossary]] = None):
+        self.glossaries = glossaries or {}
+
+    @classmethod
+    def from_terms(cls, terms: List[Term]) -> "GlossarySet":
+        by_lang: Dict[str, List[Term]] = {}
+        for term in terms:
+            by_lang.setdefault(term.lang, []).append(term)
+        return cls({lang: Glossary(items, lang=lang) for lang, items in by_lang.items()})
+
+    def __len__(self) -> int:
+        return sum(len(glossary) for glossary in self.glossaries.values())
+
+    def get(self, lang: str) -> Glossary:
+        """
+        目标语言（代码或名称）的术语表：先按完整代码（zh-tw），再按主语言（zh）查找，
+        都没有时返回该语言的空术语表（中文仍包含固定替换项）。
+        """
+        code = language_code(lang, primary=False)
+        glossary = self.glossaries.get(code) or self.glossaries.get(language_code(code))
+        if glossary is None:
+            glossary = self.glossaries[code] = Glossary([], lang=code)
+        return glossary
+
+
+def _split_cell(cell: str) -> Tuple[str, Tuple[str, ...]]:
+    """“译文|其他译法|...” 形式的单元格"""
+    values = [value.strip() for value in cell.split("|") if value.strip()]
+    return (values[0], tuple(values[1:])) if values else ("", ())
+
+
+def parse_glossary(path: str) -> List[Term]:
+    """
+    读取术语表文件：
+    .json 为 {原文: 译文}、{原文: {语言代码: 译文}} 或 [{"source", "target", "variants", "lang"}]；
+    .csv/.tsv 每行为 原文、译文，以及可选的其他译法（用 | 分隔）；
+    首行为 source,<语言代码>,... 的表头时按语言分列，每列为 “译文|其他译法|...”。
+    没有标明语言的术语属于中文（DEFAULT_LANGUAGE）。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            data = json.load(f)
+            if isinstance(data, dict):
+                terms = []
+                for source, target in data.items():
+                    targets = target if isinstance(target, dict) else {DEFAULT_LANGUAGE: target}
+                    terms += [
+                        Term(source, value, lang=lang.lower()) for lang, value in targets.items() if source and value
+                    ]
+                return terms
+            return [
+                Term(
+                    entry["source"],
+                    entry["target"],
+                    tuple(entry.get("variants") or ()),
+                    (entry.get("lang") or DEFAULT_LANGUAGE).lower(),
+                )
+                for entry in data
+                if entry.get("source") and entry.get("target")
+            ]
+        delimiter = "\t" if path.endswith(".tsv") else ","
+        terms = []
+        languages: Optional[List[str]] = None
+        for row in csv.reader(f, delimiter=delimiter):
+            if len(row) < 2 or not row[0].strip() or row[0].startswith("#"):
+                continue
+            if languages is None and not terms and row[0].strip().lower() == "source":
+                languages = [cell.strip().lower() for cell in row[1:]]
+                continue
+            source = row[0].strip()
+            if languages is not None:
+                for lang, cell in zip(languages, row[1:]):
+                    target, variants = _split_cell(cell)
+                    if lang and target:
+                        terms.append(Term(source, target, variants, lang))
+                continue
+            variants = tuple(v.strip() for v in row[2].split("|") if v.strip()) if len(row) > 2 else ()
+            terms.append(Term(source, row[1].strip(), variants))
+        return terms
+
+
+def cache_path(path: str, cache_dir: Optional[str] = None) -> Path:
+    """编译结果的缓存文件，以术语表内容的哈希命名，文件修改后自动重新编译"""
+    with open(path, "rb") as f:
+        digest = hashlib.sha1(f.read() + f"v{CACHE_VERSION}".encode()).hexdigest()
+    return Path(os.path.expanduser(cache_dir or settings.GLOSSARY_CACHE_DIR)) / f"{digest}.pickle"
+
+
+def compile_glossary(path: str, cache_dir: Optional[str] = None) -> GlossarySet:
+    """读取编译好的术语表缓存，没有缓存时编译并写入"""
+    cache = cache_path(path, cache_dir)
+    if cache.exists():
+        try:
+            with open(cache, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            logger.warning("Ignoring unreadable glossary cache", cache=str(cache), error=str(e))
+
+    glossary = GlossarySet.from_terms(parse_glossary(path))
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = cache.with_suffix(".tmp")
+    with open(tmp_file, "wb") as f:
+        pickle.dump(glossary, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, cache)
+    logger.info("Glossary compiled", glossary=path, terms=len(glossary), cache=str(cache))
+    return glossary
+
+
+@functools.lru_cache(maxsize=None)
+def load_glossary(path: Optional[str] = None) -> GlossarySet:
+    """术语表（进程内共享），没有指定文件时只包含中文的固定替换项"""
+    if not path:
+        return GlossarySet()
+    return compile_glossary(path)
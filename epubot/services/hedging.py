@@ -0,0 +1,99 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from epubot.services.metrics import RunMetrics
+
+T = TypeVar("T")
+
+
+class Hedger:
+    """
+    请求对冲。
+    请求在最近延迟的指定分位数内仍未返回时，再发送一个副本（同一后端或备用后端），
+    先返回有效结果的一方胜出，其余请求被取消。
+    对冲请求数不超过总请求数的 budget 比例，从而限制额外的配额消耗。
+    未启用对冲时（budget 为 0）仍记录每个请求的延迟，便于对比开启前后的 p99。
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        min_samples: int = 20,
+        min_delay: float = 0.5,
+        budget: float = 0.1,
+        window: int = 200,
+        metrics: Optional[RunMetrics] = None,
+    ):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.budget = budget
+        self.latencies: deque = deque(maxlen=window)
+        self.metrics = metrics or RunMetrics()
+        self.requests = 0
+        self.hedged = 0
+
+    def record(self, latency: float) -> None:
+        self.latencies.append(latency)
+
+    def delay(self) -> Optional[float]:
+        """发送对冲请求前的等待时间；未启用（budget 为 0）或样本不足时不对冲"""
+        if self.budget <= 0 or len(self.latencies) < self.min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        threshold = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))]
+        return max(threshold, self.min_delay)
+
+    def _acquire(self) -> bool:
+        if self.hedged + 1 > self.budget * self.requests:
+            self.metrics.incr("hedge.budget_exhausted")
+            return False
+        self.hedged += 1
+        return True
+
+    async def run(
+        self,
+        primary: Callable[[], Awaitable[T]],
+        backup: Callable[[], Awaitable[T]],
+        tokens: int = 0,
+    ) -> T:
+        """
+        执行 primary，超过对冲阈值后追加 backup。
+        失败（包括未通过校验）的一方不会胜出；双方都失败时抛出最后一个异常。
+        """
+        self.requests += 1
+        started = time.monotonic()
+        primary_task = asyncio.ensure_future(primary())
+        tasks = {primary_task: "primary"}
+        try:
+            delay = self.delay()
+            if delay is not None:
+                done, _ = await asyncio.wait({primary_task}, timeout=delay)
+                if not done and self._acquire():
+                    tasks[asyncio.ensure_future(backup())] = "hedge"
+                    self.metrics.incr("hedge.sent")
+                    # 副本重复发送了整个输入，被取消一方的部分输出不计入
+                    self.metrics.incr("hedge.extra_tokens", tokens)
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    latency = time.monotonic() - started
+                    winner = tasks[task]
+                    self.record(latency)
+                    self.metrics.observe("request.latency_seconds", latency)
+                    if len(tasks) > 1:
+                        self.metrics.incr(f"hedge.{winner}_wins")
+                    return task.result()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
@@ -1,11 +1,12 @@
-import re
+import html
 import secrets
 import string
 from typing import Dict
 
-from bs4 import BeautifulSoup, Tag
+from bs4 import BeautifulSoup, NavigableString, Tag
 
 from epubot.config.logger import logger
+from epubot.services.singleflight import PLACEHOLDER_PATTERN
 
 
 class Placeholder:
@@ -80,9 +81,28 @@ class HTMLReplacer:
         "note",
     }
 
-    def __init__(self, parser: str = "html.parser"):
+    HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self, parser: str = "html.parser", titles=None):
         self.parser = parser
         self.placeholder = Placeholder()
+        # 共享标题表（TitleTable）：与目录标题相同的正文标题不再随正文翻译，
+        # 还原时直接使用标题表中的译文
+        self.titles = titles
+        self.title_holders: Dict[str, str] = {}  # 占位符 -> 标题原文
+
+    def _replace_heading(self, child: Tag) -> bool:
+        strings = [s for s in child.find_all(string=True) if s.strip()]
+        if len(strings) != 1 or type(strings[0]) is not NavigableString or strings[0] not in self.titles:
+            return False
+        text = str(strings[0])
+        # 标题文本先替换为占位符本身，得到保留原有标记的模板
+        holder = self.placeholder._generate_placeholder(child)
+        strings[0].replace_with(holder)
+        self.placeholder.placer_map[holder] = str(child)
+        self.title_holders[holder] = text
+        child.replace_with(holder)
+        return True
 
     def _replace(self, node):
         # from bs4 import Tag
@@ -91,6 +111,8 @@ class HTMLReplacer:
                 if child.name in self.IGNORE_TAGS:
                     placeholder = self.placeholder._generate_placeholder(child)
                     child.replace_with(placeholder)
+                elif child.name in self.HEADING_TAGS and self.titles is not None and self._replace_heading(child):
+                    continue
                 else:
                     self._replace(child)
         return str(node)
@@ -99,12 +121,22 @@ class HTMLReplacer:
         soup = BeautifulSoup(content, self.parser)
         return self._replace(soup)
 
-    def restore(self, content: str) -> str:
-        for placeholder, original_content in self.placeholder.placer_map.items():
+    def restore(self, content: str, titles=None) -> str:
+        """
+        还原占位符。titles 为本次使用的标题表（多语言时每种语言一份），默认使用构造时的标题表；
+        不修改占位符表，同一次替换的结果可以按不同语言多次还原。
+        """
+        titles = titles if titles is not None else self.titles
+        placer_map = dict(self.placeholder.placer_map)
+        for holder, text in self.title_holders.items():
+            translated = html.escape(titles.get(text), quote=False)
+            placer_map[holder] = placer_map[holder].replace(holder, translated)
+
+        for placeholder, original_content in placer_map.items():
             content = content.replace(placeholder, original_content)
 
         # Optional: Check for any remaining placeholder
-        remaining_placeholders = re.findall(r"{{[a-f0-9]+}}", content)
+        remaining_placeholders = PLACEHOLDER_PATTERN.findall(content)
         if remaining_placeholders:
             logger.warning(
                 "Found remaining placeholder comments after restoration",
@@ -1,8 +1,8 @@
 import re
-
-import tiktoken
+from typing import Optional
 
 from epubot.schemas.chunk import Chunk
+from epubot.services.html.tokenizer import get_encoding
 
 
 class HTMLSplitter:
@@ -11,23 +11,27 @@ class HTMLSplitter:
     prioritizing splitting at the end of closing HTML tags within the token limit.
     """
 
-    def __init__(self, count: int = 6000):
+    def __init__(self, count: int = 6000, encoding: Optional[str] = None):
         # Count is now the maximum token count per chunk
         if not isinstance(count, int) or count <= 0:
             raise ValueError("count must be a positive integer token count")
         self.count = count
         # Regex to find closing tags (e.g., </p>, </div>)
         self.tag_pattern = re.compile(r"</[^>]+>")
-        # Tokenizer for counting tokens
+        # Tokenizer for counting tokens, loaded lazily from the local cache
         # Using cl100k_base is standard for general text
-        self.tokenizer = tiktoken.get_encoding("cl100k_base")
+        self.encoding = encoding
+
+    @property
+    def tokenizer(self):
+        return get_encoding(self.encoding)
 
     def get_token_count(self, content: str) -> int:
         if not content:
             return 0
         return len(self.tokenizer.encode(content))
 
-    def split(self, html: str) -> list[Chunk]:
+    def split(self, html: str, count: Optional[int] = None) -> list[Chunk]:
         """
         Splits the provided HTML string into Chunk objects.
 
@@ -36,12 +40,14 @@ class HTMLSplitter:
 
         Args:
             html: The input HTML content as a string.
+            count: Optional token limit for this call, overriding self.count.
 
         Returns:
             A list of Chunk objects.
         """
         if not isinstance(html, str):
             raise ValueError("html content must be a string")
+        limit = count or self.count
 
         chunks: list[Chunk] = []  # List to store the resulting chunks
         pos = 0  # Current position in the HTML string
@@ -55,7 +61,7 @@ class HTMLSplitter:
                 current_substring = html[pos:i]
                 token_count = self.get_token_count(current_substring)
 
-                if token_count <= self.count:
+                if token_count <= limit:
                     token_limit_char_end = i
                 else:
                     break
@@ -0,0 +1,88 @@
+import functools
+import hashlib
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import List, Optional
+
+from epubot.config.logger import logger
+from epubot.config.settings import settings
+
+# tiktoken 下载 BPE 文件的地址，本地缓存文件名为该地址的 sha1
+TIKTOKEN_BLOBS = {
+    "cl100k_base": "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken",
+    "o200k_base": "https://openaipublic.blob.core.windows.net/encodings/o200k_base.tiktoken",
+}
+
+
+class ApproximateEncoding:
+    """
+    离线兜底的近似分词器。
+    当本地没有 tiktoken 缓存且无法联网时使用：按单词、标点和 CJK 单字切分，
+    对英文文本的计数与 cl100k_base 大致相当（偏保守），足以用于分块。
+    """
+
+    name = "approximate"
+    pattern = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]|[A-Za-z]{1,8}|\d{1,3}|\s+|[^\sA-Za-z\d]")
+
+    def encode(self, text: str, **kwargs) -> List[str]:
+        return self.pattern.findall(text)
+
+
+def cache_dir() -> Path:
+    """返回 tiktoken 缓存目录，优先使用环境变量 TIKTOKEN_CACHE_DIR"""
+    return Path(os.environ.get("TIKTOKEN_CACHE_DIR") or os.path.expanduser(settings.TIKTOKEN_CACHE_DIR))
+
+
+def cache_path(name: str) -> Path:
+    """返回编码 name 在本地缓存中的文件路径（与 tiktoken 的缓存命名一致）"""
+    if name not in TIKTOKEN_BLOBS:
+        raise ValueError(f"unknown tiktoken encoding: {name}")
+    return cache_dir() / hashlib.sha1(TIKTOKEN_BLOBS[name].encode()).hexdigest()
+
+
+def seed_cache(source: str, name: str = "cl100k_base") -> Path:
+    """
+    使用本地的 .tiktoken 文件预置缓存，之后即可完全离线加载分词器。
+    Args:
+        source: 下载好的 BPE 文件路径（例如 cl100k_base.tiktoken）
+        name: 编码名称
+    Returns:
+        缓存文件路径
+    """
+    target = cache_path(name)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(source, target)
+    get_encoding.cache_clear()
+    return target
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(name: Optional[str] = None, fallback: Optional[bool] = None):
+    """
+    按需加载分词器，结果在进程内缓存。
+
+    tiktoken 会从 TIKTOKEN_CACHE_DIR 读取 BPE 文件，缓存缺失时才访问网络
+    （TOKENIZER_OFFLINE 为真时不访问网络）；如果仍然加载失败且允许兜底，则返回 ApproximateEncoding。
+    """
+    name = name or settings.TOKENIZER_ENCODING
+    fallback = settings.TOKENIZER_FALLBACK if fallback is None else fallback
+    os.environ.setdefault("TIKTOKEN_CACHE_DIR", str(cache_dir()))
+
+    import tiktoken
+
+    try:
+        if settings.TOKENIZER_OFFLINE and name in TIKTOKEN_BLOBS and not cache_path(name).exists():
+            raise FileNotFoundError(f"tokenizer cache missing: {cache_path(name)}")
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        if not fallback:
+            raise
+        logger.warning(
+            "Tokenizer unavailable offline, using approximate token counts",
+            encoding=name,
+            cache=str(cache_path(name)) if name in TIKTOKEN_BLOBS else None,
+            error=str(e),
+        )
+        return ApproximateEncoding()
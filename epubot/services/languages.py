@@ -0,0 +1,62 @@
+import os
+from typing import Dict, List, Union
+
+# 语言代码 -> 提示词中使用的语言名称
+LANGUAGE_NAMES: Dict[str, str] = {
+    "zh": "Chinese",
+    "zh-tw": "Traditional Chinese",
+    "ja": "Japanese",
+    "ko": "Korean",
+    "en": "English",
+    "fr": "French",
+    "de": "German",
+    "es": "Spanish",
+    "it": "Italian",
+    "pt": "Portuguese",
+    "ru": "Russian",
+    "ar": "Arabic",
+}
+
+
+def language_name(code: str) -> str:
+    """语言代码对应的名称，未知代码原样返回（可直接传入 “Chinese” 等名称）"""
+    return LANGUAGE_NAMES.get(code.lower(), code)
+
+
+def language_code(name: str, primary: bool = True) -> str:
+    """
+    语言名称对应的语言代码（“French” -> “fr”），未知名称原样返回小写形式；
+    primary 为 True 时只保留主语言（“zh-tw” -> “zh”）。
+    """
+    code = name.lower()
+    for key, value in LANGUAGE_NAMES.items():
+        if value.lower() == code:
+            code = key
+            break
+    return code.split("-")[0] if primary else code
+
+
+def parse_languages(value: Union[str, List[str]]) -> List[str]:
+    """解析 “zh,ja,fr” 形式的目标语言列表，去重并保持顺序"""
+    codes = value.split(",") if isinstance(value, str) else value
+    languages: List[str] = []
+    for code in codes:
+        code = code.strip().lower()
+        if code and code not in languages:
+            languages.append(code)
+    if not languages:
+        raise ValueError(f"no target language in {value!r}")
+    return languages
+
+
+def output_path(template: str, lang: str, multiple: bool) -> str:
+    """
+    某个目标语言的输出路径：模板中的 {lang} 替换为语言代码；
+    没有 {lang} 且有多个目标语言时，在扩展名前加上 -语言代码。
+    """
+    if "{lang}" in template:
+        return template.replace("{lang}", lang)
+    if not multiple:
+        return template
+    stem, ext = os.path.splitext(template)
+    return f"{stem}-{lang}{ext or '.epub'}"
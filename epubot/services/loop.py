@@ -0,0 +1,97 @@
+import asyncio
+import contextvars
+import functools
+import statistics
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from epubot.config.logger import logger
+from epubot.config.settings import settings
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """获取用于阻塞 I/O 的共享线程池"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.IO_WORKERS, thread_name_prefix="epubot-io")
+    return _executor
+
+
+async def run_blocking_io(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    在共享线程池中执行阻塞操作（文件/zip I/O、HTML 解析等），避免冻结事件循环。
+    会复制当前的 contextvars，使 structlog 绑定的上下文在工作线程中依然可用。
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(), call)
+
+
+class LoopLagMonitor:
+    """
+    事件循环延迟监视器。
+    周期性地休眠固定间隔，实际唤醒时间与预期时间之差即为事件循环被阻塞的时长。
+    超过 warn_threshold 时输出警告日志。
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        warn_threshold: Optional[float] = None,
+        max_samples: Optional[int] = None,
+    ):
+        """
+        Args:
+            interval: 采样间隔（秒）
+            warn_threshold: 阻塞超过该时长（秒）时记录警告，None 表示不警告
+            max_samples: 最多保留的采样数，None 表示全部保留
+        """
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.samples: deque = deque(maxlen=max_samples)
+        self.blocked = 0  # 超过阈值的次数
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, lag: float) -> None:
+        self.samples.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+        if self.warn_threshold is not None and lag > self.warn_threshold:
+            self.blocked += 1
+            logger.warning("Event loop blocked", lag=round(lag, 4), threshold=self.warn_threshold)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, loop.time() - expected))
+
+    def start(self) -> None:
+        """在当前运行的事件循环中启动监视任务"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def summary(self) -> Dict[str, float]:
+        if not self.samples:
+            return {"samples": 0}
+        ordered = sorted(self.samples)
+        return {
+            "samples": len(ordered),
+            "mean": statistics.fmean(ordered),
+            "p50": ordered[len(ordered) // 2],
+            "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+            "max": self.max_lag,
+            "blocked": self.blocked,
+        }
@@ -0,0 +1,60 @@
+import statistics
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from epubot.config.logger import logger
+
+
+class RunMetrics:
+    """
+    单次运行的统计指标。
+    计数器使用 “分组.名称” 形式的键，例如 singleflight.saved_requests，
+    report() 时按分组聚合为嵌套字典。
+    observe() 记录逐次的观测值（如每个请求的首 token 延迟），report() 时汇总为分位数。
+    """
+
+    def __init__(self):
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.values: Dict[str, Any] = {}
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.started = time.monotonic()
+
+    def incr(self, name: str, value: float = 1) -> None:
+        self.counters[name] += value
+
+    def set(self, name: str, value: Any) -> None:
+        self.values[name] = value
+
+    def get(self, name: str, default: float = 0) -> float:
+        return self.counters.get(name, default)
+
+    def observe(self, name: str, value: float) -> None:
+        self.samples[name].append(value)
+
+    def summary(self, name: str) -> Dict[str, float]:
+        """观测值的汇总：count/mean/p50/p99/max"""
+        ordered = sorted(self.samples.get(name, []))
+        if not ordered:
+            return {"count": 0}
+        return {
+            "count": len(ordered),
+            "mean": round(statistics.fmean(ordered), 4),
+            "p50": round(ordered[len(ordered) // 2], 4),
+            "p99": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 4),
+            "max": round(ordered[-1], 4),
+        }
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        grouped: Dict[str, Dict[str, Any]] = defaultdict(dict)
+        summaries = {name: self.summary(name) for name in self.samples}
+        for name, value in {**self.counters, **self.values, **summaries}.items():
+            group, _, key = name.partition(".")
+            grouped[group][key or group] = value
+        grouped["run"]["elapsed_seconds"] = round(time.monotonic() - self.started, 3)
+        return dict(grouped)
+
+    def log(self) -> Dict[str, Dict[str, Any]]:
+        report = self.report()
+        logger.info("Run metrics", **report)
+        return report
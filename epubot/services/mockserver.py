@@ -0,0 +1,332 @@
+import asyncio
+import http
+import json
+import math
+import random
+import re
+import time
+import uuid
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from epubot.config.logger import logger
+from epubot.services.cassette import Cassette, request_key
+from epubot.services.html.tokenizer import get_encoding
+
+# 翻译提示词中 ```html ... ``` 包裹的原文
+HTML_BLOCK_PATTERN = re.compile(r"```html\s*\n(.*)\n\s*```", re.DOTALL)
+STREAM_PIECE_CHARS = 64  # 流式响应每个事件的字符数
+
+
+def echo_response(messages: List[Dict[str, str]]) -> str:
+    """没有录制的响应时原样返回提示词中的 HTML，可以通过结构校验"""
+    prompt = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+    match = HTML_BLOCK_PATTERN.search(prompt)
+    return match.group(1).strip() if match else prompt
+
+
+class RateLimiter:
+    """滑动窗口内的请求数（RPM）和 token 数（TPM）限制，0 表示不限制"""
+
+    def __init__(self, rpm: int = 0, tpm: int = 0, window: float = 60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self.events: Deque[Tuple[float, int]] = deque()
+        self.tokens = 0
+
+    def acquire(self, tokens: int, now: Optional[float] = None) -> float:
+        """
+        窗口内还有余量时记录请求并返回 0，否则返回建议等待的秒数（Retry-After）。
+        """
+        now = time.monotonic() if now is None else now
+        while self.events and self.events[0][0] <= now - self.window:
+            self.tokens -= self.events.popleft()[1]
+        if self.rpm and len(self.events) >= self.rpm:
+            return self.events[0][0] + self.window - now
+        if self.tpm and self.tokens + tokens > self.tpm:
+            if tokens > self.tpm:
+                return self.window
+            # 等到足够多的 token 移出窗口
+            freed = 0
+            for at, used in self.events:
+                freed += used
+                if self.tokens - freed + tokens <= self.tpm:
+                    return at + self.window - now
+        self.events.append((now, tokens))
+        self.tokens += tokens
+        return 0.0
+
+
+@dataclass
+class Faults:
+    """各类故障的注入比例"""
+
+    error_rate: float = 0.0  # 返回 500
+    timeout_rate: float = 0.0  # 挂起 hang_seconds 后断开，不返回任何响应
+    disconnect_rate: float = 0.0  # 响应中途断开连接
+    truncate_rate: float = 0.0  # 只返回一半输出，finish_reason=length
+    hang_seconds: float = 600.0
+
+    def pick(self, rng: random.Random) -> Optional[str]:
+        roll = rng.random()
+        for name, rate in (
+            ("error", self.error_rate),
+            ("timeout", self.timeout_rate),
+            ("disconnect", self.disconnect_rate),
+            ("truncate", self.truncate_rate),
+        ):
+            if roll < rate:
+                return name
+            roll -= rate
+        return None
+
+
+class LatencySampler:
+    """
+    按录制的延迟分布生成耗时：随机取一次录制的首 token 延迟和每 token 生成耗时，
+    没有录制数据时使用固定延迟。time_scale 缩放所有耗时，小于 1 时加速重放。
+    """
+
+    def __init__(self, cassette: Optional[Cassette] = None, latency: float = 1.0, time_scale: float = 1.0):
+        self.samples = [(i.ttft or 0.0, i.seconds_per_token) for i in cassette.successes()] if cassette else []
+        self.latency = latency
+        self.time_scale = time_scale
+
+    def sample(self, rng: random.Random, tokens: int) -> Tuple[float, float]:
+        """返回 (首 token 延迟, 生成耗时) 秒"""
+        if not self.samples:
+            return self.latency * self.time_scale, 0.0
+        ttft, seconds_per_token = rng.choice(self.samples)
+        return ttft * self.time_scale, seconds_per_token * tokens * self.time_scale
+
+
+class MockServer:
+    """
+    本地模拟的 Mistral chat-completions 服务（POST /v1/chat/completions，OpenAI 兼容的路径同样可用）。
+    响应优先使用 cassette 中相同请求的录制结果，否则原样返回原文；
+    按录制的延迟分布等待，超过 RPM/TPM 时返回 429 和 Retry-After，并按比例注入故障，
+    用于离线压测 Translator 的重试、限流和并发设置。
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        cassette: Optional[Cassette] = None,
+        rpm: int = 0,
+        tpm: int = 0,
+        latency: float = 1.0,
+        time_scale: float = 1.0,
+        faults: Optional[Faults] = None,
+        seed: Optional[int] = None,
+        window: float = 60.0,
+    ):
+        self.host = host
+        self.port = port
+        self.cassette = cassette
+        self.limiter = RateLimiter(rpm, tpm, window)
+        self.sampler = LatencySampler(cassette, latency, time_scale)
+        self.faults = faults or Faults()
+        self.rng = random.Random(seed)
+        self.stats: Counter = Counter()
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.connections: Set[asyncio.Task] = set()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> "MockServer":
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info("Mock provider server started", url=self.url, samples=len(self.sampler.samples))
+        return self
+
+    async def stop(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            # 客户端保持的空闲连接（以及挂起中的请求）不会随监听关闭而结束
+            for task in self.connections:
+                task.cancel()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+            await self.server.wait_closed()
+            self.server = None
+        logger.info("Mock provider server stopped", **self.stats)
+
+    async def __aenter__(self) -> "MockServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """一个连接上依次处理多个请求（keep-alive），故障注入需要断开时关闭连接"""
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                if not await self._dispatch(writer, *request):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self.connections.discard(task)
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, bytes]]:
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        method, path, _ = line.decode("latin-1").split(" ", 2)
+        length = 0
+        while True:
+            header = await reader.readline()
+            if header in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = header.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value.strip())
+        body = await reader.readexactly(length) if length else b""
+        return method, path.split("?", 1)[0], body
+
+    @staticmethod
+    def _head(status: int, headers: Dict[str, str]) -> bytes:
+        lines = [f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send_json(
+        self, writer: asyncio.StreamWriter, status: int, payload: dict, headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = {"Content-Type": "application/json", "Content-Length": str(len(body)), **(headers or {})}
+        writer.write(self._head(status, head) + body)
+        await writer.drain()
+
+    @staticmethod
+    def _error(message: str, error_type: str, code: str) -> dict:
+        return {"object": "error", "message": message, "type": error_type, "param": None, "code": code}
+
+    async def _dispatch(self, writer: asyncio.StreamWriter, method: str, path: str, body: bytes) -> bool:
+        """处理一个请求，返回是否保持连接"""
+        if method != "POST" or not path.endswith("/chat/completions"):
+            await self._send_json(writer, 404, self._error("Not found", "not_found", "404"))
+            return True
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            await self._send_json(writer, 400, self._error("Invalid JSON body", "invalid_request_error", "400"))
+            return True
+
+        self.stats["requests"] += 1
+        messages = request.get("messages") or []
+        recorded = self.cassette.find(request_key(messages)) if self.cassette is not None else None
+        content = recorded.response if recorded is not None else echo_response(messages)
+        encoding = get_encoding()
+        prompt_tokens = sum(len(encoding.encode(m.get("content") or "")) for m in messages)
+        completion_tokens = len(encoding.encode(content))
+
+        wait = self.limiter.acquire(prompt_tokens + completion_tokens)
+        if wait > 0:
+            self.stats["rate_limited"] += 1
+            await self._send_json(
+                writer,
+                429,
+                self._error("Requests rate limit exceeded", "rate_limited", "1300"),
+                {"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+            return True
+
+        fault = self.faults.pick(self.rng)
+        if fault is not None:
+            self.stats[f"faults.{fault}"] += 1
+        if fault == "error":
+            await self._send_json(writer, 500, self._error("Internal server error", "internal_server_error", "3000"))
+            return True
+        if fault == "timeout":
+            await asyncio.sleep(self.faults.hang_seconds)
+            return False
+
+        finish_reason = "stop"
+        if fault == "truncate":
+            content = content[: len(content) // 2]
+            completion_tokens = len(encoding.encode(content))
+            finish_reason = "length"
+        ttft, generation = self.sampler.sample(self.rng, completion_tokens)
+        response = {
+            "id": uuid.uuid4().hex,
+            "model": request.get("model") or "mock",
+            "created": int(time.time()),
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+        if request.get("stream"):
+            return await self._stream(writer, response, content, finish_reason, ttft, generation, fault)
+
+        await asyncio.sleep(ttft + generation)
+        if fault == "disconnect":
+            return False
+        message = {"role": "assistant", "content": content}
+        choice = {"index": 0, "message": message, "finish_reason": finish_reason}
+        response.update(object="chat.completion", choices=[choice])
+        await self._send_json(writer, 200, response)
+        self.stats["responses"] += 1
+        return True
+
+    async def _stream(
+        self,
+        writer: asyncio.StreamWriter,
+        response: dict,
+        content: str,
+        finish_reason: str,
+        ttft: float,
+        generation: float,
+        fault: Optional[str],
+    ) -> bool:
+        """以 server-sent events 分段返回（chunked 编码），生成耗时均匀分布在各段之间"""
+        pieces = [content[i : i + STREAM_PIECE_CHARS] for i in range(0, len(content), STREAM_PIECE_CHARS)] or [""]
+        if fault == "disconnect":
+            pieces = pieces[: max(1, len(pieces) // 2)]
+
+        async def send(data: str) -> None:
+            payload = f"data: {data}\n\n".encode("utf-8")
+            writer.write(f"{len(payload):x}\r\n".encode("latin-1") + payload + b"\r\n")
+            await writer.drain()
+
+        headers = {"Content-Type": "text/event-stream", "Cache-Control": "no-cache", "Transfer-Encoding": "chunked"}
+        writer.write(self._head(200, headers))
+        await asyncio.sleep(ttft)
+        usage = response.pop("usage")
+        for i, piece in enumerate(pieces):
+            if i:
+                await asyncio.sleep(generation / len(pieces))
+            delta = {"role": "assistant", "content": piece} if i == 0 else {"content": piece}
+            last = i == len(pieces) - 1 and fault != "disconnect"
+            choice = {"index": 0, "delta": delta, "finish_reason": finish_reason if last else None}
+            event = {**response, "object": "chat.completion.chunk", "choices": [choice]}
+            if last:
+                event["usage"] = usage
+            await send(json.dumps(event, ensure_ascii=False))
+        if fault == "disconnect":
+            return False
+        await send("[DONE]")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        self.stats["responses"] += 1
+        return True
@@ -0,0 +1,133 @@
+import abc
+import heapq
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from epubot.services.scheduler import Job
+
+
+@dataclass
+class LatencyModel:
+    """单个请求的耗时模型：固定开销 + 每 token 耗时（秒）"""
+
+    overhead: float = 2.0
+    seconds_per_token: float = 0.01
+
+    def estimate(self, tokens: int) -> float:
+        return self.overhead + self.seconds_per_token * tokens
+
+
+class Policy(abc.ABC):
+    """
+    调度队列的派发顺序。key() 在任务入队时计算，值越小越先派发；
+    所有策略都先按任务的 priority 排序（标题批次等需要最先完成的任务使用负值）。
+    """
+
+    name = ""
+
+    def __init__(self, model: Optional[LatencyModel] = None):
+        self.model = model or LatencyModel()
+
+    @abc.abstractmethod
+    def order(self, job: "Job") -> Tuple:
+        """策略自身的排序键（位于 priority 之后、提交顺序之前）"""
+
+    def key(self, job: "Job") -> Tuple:
+        return (job.priority, *self.order(job), job.seq)
+
+    def dispatched(self, job: "Job") -> None:
+        """任务被派发时调用"""
+
+
+class FifoPolicy(Policy):
+    """按提交顺序"""
+
+    name = "fifo"
+
+    def order(self, job):
+        return ()
+
+
+class LongestFirstPolicy(Policy):
+    """
+    最长处理时间优先（LPT）：按延迟模型估计耗时最长的分块先派发，
+    避免大分块最后单独执行，拉长整本书的完成时间。
+    """
+
+    name = "lpt"
+
+    def order(self, job):
+        return (-self.model.estimate(job.tokens),)
+
+
+class ChapterOrderPolicy(Policy):
+    """按书脊顺序先完成前面的章节，便于渐进输出和校对"""
+
+    name = "chapter"
+
+    def order(self, job):
+        return (job.document,)
+
+
+class FairSharePolicy(Policy):
+    """
+    多本书共用调度器时按 token 公平分配（起始时间公平排队）：
+    每本书的任务按累计 token 排队，某本书的大量分块不会长时间占满所有并发。
+    """
+
+    name = "fair"
+
+    def __init__(self, model: Optional[LatencyModel] = None):
+        super().__init__(model)
+        self.virtual_time = 0.0
+        self.finish: Dict[str, float] = defaultdict(float)
+
+    def order(self, job):
+        start = max(self.virtual_time, self.finish[job.book])
+        self.finish[job.book] = start + job.tokens
+        job.start = start
+        return (start,)
+
+    def dispatched(self, job):
+        self.virtual_time = max(self.virtual_time, job.start)
+
+
+POLICIES = {policy.name: policy for policy in (LongestFirstPolicy, FifoPolicy, ChapterOrderPolicy, FairSharePolicy)}
+
+
+def get_policy(name: str, model: Optional[LatencyModel] = None) -> Policy:
+    if name not in POLICIES:
+        raise ValueError(f"unknown scheduling policy: {name}")
+    return POLICIES[name](model)
+
+
+def simulate(
+    jobs: Iterable["Job"], policy: Policy, workers: int = 1, interval: float = 0.0
+) -> Dict[str, float]:
+    """
+    模拟按策略派发所有任务（均在开始时入队）的耗时：
+    每次把队首任务交给最早空闲的工作者，相邻派发至少间隔 interval 秒（请求间隔限制）。
+    Returns:
+        makespan（全部完成）和 first_document（第一个文档的全部分块完成）的秒数
+    """
+    queue: List[Tuple[Tuple, "Job"]] = [(policy.key(job), job) for job in jobs]
+    if not queue:
+        return {"makespan": 0.0, "first_document": 0.0}
+    queue.sort(key=lambda entry: entry[0])
+    first = min(job.document for _, job in queue)
+
+    free = [0.0] * max(1, workers)
+    last_dispatch = -interval
+    makespan = first_document = 0.0
+    for _, job in queue:
+        policy.dispatched(job)
+        start = max(heapq.heappop(free), last_dispatch + interval)
+        last_dispatch = start
+        finish = start + policy.model.estimate(job.tokens)
+        heapq.heappush(free, finish)
+        makespan = max(makespan, finish)
+        if job.document == first:
+            first_document = max(first_document, finish)
+    return {"makespan": round(makespan, 1), "first_document": round(first_document, 1)}
@@ -0,0 +1,206 @@
+import cProfile
+import functools
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from epubot.config.logger import logger
+from epubot.services.loop import LoopLagMonitor
+
+T = TypeVar("T")
+
+
+class StackSampler:
+    """
+    低开销的栈采样器。
+    在后台线程中按固定间隔采样处于某个阶段中的线程的调用栈，按阶段聚合为 collapsed-stack 格式，
+    可直接交给 flamegraph.pl / speedscope 等工具生成火焰图。
+    阶段可以在事件循环线程中，也可以在执行阻塞 I/O 的工作线程中。
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.active: Dict[int, str] = {}  # 线程 ID -> 当前阶段
+        self.stacks: Dict[str, Counter] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        return f"{Path(code.co_filename).name}:{code.co_name}:{frame.f_lineno}"
+
+    def enter(self, stage: str) -> Optional[str]:
+        """将当前线程标记为处于 stage 阶段，返回之前的阶段"""
+        thread_id = threading.get_ident()
+        previous = self.active.get(thread_id)
+        self.active[thread_id] = stage
+        return previous
+
+    def exit(self, previous: Optional[str]) -> None:
+        thread_id = threading.get_ident()
+        if previous is None:
+            self.active.pop(thread_id, None)
+        else:
+            self.active[thread_id] = previous
+
+    def _sample(self) -> None:
+        frames = sys._current_frames()
+        for thread_id, stage in list(self.active.items()):
+            frame = frames.get(thread_id)
+            names = []
+            while frame is not None:
+                names.append(self._frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks.setdefault(stage, Counter())[";".join(reversed(names))] += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="epubot-stack-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def collapsed(self, stage: str) -> str:
+        """返回指定阶段的 collapsed-stack 文本，每行为 `frame;frame;... count`"""
+        counter = self.stacks.get(stage, Counter())
+        return "".join(f"{stage};{stack} {count}\n" for stack, count in counter.most_common())
+
+
+class Profiler:
+    """
+    按流水线阶段收集 CPU 性能数据。
+
+    每个阶段输出:
+    - <stage>.pstats: cProfile 统计，可用 `python -m pstats` 或 snakeviz 查看
+    - <stage>.collapsed: 采样得到的折叠栈，可生成火焰图
+    以及 summary.json: 各阶段耗时、内存峰值（tracemalloc）和事件循环延迟统计，
+    loop_lag.json: 原始的事件循环延迟采样（秒）。
+
+    enabled=False 时所有方法均为空操作，调用方无需额外判断。
+    """
+
+    def __init__(
+        self,
+        output_dir: Optional[str] = None,
+        enabled: bool = True,
+        cpu: bool = True,
+        sample_interval: float = 0.005,
+        lag_interval: float = 0.1,
+    ):
+        self.enabled = enabled and output_dir is not None
+        self.output_dir = Path(output_dir) if output_dir else None
+        self.cpu = cpu
+        self.sampler = StackSampler(interval=sample_interval)
+        self.lag_monitor = LoopLagMonitor(interval=lag_interval)
+        self._owns_lag_monitor = True
+        self.profiles: Dict[str, cProfile.Profile] = {}
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    def use_lag_monitor(self, monitor: LoopLagMonitor) -> None:
+        """
+        使用调用方（如 Coordinator）的事件循环延迟监控，同一个事件循环只运行一个监控：
+        其启动和停止由调用方负责，结果中的延迟统计取自它。
+        """
+        self.lag_monitor = monitor
+        self._owns_lag_monitor = False
+
+    def start(self) -> None:
+        """开始一次运行的性能采集，需在事件循环中调用"""
+        if not self.enabled:
+            return
+        self.sampler.start()
+        if self._owns_lag_monitor:
+            self.lag_monitor.start()
+
+    def stop(self) -> Optional[Path]:
+        """停止采集并写出结果，返回输出目录"""
+        if not self.enabled:
+            return None
+        if self._owns_lag_monitor:
+            self.lag_monitor.stop()
+        self.sampler.stop()
+        return self.dump()
+
+    @contextmanager
+    def stage(self, name: str, memory: bool = False):
+        """
+        对一个流水线阶段进行性能采集。
+        Args:
+            name: 阶段名称，例如 parse / translate / build
+            memory: 是否使用 tracemalloc 记录该阶段的内存峰值（开销较大，仅用于同步阶段）
+        """
+        if not self.enabled:
+            yield
+            return
+
+        stats: Dict[str, float] = {}
+        started_tracing = False
+        if memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+
+        profile = self.profiles.setdefault(name, cProfile.Profile()) if self.cpu else None
+        previous_stage = self.sampler.enter(name)
+        start = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            stats["seconds"] = time.perf_counter() - start
+            self.sampler.exit(previous_stage)
+            if memory:
+                current, peak = tracemalloc.get_traced_memory()
+                stats["memory_current"] = current
+                stats["memory_peak"] = peak
+                if started_tracing:
+                    tracemalloc.stop()
+            self.stages[name] = stats
+            logger.info("Profiled stage", stage=name, **stats)
+
+    def wrap(self, name: str, func: Callable[..., T], memory: bool = False) -> Callable[..., T]:
+        """
+        返回在 name 阶段内执行 func 的函数。
+        用于把阻塞阶段交给线程池执行时，让 cProfile 和栈采样跟随到工作线程中。
+        """
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            with self.stage(name, memory=memory):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def dump(self) -> Path:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        for name, profile in self.profiles.items():
+            profile.dump_stats(str(self.output_dir / f"{name}.pstats"))
+        for name in self.sampler.stacks:
+            (self.output_dir / f"{name}.collapsed").write_text(self.sampler.collapsed(name), encoding="utf-8")
+
+        summary = {"stages": self.stages, "loop_lag": self.lag_monitor.summary()}
+        (self.output_dir / "summary.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        (self.output_dir / "loop_lag.json").write_text(json.dumps(list(self.lag_monitor.samples)), encoding="utf-8")
+        logger.info("Profile written", output_dir=str(self.output_dir))
+        return self.output_dir
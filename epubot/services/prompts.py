@@ -0,0 +1,101 @@
+import textwrap
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from epubot.config.settings import settings
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """
+    翻译提示词模板。系统提示词不含任何变量，所有请求的前缀逐字节相同，便于提供方的提示词缓存命中；
+    语言、原文和术语只出现在用户消息中。修改模板内容时递增 version，依赖提示词的缓存随之失效。
+    """
+
+    name: str
+    version: int
+    system: str
+    user: str  # 变量：source_lang、target_lang、text，以及 messages() 传入的其他字段
+
+    @property
+    def key(self) -> str:
+        """模板标识（名称和版本），作为缓存键的一部分"""
+        return f"{self.name}/v{self.version}"
+
+    def messages(
+        self, text: str, source_lang: str, target_lang: str, extra: str = "", **fields: str
+    ) -> List[Dict[str, str]]:
+        """extra 为附加在用户消息末尾的说明（如术语表），放在原文之后，不影响前面的公共前缀"""
+        user = self.user.format(source_lang=source_lang, target_lang=target_lang, text=text, **fields)
+        if extra:
+            user = f"{user}\n\n{extra}"
+        return [{"role": "system", "content": self.system}, {"role": "user", "content": user}]
+
+
+FULL = PromptTemplate(
+    name="full",
+    version=2,
+    system=textwrap.dedent(
+        """
+        You are an expert XML/HTML translator. Your primary task is to translate the *text content* found within the XML or HTML snippet provided by the user into the requested target language.
+
+        **CRITICAL STRUCTURE & CONTENT:**
+        Adhere strictly to the following rules to preserve markup integrity and translate only content:
+        - Translate ONLY the text content that appears BETWEEN the tags.
+        - Preserve ALL tags and attributes (XML/HTML) EXACTLY as they appear. The set of all tags (including both opening <tag> and closing </tag> tags) and attributes in output MUST be identical to original. **Absolutely NO tag or attribute must be lost, added, or changed.**
+
+        **OUTPUT FORMAT:**
+        Your response MUST contain **ABSOLUTELY NOTHING EXCEPT** the translated XML or HTML content from the input snippet. Do NOT include any preamble, postamble, conversation, explanation, code block markers (```), markdown, or **any tags or attributes that were not present in the original input snippet.** Respond strictly with the raw, translated XML or HTML string.
+
+        **QUALITY & FLOW:**
+        - Ensure the translated content is fluent, natural, uses correct punctuation, and standard written style.
+        - Adjust element order within the markup structure for natural target language flow, if needed. This reordering is an allowed exception to strict structural preservation, but you MUST NOT change, add, or remove any tags or attributes themselves during this reordering.
+        """
+    ).strip(),
+    user="Translate the following HTML from {source_lang} to {target_lang}:\n\n```html\n{text}\n```",
+)
+
+COMPACT = PromptTemplate(
+    name="compact",
+    version=1,
+    system=textwrap.dedent(
+        """
+        Translate the text of the user's HTML/XML snippet into the requested language.
+        - Translate only text between tags; keep every tag, attribute and {placeholder} exactly, none added or removed.
+        - Output only the translated snippet: no preamble, explanation or code fences.
+        - Write fluent, natural text with correct punctuation.
+        """
+    ).strip(),
+    user="{source_lang} -> {target_lang}\n```html\n{text}\n```",
+)
+
+REVIEW_APPROVED = "[APPROVED_NO_SUGGESTIONS]"  # 审校认可译文时的回复
+
+# 审校提示词：不参与 --prompt 选择，变量另有 translated（译文）和 checks（需要检查的问题列表）
+REVIEW = PromptTemplate(
+    name="review",
+    version=1,
+    system=textwrap.dedent(
+        f"""
+        You are a meticulous reviewer of XML/HTML translations.
+        Check content accuracy and fluency AND strict markup preservation (only text translated, tags and attributes intact).
+        If the translation is correct, output ONLY the marker '{REVIEW_APPROVED}'.
+        Otherwise output ONLY the corrected translation as raw XML or HTML, with exactly the same tags and attributes as the original. No explanation, no code block markers.
+        """
+    ).strip(),
+    user=(
+        "Review this translation from {source_lang} to {target_lang}.\n\n"
+        "Original:\n```html\n{text}\n```\n\n"
+        "Translation:\n```html\n{translated}\n```\n\n"
+        "Things to check:\n{checks}"
+    ),
+)
+
+PROMPTS: Dict[str, PromptTemplate] = {template.name: template for template in (FULL, COMPACT)}
+
+
+def get_prompt(name: Optional[str] = None) -> PromptTemplate:
+    name = name or settings.PROMPT_TEMPLATE
+    if name not in PROMPTS:
+        raise ValueError(f"unknown prompt template {name!r}, expected one of {', '.join(PROMPTS)}")
+    return PROMPTS[name]
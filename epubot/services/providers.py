@@ -0,0 +1,161 @@
+import abc
+import functools
+import json
+from contextlib import asynccontextmanager
+from typing import AsyncContextManager, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+from mistralai import Mistral
+
+from epubot.config.settings import settings
+from epubot.services.clients import registry
+
+# 流式输出的一段：(新增文本, finish_reason)
+Delta = Tuple[str, Optional[str]]
+
+
+class Provider(abc.ABC):
+    """
+    翻译后端。
+    complete() 返回 (完整输出, finish_reason)；
+    stream() 是异步上下文管理器，产出 Delta，退出时关闭连接（中止生成）。
+    """
+
+    name: str = ""
+    model: str = ""
+
+    @abc.abstractmethod
+    async def complete(self, messages: List[Dict[str, str]], **kwargs) -> Tuple[str, Optional[str]]:
+        """发送请求并等待完整输出"""
+
+    @abc.abstractmethod
+    def stream(self, messages: List[Dict[str, str]], **kwargs) -> AsyncContextManager[AsyncIterator[Delta]]:
+        """流式请求"""
+
+
+class MistralProvider(Provider):
+    name = "mistral"
+
+    def __init__(
+        self, api_key: Optional[str] = None, model: Optional[str] = None, client=None, server_url: Optional[str] = None
+    ):
+        self.api_key = api_key or settings.mistral_api_key
+        self.model = model or settings.mistral_model
+        # 指向本地模拟服务（epubot mock-server）时设置
+        self.server_url = server_url or settings.mistral_server_url
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is not None:
+            return self._client
+        # 共享连接池：同一事件循环中相同地址和密钥的后端复用连接
+        return registry.get(
+            self.name,
+            self.server_url or "",
+            self.api_key,
+            lambda http: Mistral(api_key=self.api_key, server_url=self.server_url, async_client=http),
+        )
+
+    async def complete(self, messages, **kwargs):
+        response = await self.client.chat.complete_async(model=self.model, messages=messages, temperature=0.1, **kwargs)
+        choice = response.choices[0]
+        return choice.message.content, choice.finish_reason
+
+    @staticmethod
+    async def _deltas(response) -> AsyncIterator[Delta]:
+        async for event in response:
+            if not event.data.choices:
+                continue
+            choice = event.data.choices[0]
+            content = choice.delta.content or ""
+            if not isinstance(content, str):
+                content = "".join(getattr(chunk, "text", "") for chunk in content)
+            yield content, choice.finish_reason
+
+    @asynccontextmanager
+    async def stream(self, messages, **kwargs):
+        response = await self.client.chat.stream_async(model=self.model, messages=messages, temperature=0.1, **kwargs)
+        async with response:
+            yield self._deltas(response)
+
+
+class OpenAICompatibleProvider(Provider):
+    """OpenAI 兼容的 /chat/completions 接口（DeepSeek、Kimi 等）"""
+
+    def __init__(self, name: str, base_url: str, api_key: str, model: str):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # 共享连接池（超时、连接数和 keep-alive 见 HTTP_* 设置）
+        return registry.http(self.base_url, self.api_key, headers={"Authorization": f"Bearer {self.api_key}"})
+
+    def _payload(self, messages, stream: bool, **kwargs) -> dict:
+        return {"model": self.model, "messages": messages, "temperature": 0.1, "stream": stream, **kwargs}
+
+    async def complete(self, messages, **kwargs):
+        response = await self.client.post("/chat/completions", json=self._payload(messages, False, **kwargs))
+        response.raise_for_status()
+        choice = response.json()["choices"][0]
+        return choice["message"].get("content") or "", choice.get("finish_reason")
+
+    @staticmethod
+    async def _deltas(response: httpx.Response) -> AsyncIterator[Delta]:
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            choices = json.loads(data).get("choices") or []
+            if choices:
+                yield (choices[0].get("delta") or {}).get("content") or "", choices[0].get("finish_reason")
+
+    @asynccontextmanager
+    async def stream(self, messages, **kwargs):
+        async with self.client.stream("POST", "/chat/completions", json=self._payload(messages, True, **kwargs)) as response:
+            response.raise_for_status()
+            yield self._deltas(response)
+
+
+def _create_provider(name: str, model: Optional[str]) -> Provider:
+    if name == "mistral":
+        return MistralProvider(model=model)
+    if name == "deepseek":
+        return OpenAICompatibleProvider(
+            "deepseek", settings.deepseek_base_url, settings.deepseek_api_key, model or settings.deepseek_model
+        )
+    if name == "kimi":
+        return OpenAICompatibleProvider(
+            "kimi", settings.kimi_base_url, settings.kimi_api_key, model or settings.kimi_model
+        )
+    raise ValueError(f"unknown translation provider: {name}")
+
+
+@functools.lru_cache(maxsize=None)
+def _shared_provider(name: str, model: Optional[str], cassette: Optional[str]) -> Provider:
+    provider = _create_provider(name, model)
+    if cassette:
+        from epubot.services.cassette import RecordingProvider, get_cassette
+
+        provider = RecordingProvider(provider, get_cassette(cassette))
+    return provider
+
+
+def get_provider(name: Optional[str] = None, model: Optional[str] = None, cassette: Optional[str] = None) -> Provider:
+    """
+    按名称返回后端实例（进程内共享）：mistral、deepseek 或 kimi，model 为空时使用配置中的模型。
+    请求和响应录制到 cassette 文件，为空时使用调用时的 CASSETTE_RECORD 设置；
+    录制文件是缓存键的一部分，修改设置后再获取的后端按新设置录制。
+    """
+    return _shared_provider(name or settings.TRANSLATION_PROVIDER, model, cassette or settings.CASSETTE_RECORD)
+
+
+def parse_tier(spec: str) -> Provider:
+    """解析 “后端[:模型]” 形式的级联配置，例如 mistral:mistral-small-latest"""
+    name, _, model = spec.partition(":")
+    return get_provider(name.strip(), model.strip() or None)
@@ -0,0 +1,83 @@
+import re
+from typing import Optional
+
+from epubot.config.settings import settings
+from epubot.services.classifier import LETTER_PATTERN, detect_language
+from epubot.services.languages import language_code
+from epubot.services.singleflight import PLACEHOLDER_PATTERN
+from epubot.services.validator import TAG_PATTERN
+
+WORD_PATTERN = re.compile(r"[A-Za-z]{4,}")
+# 使用拉丁字母的目标语言：译文与原文共用大量同形词和专名，保留的单词不能说明未翻译
+LATIN_LANGUAGES = frozenset({"en", "fr", "de", "es", "it", "pt"})
+
+# 目标语言对应的文字系统，用于判断输出是否为目标语言
+TARGET_SCRIPTS = {
+    "chinese": re.compile(r"[㐀-鿿]"),
+    "zh": re.compile(r"[㐀-鿿]"),
+    "japanese": re.compile(r"[぀-ヿ㐀-鿿]"),
+    "ja": re.compile(r"[぀-ヿ㐀-鿿]"),
+    "korean": re.compile(r"[가-힯]"),
+    "ko": re.compile(r"[가-힯]"),
+}
+
+
+def text_content(html: str) -> str:
+    """去掉标签、占位符和实体后的纯文本"""
+    text = PLACEHOLDER_PATTERN.sub(" ", TAG_PATTERN.sub(" ", html))
+    return re.sub(r"&[#\w]+;", " ", text)
+
+
+def is_complex(content: str) -> bool:
+    """
+    判断分块是否复杂到应直接交给最强的模型：
+    标签和占位符相对文字过于密集时，廉价模型很难保持结构。
+    """
+    words = len(text_content(content).split())
+    markup = len(TAG_PATTERN.findall(content)) + len(PLACEHOLDER_PATTERN.findall(content))
+    return words >= 20 and markup / words > settings.CASCADE_COMPLEX_MARKUP_RATIO
+
+
+def is_untranslated(source_text: str, translated_text: str, target_lang: str, max_ratio: float) -> bool:
+    """
+    译文（纯文本）是否大量保留了原文。
+    非拉丁文字的目标语言按原文英文单词原样出现在译文中的比例判断；
+    拉丁文字的目标语言改为识别译文的语言，与原文语言相同（且不是目标语言）时判定为未翻译。
+    target_lang 为语言代码或名称。
+    """
+    target = language_code(target_lang)
+    if target in LATIN_LANGUAGES:
+        detected = detect_language(translated_text)
+        return detected is not None and detected != target and detected == detect_language(source_text)
+    words = {w.lower() for w in WORD_PATTERN.findall(source_text)}
+    if not words:
+        return False
+    kept = {w.lower() for w in WORD_PATTERN.findall(translated_text)} & words
+    return len(kept) / len(words) > max_ratio
+
+
+def quality_issue(source: str, translated: str, target_lang: str) -> Optional[str]:
+    """
+    廉价的译文质量检查（结构已由 validator 校验）。
+    Returns:
+        untranslated / length / language，通过时返回 None
+    """
+    source_text = text_content(source)
+    translated_text = text_content(translated)
+    source_letters = len(LETTER_PATTERN.findall(source_text))
+    if source_letters < settings.QUALITY_MIN_CHARS:
+        return None
+
+    if is_untranslated(source_text, translated_text, target_lang, settings.QUALITY_MAX_UNTRANSLATED):
+        return "untranslated"
+
+    ratio = len(LETTER_PATTERN.findall(translated_text)) / source_letters
+    if not settings.QUALITY_MIN_LENGTH_RATIO <= ratio <= settings.QUALITY_MAX_LENGTH_RATIO:
+        return "length"
+
+    script = TARGET_SCRIPTS.get(target_lang.lower())
+    if script is not None:
+        letters = LETTER_PATTERN.findall(translated_text)
+        if letters and sum(1 for c in letters if script.match(c)) / len(letters) < settings.QUALITY_MIN_TARGET_SCRIPT:
+            return "language"
+    return None
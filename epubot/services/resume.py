@@ -1,7 +1,10 @@
+import asyncio
 import json
 import os
 from typing import Dict, Set
 
+from epubot.services.loop import run_blocking_io
+
 
 class Resume:
     """简单的断点续传服务，只保存文件内容和状态"""
@@ -9,6 +12,7 @@ class Resume:
     def __init__(self, state_file: str = ".translation_state.json"):
         self.state_file = state_file
         self.state: Dict[str, Dict] = self._load_state()
+        self._lock = asyncio.Lock()
 
     def _load_state(self) -> Dict:
         """加载状态文件"""
@@ -21,10 +25,26 @@ class Resume:
         except (json.JSONDecodeError, IOError):
             return {}
 
+    def _write_state(self, payload: str) -> None:
+        """原子地写入状态文件，避免中断时留下半截文件"""
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_file, self.state_file)
+
+    def _dump_state(self) -> str:
+        return json.dumps(self.state, ensure_ascii=False, indent=2)
+
     def _save_state(self) -> None:
         """保存状态到文件"""
-        with open(self.state_file, "w", encoding="utf-8") as f:
-            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        self._write_state(self._dump_state())
+
+    async def _save_state_async(self) -> None:
+        """在线程池中保存状态，不阻塞事件循环"""
+        # 在事件循环线程中序列化快照，避免工作线程读取时状态被并发修改
+        payload = self._dump_state()
+        async with self._lock:
+            await run_blocking_io(self._write_state, payload)
 
     def get_processed_files(self, epub_path: str) -> Set[str]:
         """获取已处理的文件列表"""
@@ -39,6 +59,15 @@ class Resume:
             self.state[epub_path]["processed_files"].append(file_path)
             self._save_state()
 
+    async def mark_file_processed_async(self, epub_path: str, file_path: str) -> None:
+        """标记文件为已处理（异步版本，状态写入在线程池中完成）"""
+        if epub_path not in self.state:
+            self.state[epub_path] = {"processed_files": []}
+
+        if file_path not in self.state[epub_path]["processed_files"]:
+            self.state[epub_path]["processed_files"].append(file_path)
+            await self._save_state_async()
+
     def clear_state(self, epub_path: str = None) -> None:
         """清除状态"""
         if epub_path and epub_path in self.state:
@@ -0,0 +1,110 @@
+import random
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from epubot.config.logger import logger
+from epubot.config.settings import settings
+from epubot.services.glossary import Glossary, GlossarySet
+from epubot.services.html.tokenizer import get_encoding
+from epubot.services.metrics import RunMetrics
+from epubot.services.quality import LETTER_PATTERN, is_untranslated, text_content
+from epubot.services.validator import TAG_PATTERN
+
+# 审校请求：(原文, 译文, 目标语言代码, 需要注意的问题) -> 修改后的译文，认可原译文时为 None
+ReviewFunc = Callable[[str, str, str, List[str]], Awaitable[Optional[str]]]
+
+
+def _tag_sequence(content: str) -> List[tuple]:
+    return [(name.lower(), close, self_closing) for close, name, self_closing in TAG_PATTERN.findall(content)]
+
+
+def review_signals(
+    source: str, translated: str, glossary: Optional[Glossary] = None, target_lang: str = "zh"
+) -> Dict[str, str]:
+    """
+    判断分块是否需要审校的本地信号（不发送请求），target_lang 为目标语言代码。
+    Returns:
+        原因 -> 提供给审校模型的说明；length / untranslated / structure / glossary
+    """
+    signals: Dict[str, str] = {}
+    source_text = text_content(source)
+    translated_text = text_content(translated)
+    source_letters = len(LETTER_PATTERN.findall(source_text))
+
+    if source_letters >= settings.QUALITY_MIN_CHARS:
+        ratio = len(LETTER_PATTERN.findall(translated_text)) / source_letters
+        if not settings.REVIEW_MIN_LENGTH_RATIO <= ratio <= settings.REVIEW_MAX_LENGTH_RATIO:
+            signals["length"] = "The translation is unusually long or short compared with the source."
+
+        if is_untranslated(source_text, translated_text, target_lang, settings.REVIEW_MAX_UNTRANSLATED):
+            signals["untranslated"] = "Some source text may have been left untranslated."
+
+    # 通过了结构校验但接近失败：标签顺序变化，或 token 比例接近截断阈值
+    near_miss = _tag_sequence(source) != _tag_sequence(translated)
+    encoding = get_encoding()
+    source_tokens = len(encoding.encode(source))
+    if not near_miss and source_tokens >= settings.VALIDATION_MIN_TOKENS:
+        ratio = len(encoding.encode(translated)) / source_tokens
+        near_miss = ratio < settings.VALIDATION_MIN_TOKEN_RATIO + settings.REVIEW_NEAR_MISS_MARGIN
+    if near_miss:
+        signals["structure"] = "Markup may have been reordered or content may have been dropped."
+
+    # 原文中出现的术语没有使用规定的译文
+    if glossary is not None:
+        missing = [term for term in glossary.find(source) if term.target.strip() not in translated]
+        if missing:
+            terms = ", ".join(f"{term.source} => {term.target}" for term in missing)
+            signals["glossary"] = f"These terms must use the given translations: {terms}."
+    return signals
+
+
+class ReviewGate:
+    """
+    审校阶段：分块译文完成后，只有本地信号异常或被随机抽中的分块才请求审校模型，
+    在该分块所属文档还原之前完成，与其他分块的翻译并发进行。
+    审校失败或修改未通过结构校验时保留原译文。
+    """
+
+    def __init__(
+        self,
+        review: ReviewFunc,
+        glossaries: Optional[GlossarySet] = None,
+        sample_rate: float = 0.0,
+        metrics: Optional[RunMetrics] = None,
+        seed: Optional[int] = None,
+    ):
+        self.review = review
+        self.glossaries = glossaries  # 按分块的目标语言取术语表
+        self.sample_rate = sample_rate
+        self.metrics = metrics or RunMetrics()
+        self.rng = random.Random(seed)
+
+    def select(self, source: str, translated: str, lang: str = "zh") -> Dict[str, str]:
+        glossary = self.glossaries.get(lang) if self.glossaries is not None else None
+        signals = review_signals(source, translated, glossary, lang)
+        if not signals and self.sample_rate and self.rng.random() < self.sample_rate:
+            signals["sample"] = "Randomly sampled for quality assurance; check accuracy and fluency."
+        return signals
+
+    async def __call__(self, source: str, translated: str, lang: str) -> str:
+        self.metrics.incr("review.chunks")
+        try:
+            signals = self.select(source, translated, lang)
+            if not signals:
+                return translated
+            self.metrics.incr("review.calls")
+            for reason in signals:
+                self.metrics.incr(f"review.{reason}")
+            try:
+                revised = await self.review(source, translated, lang, list(signals.values()))
+            except Exception as e:
+                self.metrics.incr("review.failures")
+                logger.warning("Review failed, keeping translation", reasons=list(signals), error=str(e))
+                return translated
+            if revised is None:
+                self.metrics.incr("review.approved")
+                return translated
+            self.metrics.incr("review.revised")
+            return revised
+        finally:
+            chunks = self.metrics.get("review.chunks")
+            self.metrics.set("review.call_rate", round(self.metrics.get("review.calls") / chunks, 4))
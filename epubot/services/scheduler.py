@@ -0,0 +1,187 @@
+import asyncio
+import itertools
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from epubot.schemas.chunk import Chunk
+from epubot.services.metrics import RunMetrics
+from epubot.services.policies import FifoPolicy, Policy
+from epubot.services.singleflight import SingleFlight, canonicalize, content_key, from_canonical, to_canonical
+
+
+@dataclass
+class Job:
+    """调度队列中的一个翻译任务，可能对应多个内容相同的分块"""
+
+    key: str
+    content: str
+    placeholders: List[str]
+    tokens: int
+    future: Optional[asyncio.Future] = None
+    chunks: int = 1
+    seq: int = 0  # 提交顺序
+    document: int = 0  # 所属文档在书脊中的位置
+    book: str = ""
+    priority: int = 0  # 越小越先派发
+    lang: Optional[str] = None  # 目标语言，为空时使用翻译函数的默认值
+    start: float = 0.0  # 公平调度的虚拟开始时间
+
+
+class Scheduler:
+    """
+    分块翻译调度器。
+    各文档提交的分块进入同一个队列，由固定数量的工作协程并发派发给翻译器：
+    - 派发前队列中已存在相同内容的任务时，直接合并到该任务；
+    - 派发后由 SingleFlight 合并正在执行或已完成的相同请求。
+    队列的派发顺序由调度策略（policies.Policy）决定，默认按提交顺序。
+    调用 expire(fallback) 后不再派发新请求，正在执行的请求被取消，
+    剩余任务直接以 fallback(原文) 作为结果（用于截止时间到达时按时输出）。
+    """
+
+    def __init__(
+        self,
+        translate: Callable[[str], Awaitable[str]],
+        concurrency: int = 1,
+        metrics: Optional[RunMetrics] = None,
+        cache_size: int = 1024,
+        policy: Optional[Policy] = None,
+    ):
+        self.translate = translate
+        self.concurrency = max(1, concurrency)
+        self.metrics = metrics or RunMetrics()
+        self.singleflight = SingleFlight(self.metrics, cache_size=cache_size)
+        self.policy = policy or FifoPolicy()
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self.pending: Dict[str, Job] = {}  # 尚未派发的任务
+        self._workers: List[asyncio.Task] = []
+        self._running: Set[asyncio.Task] = set()
+        self.fallback: Optional[Callable[[str], str]] = None
+        # 批量模式：(原文, 规范文本, 占位符, 语言) -> 译文，返回 None 时照常翻译
+        self.lookup: Optional[Callable[[str, str, List[str], Optional[str]], Optional[str]]] = None
+        # 审校：(原文, 译文, 语言) -> 最终译文。在任务内执行，合并的相同分块共用审校结果，只审校一次
+        self.review: Optional[Callable[[str, str, Optional[str]], Awaitable[str]]] = None
+        # 暂停时工作协程不再派发新的任务，已发出的请求照常完成
+        self.running = asyncio.Event()
+        self.running.set()
+
+    async def __aenter__(self) -> "Scheduler":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    def start(self) -> None:
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    def resize(self, concurrency: int) -> None:
+        """增加工作协程数（只增不减）"""
+        if concurrency <= self.concurrency:
+            return
+        if self._workers:
+            self._workers += [asyncio.create_task(self._worker()) for _ in range(concurrency - self.concurrency)]
+        self.concurrency = concurrency
+
+    def expire(self, fallback: Callable[[str], str]) -> None:
+        self.fallback = fallback
+        for task in self._running:
+            task.cancel()
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(
+        self, chunk: Chunk, document: int = 0, book: str = "", priority: int = 0, lang: Optional[str] = None
+    ) -> str:
+        """
+        提交分块并等待其译文（占位符已还原为该分块自己的占位符）。
+        document、book、priority 供调度策略排序使用；
+        lang 为目标语言，同一分块的不同语言是不同的任务。
+        """
+        canonical, placeholders = canonicalize(chunk.content)
+        key = content_key(canonical) if lang is None else f"{lang}:{content_key(canonical)}"
+        tokens = chunk.tokens or 0
+        self.metrics.incr("scheduler.chunks")
+        self.metrics.incr("scheduler.tokens", tokens)
+
+        job = self.pending.get(key)
+        if job is None:
+            job = Job(
+                key=key,
+                content=chunk.content,
+                placeholders=placeholders,
+                tokens=tokens,
+                future=asyncio.get_running_loop().create_future(),
+                seq=next(self._seq),
+                document=document,
+                book=book,
+                priority=priority,
+                lang=lang,
+            )
+            self.pending[key] = job
+            self.queue.put_nowait((self.policy.key(job), job))
+        else:
+            job.chunks += 1
+            self.metrics.incr("singleflight.collapsed_in_queue")
+            self.metrics.incr("singleflight.saved_requests")
+            self.metrics.incr("singleflight.saved_tokens", tokens)
+
+        result = await asyncio.shield(job.future)
+        return from_canonical(result, placeholders)
+
+    async def _run(self, job: Job) -> str:
+        translated = None
+        if self.lookup is not None:
+            canonical = to_canonical(job.content, job.placeholders)
+            translated = self.lookup(job.content, canonical, job.placeholders, job.lang)
+            if translated is not None:
+                self.metrics.incr("scheduler.prefilled")
+        if translated is None:
+            self.metrics.incr("scheduler.requests")
+            self.metrics.incr("scheduler.request_tokens", job.tokens)
+            kwargs = {"target_lang": job.lang} if job.lang is not None else {}
+            translated = await self.translate(job.content, **kwargs)
+        # 截止时间到达后不再发送审校请求
+        if self.review is not None and self.fallback is None:
+            translated = await self.review(job.content, translated, job.lang)
+        return to_canonical(translated, job.placeholders)
+
+    async def _worker(self) -> None:
+        while True:
+            _, job = await self.queue.get()
+            await self.running.wait()
+            self.pending.pop(job.key, None)
+            self.policy.dispatched(job)
+            try:
+                if self.fallback is not None:
+                    self.metrics.incr("scheduler.expired")
+                    job.future.set_result(to_canonical(self.fallback(job.content), job.placeholders))
+                    continue
+                # 在独立任务中执行，expire() 取消它时工作协程本身不受影响
+                task = asyncio.ensure_future(self.singleflight.do(job.key, lambda: self._run(job), tokens=job.tokens))
+                self._running.add(task)
+                try:
+                    await asyncio.wait({task})
+                except asyncio.CancelledError:
+                    task.cancel()
+                    job.future.cancel()
+                    raise
+                finally:
+                    self._running.discard(task)
+
+                if self.fallback is not None and (task.cancelled() or task.exception() is not None):
+                    self.metrics.incr("scheduler.expired")
+                    job.future.set_result(to_canonical(self.fallback(job.content), job.placeholders))
+                elif task.cancelled():
+                    job.future.cancel()
+                elif task.exception() is not None:
+                    job.future.set_exception(task.exception())
+                else:
+                    job.future.set_result(task.result())
+            finally:
+                self.queue.task_done()
@@ -0,0 +1,96 @@
+import asyncio
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from epubot.services.metrics import RunMetrics
+
+# HTMLReplacer 生成的占位符，例如 {aZ3k9QpL}
+PLACEHOLDER_PATTERN = re.compile(r"\{[A-Za-z0-9]{8}\}")
+CANONICAL_PATTERN = re.compile(r"\x00(\d+)\x00")
+
+
+def canonicalize(content: str) -> Tuple[str, List[str]]:
+    """
+    将分块中的随机占位符按出现顺序替换为规范标记，
+    使只有占位符不同的分块（如各章重复出现的页眉、图注）得到相同的规范文本。
+    Returns:
+        (规范文本, 按出现顺序排列的原占位符列表)
+    """
+    placeholders: List[str] = []
+    index: Dict[str, int] = {}
+
+    def replace(match: re.Match) -> str:
+        holder = match.group(0)
+        if holder not in index:
+            index[holder] = len(placeholders)
+            placeholders.append(holder)
+        return f"\x00{index[holder]}\x00"
+
+    return PLACEHOLDER_PATTERN.sub(replace, content), placeholders
+
+
+def to_canonical(text: str, placeholders: List[str]) -> str:
+    """将译文中的占位符替换为规范标记（未知的占位符保持不变）"""
+    index = {holder: i for i, holder in enumerate(placeholders)}
+    return PLACEHOLDER_PATTERN.sub(lambda m: f"\x00{index[m.group(0)]}\x00" if m.group(0) in index else m.group(0), text)
+
+
+def from_canonical(text: str, placeholders: List[str]) -> str:
+    """将规范标记还原为指定分块自己的占位符"""
+    return CANONICAL_PATTERN.sub(lambda m: placeholders[int(m.group(1))], text)
+
+
+def content_key(canonical: str) -> str:
+    """规范文本的键：忽略空白差异"""
+    return hashlib.sha1(" ".join(canonical.split()).encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    相同键的请求只执行一次。
+    - 正在执行中的相同请求等待同一个 future；
+    - 已完成的结果保存在有限大小的 LRU 中，本次运行内的后续重复直接复用。
+    """
+
+    def __init__(self, metrics: Optional[RunMetrics] = None, cache_size: int = 1024):
+        self.metrics = metrics or RunMetrics()
+        self.cache_size = cache_size
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.done: "OrderedDict[str, str]" = OrderedDict()
+
+    def _saved(self, kind: str, tokens: int) -> None:
+        self.metrics.incr(f"singleflight.{kind}")
+        self.metrics.incr("singleflight.saved_requests")
+        self.metrics.incr("singleflight.saved_tokens", tokens)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[str]], tokens: int = 0) -> str:
+        if key in self.done:
+            self.done.move_to_end(key)
+            self._saved("memo_hits", tokens)
+            return self.done[key]
+
+        if key in self.inflight:
+            self._saved("coalesced", tokens)
+            return await asyncio.shield(self.inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            result = await fn()
+        except BaseException as e:
+            if not future.cancelled():
+                future.set_exception(e)
+                # 没有其他等待者时避免 “exception was never retrieved” 警告
+                future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if self.cache_size:
+                self.done[key] = result
+                if len(self.done) > self.cache_size:
+                    self.done.popitem(last=False)
+            return result
+        finally:
+            self.inflight.pop(key, None)
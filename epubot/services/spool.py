@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import resource
+import shutil
+import sys
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+from ebooklib import epub
+
+from epubot.services.loop import run_blocking_io
+
+
+def peak_rss_mb() -> float:
+    """返回当前进程的峰值常驻内存（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class Spool:
+    """
+    磁盘暂存区。
+    以条目 ID 为键保存文档/资源内容，写入后即可释放内存中的副本，
+    构建 EPUB 时再按需逐个读取。
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        if directory:
+            Path(directory).mkdir(parents=True, exist_ok=True)
+        self.directory = Path(tempfile.mkdtemp(prefix="epubot-spool-", dir=directory))
+        self.index: Dict[str, Tuple[Path, bool]] = {}  # key -> (文件路径, 是否为文本)
+        self.bytes_written = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def _path(self, key: str) -> Path:
+        return self.directory / hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def put(self, key: str, data: Union[str, bytes]) -> None:
+        """写入内容，覆盖同名键"""
+        is_text = isinstance(data, str)
+        payload = data.encode("utf-8") if is_text else data
+        path = self._path(key)
+        path.write_bytes(payload)
+        self.index[key] = (path, is_text)
+        self.bytes_written += len(payload)
+
+    def size(self, key: str) -> int:
+        """暂存内容的字节数（不读取内容）"""
+        path, _ = self.index[key]
+        return path.stat().st_size
+
+    def get(self, key: str) -> Union[str, bytes]:
+        path, is_text = self.index[key]
+        payload = path.read_bytes()
+        return payload.decode("utf-8") if is_text else payload
+
+    async def put_async(self, key: str, data: Union[str, bytes]) -> None:
+        await run_blocking_io(self.put, key, data)
+
+    async def get_async(self, key: str) -> Union[str, bytes]:
+        return await run_blocking_io(self.get, key)
+
+    def close(self) -> None:
+        """删除暂存目录"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.index.clear()
+
+
+class SpooledItem(epub.EpubItem):
+    """内容保存在 Spool 中的 EPUB 条目，写出时才从磁盘读取"""
+
+    def __init__(self, spool: Spool, key: str, **kwargs):
+        super().__init__(**kwargs)
+        self.spool = spool
+        self.key = key
+
+    def get_content(self, default=None):
+        content = self.spool.get(self.key)
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        return content or default or b""
+
+
+class MemoryBudget:
+    """
+    按字节数限制同时驻留内存的文档工作集。
+    单个文档超过预算时仍允许其单独执行，避免死锁。
+    """
+
+    def __init__(self, limit: Optional[int]):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def reserve(self, size: int):
+        if not self.limit:
+            yield
+            return
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.used == 0 or self.used + size <= self.limit)
+            self.used += size
+            self.peak = max(self.peak, self.used)
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.used -= size
+                self._condition.notify_all()
@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import html
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from bs4 import BeautifulSoup, NavigableString
+from ebooklib import epub
+
+from epubot.config.logger import logger
+from epubot.schemas.chunk import Chunk
+from epubot.services.metrics import RunMetrics
+
+
+def normalize_title(text: str) -> str:
+    """标题表的键：合并空白"""
+    return " ".join(text.split())
+
+
+class TitleTable:
+    """
+    全书共享的标题表。
+    目录（Link/Section）、导航文档（nav.xhtml）中的标签和正文中与之相同的标题
+    都从这里取译文：每个不同的标题只翻译一次，并按 token 预算合并为少量批次请求。
+
+    批次以带编号的 HTML 列表发送（沿用正文的 HTML 翻译提示词），按 id 取回译文；
+    缺失的条目单独重试一次，仍失败时保留原文并记录警告，不会整体丢弃。
+    """
+
+    def __init__(
+        self,
+        submit: Callable[[Chunk], Awaitable[str]],
+        count_tokens: Callable[[str], int],
+        batch_tokens: int = 2000,
+        metrics: Optional[RunMetrics] = None,
+    ):
+        self.submit = submit
+        self.count_tokens = count_tokens
+        self.batch_tokens = batch_tokens
+        self.metrics = metrics or RunMetrics()
+        self.titles: Dict[str, Optional[str]] = {}  # 原文 -> 译文（未翻译时为 None）
+        self.ready = asyncio.Event()
+
+    def __contains__(self, text: str) -> bool:
+        return normalize_title(text) in self.titles
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def add(self, text: Optional[str]) -> None:
+        if not text:
+            return
+        key = normalize_title(text)
+        if not key:
+            return
+        self.metrics.incr("titles.references")
+        self.titles.setdefault(key, None)
+
+    def extend(self, other: "TitleTable") -> None:
+        """沿用另一个标题表收集到的标题（多个目标语言共用同一份原文标题）"""
+        for key in other.titles:
+            self.titles.setdefault(key, None)
+
+    def fingerprint(self) -> str:
+        """已收集标题原文的指纹：正文标题的占位符替换取决于标题表，用于预处理缓存的键"""
+        return hashlib.sha1("\n".join(sorted(self.titles)).encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> str:
+        """返回标题译文，没有译文时返回原文"""
+        key = normalize_title(text)
+        return self.titles.get(key) or text
+
+    def collect_toc(self, toc) -> None:
+        """收集目录中所有 Link/Section 的标题"""
+        if isinstance(toc, (epub.Link, epub.Section)):
+            self.add(toc.title)
+        elif isinstance(toc, (list, tuple)):
+            for entry in toc:
+                self.collect_toc(entry)
+
+    def apply_toc(self, toc) -> None:
+        """将译文写回目录结构，EpubBuilder 据此重新生成 NCX"""
+        if isinstance(toc, (epub.Link, epub.Section)):
+            if toc.title:
+                toc.title = self.get(toc.title)
+        elif isinstance(toc, (list, tuple)):
+            for entry in toc:
+                self.apply_toc(entry)
+
+    @staticmethod
+    def _nav_strings(soup: BeautifulSoup) -> Iterable[NavigableString]:
+        """导航文档中需要翻译的文本：<title> 和各 <nav> 内的标签"""
+        for tag in soup.find_all(["title", "nav"]):
+            for string in tag.find_all(string=True):
+                if type(string) is NavigableString and string.strip():
+                    yield string
+
+    def collect_nav(self, content: str) -> None:
+        """收集导航文档中的标签（大多与目录标题相同，另有 “Contents” 等少量标签）"""
+        soup = BeautifulSoup(content, "xml")
+        for string in self._nav_strings(soup):
+            self.add(string)
+
+    def localize_nav(self, content: str) -> str:
+        """用标题表替换导航文档中的标签，保留文档的其余结构"""
+        soup = BeautifulSoup(content, "xml")
+        for string in self._nav_strings(soup):
+            translated = self.get(string)
+            if translated != string:
+                # 保留标签两侧的空白（美化输出时的缩进）
+                lead = string[: len(string) - len(string.lstrip())]
+                trail = string[len(string.rstrip()) :]
+                string.replace_with(f"{lead}{translated}{trail}")
+        return str(soup)
+
+    def batches(self) -> List[List[str]]:
+        """将待翻译的标题按 token 预算分批"""
+        batches: List[List[str]] = []
+        current: List[str] = []
+        used = 0
+        for title in (t for t, translated in self.titles.items() if translated is None):
+            tokens = self.count_tokens(title) + 8  # <li id="..."> 标记的开销
+            if current and used + tokens > self.batch_tokens:
+                batches.append(current)
+                current, used = [], 0
+            current.append(title)
+            used += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _render(titles: List[str]) -> str:
+        items = "\n".join(f'<li id="t{i}">{html.escape(title, quote=False)}</li>' for i, title in enumerate(titles))
+        return f"<ol>\n{items}\n</ol>"
+
+    @staticmethod
+    def _parse(result: str, count: int) -> Dict[int, str]:
+        parsed: Dict[int, str] = {}
+        for li in BeautifulSoup(result, "html.parser").find_all("li"):
+            index = str(li.get("id", ""))
+            if index.startswith("t") and index[1:].isdigit() and int(index[1:]) < count:
+                text = normalize_title(li.get_text())
+                if text:
+                    parsed[int(index[1:])] = text
+        return parsed
+
+    async def _translate_batch(self, titles: List[str], name: str) -> List[str]:
+        """翻译一批标题，返回未能取回译文的标题"""
+        content = self._render(titles)
+        self.metrics.incr("titles.requests")
+        try:
+            result = await self.submit(
+                Chunk(id=name, file_id="titles", content=content, tokens=self.count_tokens(content))
+            )
+        except Exception as e:
+            logger.warning("Title batch failed", batch=name, titles=len(titles), error=str(e))
+            return titles
+        parsed = self._parse(result, len(titles))
+        for i, title in enumerate(titles):
+            if i in parsed:
+                self.titles[title] = parsed[i]
+        return [title for i, title in enumerate(titles) if i not in parsed]
+
+    async def translate(self) -> Dict[str, str]:
+        """翻译所有标题。完成后（包括失败）设置 ready，等待者随即可以使用标题表"""
+        try:
+            self.metrics.set("titles.unique", len(self.titles))
+            batches = self.batches()
+            results = await asyncio.gather(
+                *(self._translate_batch(batch, f"titles-{i}") for i, batch in enumerate(batches))
+            )
+            missing = [title for batch in results for title in batch]
+            if missing:
+                # 批次结果缺失的条目逐个重试一次
+                retried = await asyncio.gather(
+                    *(self._translate_batch([title], f"titles-retry-{i}") for i, title in enumerate(missing))
+                )
+                failed = [title for batch in retried for title in batch]
+                if failed:
+                    self.metrics.incr("titles.fallbacks", len(failed))
+                    logger.warning("Titles left untranslated", count=len(failed), examples=failed[:5])
+        finally:
+            self.ready.set()
+        return {title: translated for title, translated in self.titles.items() if translated}
+
+    async def wait(self) -> "TitleTable":
+        await self.ready.wait()
+        return self
@@ -1,20 +1,103 @@
 import asyncio
+import time
+import weakref
+from typing import List, Optional, Union
 
-from mistralai import Mistral, models
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    retry_if_not_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+)
 
+from epubot.config.logger import logger
 from epubot.config.settings import settings
+from epubot.services.chunking import ChunkTuner
+from epubot.services.glossary import Glossary, GlossarySet, Term, load_glossary
+from epubot.services.hedging import Hedger
+from epubot.services.html.tokenizer import get_encoding
+from epubot.services.metrics import RunMetrics
+from epubot.services.prompts import REVIEW, REVIEW_APPROVED, PromptTemplate, get_prompt
+from epubot.services.providers import Provider, get_provider, parse_tier
+from epubot.services.quality import is_complex, quality_issue
+from epubot.services.validator import InvalidTranslation, StreamGuard, bisect, validate
 
 
 class Translator:
-    _semaphore = asyncio.Semaphore(1)
+    # 每个事件循环一个信号量：asyncio.Semaphore 发生竞争后会绑定到当时的事件循环
+    _semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+    _limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, int]" = weakref.WeakKeyDictionary()
     _last_request_time = 0
-    model = "mistral-small-latest"
 
-    def __init__(self, source_language="English", target_language="Chinese"):
+    def __init__(
+        self,
+        source_language="English",
+        target_language="Chinese",
+        metrics: Optional[RunMetrics] = None,
+        provider: Optional[Provider] = None,
+        hedge_provider: Optional[Provider] = None,
+        tiers: Optional[List[Provider]] = None,
+        tuner: Optional[ChunkTuner] = None,
+        glossary: Optional[Union[Glossary, GlossarySet]] = None,
+        prompt: Optional[PromptTemplate] = None,
+    ):
         self.source_language = source_language
         self.target_language = target_language
-        self.client = Mistral(api_key=settings.mistral_api_key)
+        self.provider = provider or get_provider()
+        # 对冲请求发往的后端，默认与主请求相同
+        self._hedge_provider = hedge_provider
+        # 级联的各层后端，从便宜到强；未启用级联时只有一层
+        if tiers is None:
+            tiers = [parse_tier(spec) for spec in settings.CASCADE_TIERS] if settings.CASCADE_ENABLED else [self.provider]
+        self.tiers = tiers
+        self.metrics = metrics or RunMetrics()
+        # 分块大小自动调整：记录每个请求的延迟、输出比例和失败情况
+        self.tuner = tuner
+        # 术语表（按目标语言）：提示词中的术语和译文的统一替换；传入单个 Glossary 时只用于它的语言
+        if isinstance(glossary, Glossary):
+            glossary = GlossarySet({glossary.lang: glossary})
+        self.glossaries = glossary or load_glossary(settings.GLOSSARY_FILE)
+        # 提示词模板（PROMPT_TEMPLATE），系统提示词在所有请求间保持不变
+        self.prompt = prompt or get_prompt()
+        self.hedger = Hedger(
+            percentile=settings.HEDGE_PERCENTILE,
+            min_samples=settings.HEDGE_MIN_SAMPLES,
+            min_delay=settings.HEDGE_MIN_DELAY,
+            budget=settings.HEDGE_BUDGET if settings.HEDGE_ENABLED else 0,
+            metrics=self.metrics,
+        )
+
+    @property
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(settings.MAX_CONCURRENT_REQUESTS)
+            self._limits[loop] = settings.MAX_CONCURRENT_REQUESTS
+        return self._semaphores[loop]
+
+    def raise_concurrency(self, concurrency: int) -> bool:
+        """提高当前事件循环内同时进行中的请求上限（只增不减），返回是否有变化"""
+        semaphore = self._semaphore
+        loop = asyncio.get_running_loop()
+        current = self._limits[loop]
+        if concurrency <= current:
+            return False
+        for _ in range(concurrency - current):
+            semaphore.release()
+        self._limits[loop] = concurrency
+        return True
+
+    def use_provider(self, provider: Provider) -> None:
+        """之后的请求全部改用指定后端（不再级联）"""
+        self.provider = provider
+        self.tiers = [provider]
+
+    @property
+    def hedge_provider(self) -> Optional[Provider]:
+        if self._hedge_provider is None and settings.HEDGE_PROVIDER:
+            self._hedge_provider = get_provider(settings.HEDGE_PROVIDER)
+        return self._hedge_provider
 
     def _clean_symbol(self, text: str) -> str:
         """清理翻译结果中的代码标记.
@@ -45,78 +128,283 @@ class Translator:
 
         return text.strip()
 
-    def _replace_designation(self, content: str) -> str:
-        """替换文本中的指定标记."""
+    def _replace_designation(self, content: str, target_lang: str = "Chinese") -> str:
+        """按目标语言的术语表替换译文中的其他译法和固定替换项，并清理代码块标记"""
         if not content:
             return content
 
-        # 替换指定的标记
-        replacements = {"您": "你", "大型语言模型": " LLM "}
-        for old, new in replacements.items():
-            content = content.replace(old, new)
-
+        content = self.glossaries.get(target_lang).enforce(content)
         content = self._clean_symbol(content)
 
         return content
 
-    async def _translate(self, text: str, source_lang: str, target_lang: str, **kwargs) -> str:
-        """Translate text using Mistral API."""
-        # 构建提示内容
-        prompt = f"""
-        Translate the following HTML from {source_lang} to {target_lang}:
+    def _messages(self, text: str, source_lang: str, target_lang: str, terms: Optional[List[Term]] = None) -> list:
+        """构建翻译请求的消息列表，terms 为该分块中出现的术语"""
+        return self.prompt.messages(text, source_lang, target_lang, Glossary.prompt(terms) if terms else "")
 
-        ```html
-        {text}
-        ```
-        """
+    def _count_prompt_tokens(self, text: str, messages: list) -> None:
+        """按本地分词器区分提示词开销（系统提示词、说明和术语）和原文的 token 数"""
+        encoding = get_encoding()
+        content_tokens = len(encoding.encode(text))
+        total = sum(len(encoding.encode(message["content"])) for message in messages)
+        self.metrics.incr("prompt.content_tokens", content_tokens)
+        self.metrics.incr("prompt.overhead_tokens", max(total - content_tokens, 0))
+
+    async def _complete(self, text: str, messages: list, provider: Provider, **kwargs) -> str:
+        content, finish_reason = await provider.complete(messages, **kwargs)
+        if settings.VALIDATION_ENABLED and finish_reason == "length":
+            raise InvalidTranslation("truncated", "finish_reason=length")
+        return content
 
-        messages = [
-            models.SystemMessage(
-                content=f"""
-                    You are an expert XML/HTML translator. Your primary task is to translate the *text content* found within the XML or HTML snippet provided by the user into the requested target language.
+    async def _stream(self, text: str, messages: list, provider: Provider, **kwargs) -> str:
+        """
+        流式请求：边接收边校验，输出出现前言、代码块或原文中不存在的标签时立即中止，
+        由 translate 重新派发，而不是等待完整的错误输出。
+        同时记录首 token 延迟（提供方排队）和生成耗时。
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        first_token = None
+        guard = StreamGuard(text) if settings.VALIDATION_ENABLED else None
+        finish_reason = None
+        parts = []
+        self.metrics.incr("stream.requests")
 
-                    Translate from {source_lang} to {target_lang}. If languages are not specified, assume English as source and Chinese as target.
+        async with provider.stream(messages, **kwargs) as deltas:
+            async for delta, finish in deltas:
+                finish_reason = finish or finish_reason
+                if not delta:
+                    continue
+                if first_token is None:
+                    first_token = loop.time()
+                    self.metrics.observe("stream.ttft_seconds", first_token - started)
+                parts.append(delta)
+                reason = guard.feed(delta) if guard else None
+                if reason:
+                    self.metrics.incr("stream.aborts")
+                    self.metrics.incr("stream.aborted_chars", len(guard.buffer))
+                    raise InvalidTranslation(reason, "stream aborted")
 
-                    **CRITICAL STRUCTURE & CONTENT:**
-                    Adhere strictly to the following rules to preserve markup integrity and translate only content:
-                    - Translate ONLY the text content that appears BETWEEN the tags.
-                    - Preserve ALL tags and attributes (XML/HTML) EXACTLY as they appear. The set of all tags (including both opening <tag> and closing </tag> tags) and attributes in output MUST be identical to original. **Absolutely NO tag or attribute must be lost, added, or changed.** # 强调不可丢失、添加、改变
+        finished = loop.time()
+        if first_token is not None:
+            self.metrics.observe("stream.generation_seconds", finished - first_token)
+        logger.debug(
+            "Stream completed",
+            provider=provider.name,
+            ttft=None if first_token is None else round(first_token - started, 3),
+            total=round(finished - started, 3),
+            finish_reason=finish_reason,
+        )
+        if settings.VALIDATION_ENABLED and finish_reason == "length":
+            raise InvalidTranslation("truncated", "finish_reason=length")
+        return "".join(parts)
 
-                    **OUTPUT FORMAT:**
-                    Your response MUST contain **ABSOLUTELY NOTHING EXCEPT** the translated XML or HTML content from the input snippet. Do NOT include any preamble, postamble, conversation, explanation, code block markers (```), markdown, or **any tags or attributes that were not present in the original input snippet.** Respond strictly with the raw, translated XML or HTML string. # 极度强调只输出原文片段的翻译，禁止添加
+    def build_messages(self, text: str, source_lang: str, target_lang: str) -> list:
+        """分块的完整请求消息（含该分块中出现的术语），批量导出也使用它"""
+        terms = self.glossaries.get(target_lang).find(text, limit=settings.GLOSSARY_MAX_TERMS)
+        if terms:
+            self.metrics.incr("glossary.injected_terms", len(terms))
+        return self._messages(text, source_lang, target_lang, terms)
 
-                    **QUALITY & FLOW:**
-                    - Ensure the translated content is fluent, natural, uses correct punctuation, and standard written style.
-                    - Adjust element order within the markup structure for natural target language flow, if needed. This reordering is an allowed exception to strict structural preservation, but you MUST NOT change, add, or remove any tags or attributes themselves during this reordering.
-                    """
-            ),
-            models.UserMessage(content=prompt),
-        ]
+    async def _translate(
+        self, text: str, source_lang: str, target_lang: str, provider: Optional[Provider] = None, **kwargs
+    ) -> str:
+        """Translate text using the configured provider."""
+        provider = provider or self.provider
+        messages = self.build_messages(text, source_lang, target_lang)
+        self._count_prompt_tokens(text, messages)
+        if settings.STREAMING:
+            result = await self._stream(text, messages, provider, **kwargs)
+        else:
+            result = await self._complete(text, messages, provider, **kwargs)
+        return self._replace_designation(result, target_lang)
 
-        response = await self.client.chat.complete_async(model=self.model, messages=messages, temperature=0.1, **kwargs)
-        result = response.choices[0].message.content
+    async def _attempt(self, content: str, source_lang: str, target_lang: str, provider: Provider, **kwargs) -> str:
+        """单次请求并校验输出，未通过校验时抛出 InvalidTranslation"""
+        started = time.monotonic()
+        try:
+            result = await self._translate(content, source_lang, target_lang, provider=provider, **kwargs)
+            if settings.VALIDATION_ENABLED:
+                reason = validate(content, result)
+                if reason:
+                    raise InvalidTranslation(reason)
+        except Exception:
+            if self.tuner is not None:
+                self.tuner.record(provider, content, 0, time.monotonic() - started, failed=True)
+            raise
+        if self.tuner is not None:
+            encoding = get_encoding()
+            self.tuner.record(
+                provider,
+                content,
+                len(encoding.encode(content)),
+                time.monotonic() - started,
+                output_tokens=len(encoding.encode(result)),
+            )
+        return result
 
-        return self._replace_designation(result)
+    async def _wait_interval(self) -> None:
+        # 确保距离上次请求至少间隔 REQUEST_INTERVAL 秒。
+        # 先预留下一个发送时刻再等待，并发的请求依次排开，而不是等待同样的时间后一起发出
+        current_time = asyncio.get_event_loop().time()
+        slot = max(current_time, self._last_request_time + settings.REQUEST_INTERVAL)
+        self.__class__._last_request_time = slot
+        if slot > current_time:
+            await asyncio.sleep(slot - current_time)
 
-    @retry(stop=stop_after_attempt(10), wait=wait_exponential(multiplier=2, min=10, max=30))
-    async def translate(
-        self, content: str, source_lang: str = "English", target_lang: str = "Chinese", **kwargs
+    @retry(
+        stop=stop_after_attempt(10),
+        wait=wait_exponential(multiplier=2, min=10, max=30),
+        # 校验失败由 translate 处理，不做长时间退避；取消（CancelledError 不是 Exception）立即向上传播
+        retry=retry_if_exception_type(Exception) & retry_if_not_exception_type(InvalidTranslation),
+    )
+    async def _request(
+        self, content: str, source_lang: str, target_lang: str, provider: Optional[Provider] = None, **kwargs
     ) -> str:
-        """Translate text with rate limiting and concurrency control."""
+        """
+        Send one request with rate limiting and concurrency control, then validate the output.
+        超过对冲阈值仍未返回时由 Hedger 追加一个副本请求，先通过校验的结果胜出。
+        """
         async with self._semaphore:  # 使用信号量控制并发
-            # 确保距离上次请求至少有1秒
-            current_time = asyncio.get_event_loop().time()
-            time_since_last_request = current_time - self._last_request_time
-            if time_since_last_request < 3:
-                await asyncio.sleep(3 - time_since_last_request)
-
-            self.__class__._last_request_time = asyncio.get_event_loop().time()
+            await self._wait_interval()
 
+            provider = provider or self.provider
             try:
-                return await self._translate(content, source_lang, target_lang, **kwargs)
+                return await self.hedger.run(
+                    lambda: self._attempt(content, source_lang, target_lang, provider, **kwargs),
+                    lambda: self._attempt(content, source_lang, target_lang, self.hedge_provider or provider, **kwargs),
+                    tokens=len(get_encoding().encode(content)) if self.hedger.budget else 0,
+                )
             except Exception as e:
                 raise e
 
+    def _escalate(self, tier: Provider, reason: str) -> None:
+        self.metrics.incr("cascade.escalations")
+        self.metrics.incr(f"cascade.escalated_{reason}")
+        logger.info("Escalating chunk to a stronger model", tier=f"{tier.name}/{tier.model}", reason=reason)
+
+    async def _cascade(self, content: str, source_lang: str, target_lang: str, start: int = 0, **kwargs) -> str:
+        """
+        从第 start 层开始逐层翻译：未通过结构校验或质量检查时升级到下一层，
+        复杂分块直接使用最强的一层。最后一层的结构校验失败向上抛出。
+        """
+        last = len(self.tiers) - 1
+        cascading = last > 0
+        if cascading:
+            self.metrics.incr("cascade.chunks")
+            if start < last and is_complex(content):
+                self._escalate(self.tiers[start], "complex")
+                start = last
+        tokens = len(get_encoding().encode(content)) if cascading else 0
+
+        for level in range(start, last + 1):
+            tier = self.tiers[level]
+            label = f"cascade.{tier.name}/{tier.model}"
+            started = time.monotonic()
+            try:
+                result = await self._request(content, source_lang, target_lang, provider=tier, **kwargs)
+            except InvalidTranslation as e:
+                if level == last:
+                    raise
+                self.metrics.incr("validation.failures")
+                self.metrics.incr(f"validation.{e.reason}")
+                self._escalate(tier, "invalid")
+                continue
+            finally:
+                if cascading:
+                    elapsed = time.monotonic() - started
+                    self.metrics.incr(f"{label}.requests")
+                    self.metrics.incr(f"{label}.tokens", tokens)
+                    self.metrics.incr(f"{label}.seconds", elapsed)
+
+            issue = quality_issue(content, result, target_lang) if level < last else None
+            if issue:
+                self._escalate(tier, issue)
+                continue
+            if cascading:
+                self.metrics.incr(f"{label}.accepted")
+                self._update_cascade_rates()
+            return result
+
+    def _update_cascade_rates(self) -> None:
+        """各层吞吐量（token/秒）与升级比例"""
+        chunks = self.metrics.get("cascade.chunks")
+        if chunks:
+            self.metrics.set("cascade.escalation_rate", round(self.metrics.get("cascade.escalations") / chunks, 4))
+        for tier in self.tiers:
+            label = f"cascade.{tier.name}/{tier.model}"
+            seconds = self.metrics.get(f"{label}.seconds")
+            if seconds:
+                self.metrics.set(f"{label}.tokens_per_second", round(self.metrics.get(f"{label}.tokens") / seconds, 1))
+
+    async def _translate_validated(self, content: str, source_lang: str, target_lang: str, depth: int, **kwargs) -> str:
+        for attempt in range(settings.VALIDATION_RETRIES + 1):
+            try:
+                # 重试时直接使用最强的一层
+                start = 0 if attempt == 0 else len(self.tiers) - 1
+                return await self._cascade(content, source_lang, target_lang, start=start, **kwargs)
+            except InvalidTranslation as e:
+                self.metrics.incr("validation.failures")
+                self.metrics.incr(f"validation.{e.reason}")
+                logger.warning("Invalid translation", reason=str(e), attempt=attempt + 1, depth=depth, size=len(content))
+
+        halves = bisect(content) if depth < settings.VALIDATION_MAX_SPLIT_DEPTH else None
+        if halves is None:
+            # 无法继续拆分：保留原文，保证输出结构完整
+            self.metrics.incr("validation.fallbacks")
+            logger.warning("Keeping source text after repeated invalid translations", depth=depth, size=len(content))
+            return content
+
+        self.metrics.incr("validation.bisections")
+        parts = await asyncio.gather(
+            *(self._translate_validated(half, source_lang, target_lang, depth + 1, **kwargs) for half in halves)
+        )
+        return "".join(parts)
+
+    def _review_messages(
+        self, source: str, translated: str, source_lang: str, target_lang: str, issues: List[str]
+    ) -> list:
+        """构建审校请求的消息列表，issues 为本地检查发现的可能问题"""
+        checks = "\n".join(f"- {issue}" for issue in issues)
+        return REVIEW.messages(source, source_lang, target_lang, translated=translated, checks=checks)
+
+    async def review(
+        self,
+        source: str,
+        translated: str,
+        source_lang: str = "English",
+        target_lang: str = "Chinese",
+        issues: Optional[List[str]] = None,
+    ) -> Optional[str]:
+        """
+        请求最强一层模型审校一个分块的译文。
+        Returns:
+            修改后的译文；认可原译文，或修改后的译文未通过结构校验时为 None
+        """
+        messages = self._review_messages(source, translated, source_lang, target_lang, issues or [])
+        async with self._semaphore:
+            await self._wait_interval()
+            content, finish_reason = await self.tiers[-1].complete(messages)
+        if REVIEW_APPROVED in content:
+            return None
+        revised = self._replace_designation(content, target_lang)
+        reason = validate(source, revised, finish_reason)
+        if reason:
+            self.metrics.incr("review.rejected")
+            logger.info("Discarding reviewed translation", reason=reason)
+            return None
+        return revised
+
+    async def translate(
+        self, content: str, source_lang: str = "English", target_lang: str = "Chinese", **kwargs
+    ) -> str:
+        """
+        Translate text with rate limiting and concurrency control.
+        未通过结构校验的分块先单独重发，仍失败时对半拆分后分别翻译，
+        而不是重复整个分块的 10 次重试。
+        """
+        return await self._translate_validated(content, source_lang, target_lang, 0, **kwargs)
+
 
 if __name__ == "__main__":
     translator = Translator()
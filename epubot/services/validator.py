@@ -0,0 +1,163 @@
+import re
+from collections import Counter
+from typing import Optional, Tuple
+
+from epubot.config.settings import settings
+from epubot.services.html.tokenizer import get_encoding
+from epubot.services.singleflight import PLACEHOLDER_PATTERN
+
+# 开始、结束和自闭合标签；注释、DOCTYPE 和处理指令不计入
+TAG_PATTERN = re.compile(r"<(/?)([A-Za-z][\w:.-]*)(?:\s[^<>]*?)?(/?)>")
+
+
+class InvalidTranslation(Exception):
+    """模型输出未通过结构校验"""
+
+    def __init__(self, reason: str, detail: str = ""):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason
+        self.detail = detail
+
+
+def tag_counts(content: str) -> Counter:
+    """统计标签多重集，键为 (标签名, open/close/self)"""
+    counts: Counter = Counter()
+    for close, name, self_closing in TAG_PATTERN.findall(content):
+        kind = "close" if close else "self" if self_closing else "open"
+        counts[(name.lower(), kind)] += 1
+    return counts
+
+
+def validate(source: str, translated: str, finish_reason: Optional[str] = None) -> Optional[str]:
+    """
+    校验单个分块的译文结构。
+    Returns:
+        失败原因（empty / truncated / placeholders / tags），通过时返回 None
+    """
+    if source.strip() and not translated.strip():
+        return "empty"
+    if finish_reason == "length":
+        return "truncated"
+    if set(PLACEHOLDER_PATTERN.findall(source)) != set(PLACEHOLDER_PATTERN.findall(translated)):
+        return "placeholders"
+    if tag_counts(source) != tag_counts(translated):
+        return "tags"
+
+    # 译文明显短于原文时视为被截断（短分块的比例波动大，不参与判断）
+    encoding = get_encoding()
+    source_tokens = len(encoding.encode(source))
+    if source_tokens >= settings.VALIDATION_MIN_TOKENS:
+        ratio = len(encoding.encode(translated)) / source_tokens
+        if ratio < settings.VALIDATION_MIN_TOKEN_RATIO:
+            return "truncated"
+    return None
+
+
+def bisect(content: str) -> Optional[Tuple[str, str]]:
+    """
+    将分块在最接近中点的位置一分为二，优先选择顶层元素的结束标签处，
+    其次是任意结束标签，最后是空白处。无法拆分时返回 None。
+    """
+    middle = len(content) // 2
+    top_level, any_close = [], []
+    depth = 0
+    for match in TAG_PATTERN.finditer(content):
+        close, _, self_closing = match.groups()
+        if close:
+            depth = max(depth - 1, 0)
+            any_close.append(match.end())
+            if depth == 0:
+                top_level.append(match.end())
+        elif not self_closing:
+            depth += 1
+
+    whitespace = [m.start() for m in re.finditer(r"\s+", content)]
+    for candidates in (top_level, any_close, whitespace):
+        candidates = [pos for pos in candidates if 0 < pos < len(content) and content[:pos].strip() and content[pos:].strip()]
+        if candidates:
+            pos = min(candidates, key=lambda p: abs(p - middle))
+            return content[:pos], content[pos:]
+    return None
+
+
+class StreamGuard:
+    """
+    流式输出的增量校验。
+    每收到一段输出调用 feed()，一旦出现以下情况立即返回失败原因，调用方可中止本次生成：
+    - preamble：原文以标签或占位符开头，而输出以其他文字开头（如 “Here is the translation”）；
+    - fence：正文中间出现代码块标记（开头的 ```html 由 _clean_symbol 去除，不视为错误）；
+    - unknown_tag / extra_tag：输出了原文中不存在的标签，或同一标签的数量超过原文；
+    - unknown_placeholder：输出了原文中不存在的占位符。
+    """
+
+    PENDING_LIMIT = 256
+
+    def __init__(self, source: str):
+        self.source = source
+        self.expects_markup = source.lstrip()[:1] in ("<", "{")
+        self.tags = tag_counts(source)
+        self.tag_names = {name for name, _ in self.tags}
+        self.placeholders = set(PLACEHOLDER_PATTERN.findall(source))
+        self.buffer = ""
+        self.seen: Counter = Counter()
+        self.scanned = 0  # buffer 中已检查过的位置
+        self.started = False
+
+    def _body_start(self) -> Optional[int]:
+        """跳过开头的空白和代码块标记，返回正文起始位置；尚无法判断时返回 None"""
+        text = self.buffer.lstrip()
+        offset = len(self.buffer) - len(text)
+        if text.startswith("`"):
+            if len(text) < 3 and "```".startswith(text):
+                return None
+            if text.startswith("```"):
+                newline = text.find("\n")
+                if newline == -1:
+                    return None
+                rest = text[newline + 1 :]
+                return offset + newline + 1 + (len(rest) - len(rest.lstrip()))
+        return offset if text else None
+
+    def feed(self, delta: str) -> Optional[str]:
+        self.buffer += delta
+        if not self.started:
+            start = self._body_start()
+            if start is None or start >= len(self.buffer):
+                return None
+            self.started = True
+            self.scanned = start
+            if self.expects_markup and self.buffer[start] not in ("<", "{"):
+                return "preamble"
+
+        # 结尾的代码块标记同样由 _clean_symbol 去除，标记之后还有内容才视为错误
+        fence = self.buffer.find("```", self.scanned)
+        if fence != -1:
+            if self.buffer[fence + 3 :].strip():
+                return "fence"
+            cut = fence
+        else:
+            cut = len(self.buffer)
+
+        # 只检查已完整输出的标签和占位符，未闭合的 “<” 或 “{” 之后的内容留待下次
+        # （超过 PENDING_LIMIT 仍未闭合的视为普通文本，例如 “a < b”）
+        for marker, closer in (("<", ">"), ("{", "}")):
+            pos = self.buffer.rfind(marker, self.scanned, cut)
+            if pos != -1 and closer not in self.buffer[pos:cut] and cut - pos < self.PENDING_LIMIT:
+                cut = pos
+        window = self.buffer[self.scanned : cut]
+        if not window:
+            return None
+
+        for close, name, self_closing in TAG_PATTERN.findall(window):
+            name = name.lower()
+            if name not in self.tag_names:
+                return "unknown_tag"
+            key = (name, "close" if close else "self" if self_closing else "open")
+            self.seen[key] += 1
+            if self.seen[key] > self.tags[key]:
+                return "extra_tag"
+        for holder in PLACEHOLDER_PATTERN.findall(window):
+            if holder not in self.placeholders:
+                return "unknown_placeholder"
+        self.scanned = cut
+        return None
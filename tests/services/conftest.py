@@ -0,0 +1,110 @@
+# tests/services/conftest.py
+
+from contextlib import asynccontextmanager
+
+import pytest
+from ebooklib import epub
+
+from epubot.config.settings import settings
+from epubot.services.html.tokenizer import get_encoding
+from epubot.services.providers import Provider
+
+CHAPTERS = [
+    ("Introduction", "<h1>Introduction</h1><p>Hello world.</p><p>This is <code>x = 1</code> code.</p>"),
+    ("Chapter One", "<h1>Chapter One</h1><p>First paragraph.</p><img src='../images/a.png' alt='a'/>"),
+    ("Chapter Two", "<h1>Chapter Two</h1><p>Second paragraph.</p><pre>print('hi')</pre>"),
+]
+
+
+@pytest.fixture(autouse=True)
+def offline_tokenizer(monkeypatch):
+    """测试中不联网下载分词器，缓存缺失时使用近似分词器"""
+    monkeypatch.setattr(settings, "TOKENIZER_OFFLINE", True)
+    get_encoding.cache_clear()
+    yield
+    get_encoding.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def artifact_cache(tmp_path, monkeypatch):
+    """预处理缓存写入测试的临时目录"""
+    monkeypatch.setattr(settings, "ARTIFACT_CACHE_DIR", str(tmp_path / "artifacts"))
+
+
+@pytest.fixture
+def sample_epub(tmp_path):
+    """生成一个包含三个章节和一张图片的小型 EPUB 文件"""
+    book = epub.EpubBook()
+    book.set_identifier("epubot-test")
+    book.set_title("Test Book")
+    book.set_language("en")
+    book.add_item(epub.EpubImage(uid="img_a", file_name="images/a.png", media_type="image/png", content=b"\x89PNG"))
+    chapters = []
+    for i, (title, body) in enumerate(CHAPTERS, start=1):
+        chapter = epub.EpubHtml(title=title, file_name=f"Text/chapter-{i}.xhtml", lang="en")
+        chapter.content = body
+        book.add_item(chapter)
+        chapters.append(chapter)
+    book.toc = [epub.Link(c.file_name, c.title, c.id) for c in chapters]
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+    book.spine = ["nav", *chapters]
+    path = tmp_path / "book.epub"
+    epub.write_epub(str(path), book, {})
+    return path
+
+
+class EchoTranslator:
+    """不访问网络的翻译器：给文本加上标记后原样返回"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def translate(self, content: str, source_lang: str = "English", target_lang: str = "Chinese", **kwargs):
+        self.requests.append(content)
+        return content.replace("<p>", "<p>[zh]")
+
+
+@pytest.fixture
+def echo_translator():
+    return EchoTranslator()
+
+
+class FakeProvider(Provider):
+    """测试用后端的基类：子类只需实现 complete()，流式请求把完整输出作为一段返回"""
+
+    @asynccontextmanager
+    async def stream(self, messages, **kwargs):
+        content, finish_reason = await self.complete(messages, **kwargs)
+
+        async def deltas():
+            yield content, finish_reason
+
+        yield deltas()
+
+
+def fenced_text(messages) -> str:
+    """请求消息中 ```html 代码块内的待翻译文本"""
+    return messages[-1]["content"].split("```html\n")[1].split("\n```")[0]
+
+
+class EchoProvider(FakeProvider):
+    """不访问网络的后端：记录请求，把待翻译文本交给 reply() 处理后返回（默认原样返回）"""
+
+    name = "echo"
+    model = "echo-model"
+
+    def __init__(self, name: str = "", model: str = ""):
+        self.name = name or self.name
+        self.model = model or self.model
+        self.messages = []
+        self.requests = []
+
+    async def reply(self, text: str) -> str:
+        return text
+
+    async def complete(self, messages, **kwargs):
+        self.messages.append(messages)
+        text = fenced_text(messages)
+        self.requests.append(text)
+        return await self.reply(text), "stop"
@@ -0,0 +1,107 @@
+# tests/services/test_artifacts.py
+
+import asyncio
+import os
+import zipfile
+
+from typer.testing import CliRunner
+
+from epubot.main import app
+from epubot.services.artifacts import ArtifactCache, Prepared, artifact_key, prepare
+from epubot.services.coordinator import Coordinator
+from epubot.services.html import HTMLSplitter
+
+CONTENT = "<html><body><h1>Title</h1><p>Hello <code>x = 1</code> wörld 你好.</p>" + "<p>More text.</p>" * 50 + "</body></html>"
+
+
+def test_round_trip_through_mmap(tmp_path):
+    splitter = HTMLSplitter(40)
+    replacer, chunks = prepare(CONTENT, splitter)
+    assert len(chunks) > 1
+    prepared = Prepared.from_replacer("".join(c.content for c in chunks), replacer, chunks)
+    assert Prepared.loads(prepared.dumps()) == prepared
+
+    cache = ArtifactCache(str(tmp_path))
+    cache.put("ab" * 32, prepared)
+    loaded = cache.get("ab" * 32)
+    assert loaded == prepared and cache.metrics.get("artifacts.hits") == 1
+    restored = loaded.replacer().restore("".join(c.content for c in loaded.to_chunks()))
+    assert restored == replacer.restore("".join(c.content for c in chunks))
+    assert "<code>x = 1</code>" in restored
+
+
+def test_prepare_uses_cache_keyed_by_config(tmp_path, monkeypatch):
+    cache = ArtifactCache(str(tmp_path))
+    splitter = HTMLSplitter(40)
+    first = prepare(CONTENT, splitter, cache=cache)[1]
+
+    # 命中缓存时不再解析和分词
+    monkeypatch.setattr(HTMLSplitter, "split", lambda *args: (_ for _ in ()).throw(AssertionError("split")))
+    second = prepare(CONTENT, splitter, cache=cache)[1]
+    assert [(c.id, c.content, c.tokens) for c in second] == [(c.id, c.content, c.tokens) for c in first]
+    assert cache.metrics.get("artifacts.hits") == 1
+
+    assert artifact_key(CONTENT, 40, "cl100k_base") != artifact_key(CONTENT, 80, "cl100k_base")
+    assert artifact_key(CONTENT, 40, "cl100k_base") != artifact_key(CONTENT, 40, "cl100k_base", titles="abc")
+    assert artifact_key(CONTENT, 40, "cl100k_base") != artifact_key(CONTENT + " ", 40, "cl100k_base")
+
+
+def test_unreadable_artifact_is_a_miss(tmp_path):
+    cache = ArtifactCache(str(tmp_path))
+    key = "cd" * 32
+    cache.put(key, Prepared("doc", {}, {}, [("1", "doc", 1)]))
+    path = cache._path(key)
+    path.write_bytes(path.read_bytes()[:10])
+    assert cache.get(key) is None
+    path.write_bytes(b"")
+    assert cache.get(key) is None and cache.metrics.get("artifacts.misses") == 2
+
+
+def test_cache_prunes_least_recently_used_over_limit(tmp_path):
+    prepared = Prepared("doc", {}, {}, [("1", "doc", 1)])
+    size = len(prepared.dumps())
+    cache = ArtifactCache(str(tmp_path), max_bytes=int(size * 3.5))
+    keys = [c * 64 for c in "abcd"]
+    for key in keys[:3]:
+        cache.put(key, prepared)
+    for i, key in enumerate(keys[:3]):
+        os.utime(cache._path(key), (100 + i, 100 + i))
+    # 命中的文件变为最近使用，超出上限时淘汰最久未使用的 b
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[3], prepared)
+    assert [cache._path(key).exists() for key in keys] == [True, False, True, True]
+    assert cache.metrics.get("artifacts.evicted") == 1
+
+
+def test_rerun_skips_replace_and_split(sample_epub, tmp_path, echo_translator, monkeypatch):
+    def run(output):
+        coordinator = Coordinator(str(sample_epub), output_file=str(output), enable_resume=False)
+        coordinator.translator = echo_translator
+        asyncio.run(coordinator.process())
+        with zipfile.ZipFile(output) as archive:
+            chapters = {name: archive.read(name) for name in archive.namelist() if name.endswith(".xhtml")}
+        return coordinator.metrics, chapters
+
+    cold, first = run(tmp_path / "first.epub")
+    assert cold.get("artifacts.misses") == 3 and cold.get("artifacts.hits") == 0
+
+    monkeypatch.setattr(HTMLSplitter, "split", lambda *args: (_ for _ in ()).throw(AssertionError("split")))
+    warm, second = run(tmp_path / "second.epub")
+    assert warm.get("artifacts.hits") == 3
+    assert first == second
+
+
+def test_simulate_after_translate_hits_cache(sample_epub, tmp_path, echo_translator, monkeypatch):
+    coordinator = Coordinator(str(sample_epub), output_file=str(tmp_path / "out.epub"), enable_resume=False)
+    coordinator.translator = echo_translator
+    asyncio.run(coordinator.process())
+
+    # simulate 使用与翻译相同的标题表和分块上限，预处理全部命中缓存
+    monkeypatch.setattr(HTMLSplitter, "split", lambda *args: (_ for _ in ()).throw(AssertionError("split")))
+    result = CliRunner().invoke(app, ["simulate", str(sample_epub)])
+    assert result.exit_code == 0, result.output
+    assert "3 个分块" in result.output
+
+    estimate = Coordinator(str(sample_epub), enable_resume=False)
+    asyncio.run(estimate.prepare_book(estimate.epub_parser.parse()))
+    assert estimate.metrics.get("artifacts.hits") == 3 and estimate.metrics.get("artifacts.misses") == 0
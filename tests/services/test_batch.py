@@ -0,0 +1,92 @@
+# tests/services/test_batch.py
+
+import asyncio
+import json
+
+import ebooklib
+from ebooklib import epub
+
+from epubot.config.settings import settings
+from epubot.services.batch import BatchExporter, BatchResults, batch_id, parse_results
+from epubot.services.coordinator import Coordinator
+from epubot.services.singleflight import canonicalize
+from tests.services.conftest import fenced_text
+
+
+def _result(custom_id, content, finish_reason="stop"):
+    body = {"choices": [{"message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}]}
+    return {"custom_id": custom_id, "response": {"status_code": 200, "body": body}, "error": None}
+
+
+def test_ids_and_placeholders_are_stable_across_runs():
+    first = "<p>Hello {Ab12Cd34} world {Zz99Yy88}.</p>"
+    second = "<p>Hello   {Qq11Ww22} world {Ee33Rr44}.</p>"
+    exporter = BatchExporter(lambda text, lang: [{"role": "user", "content": f"```html\n{text}\n```"}], "full/v2")
+    for content in (first, second):
+        canonical, placeholders = canonicalize(content)
+        assert exporter.lookup(content, canonical, placeholders, "zh") == content
+    assert len(exporter.requests) == 1
+    (custom_id, messages), = exporter.requests.items()
+    assert fenced_text(messages) == "<p>Hello {ph000000} world {ph000001}.</p>"
+    canonical = canonicalize(first)[0]
+    assert custom_id == batch_id(canonical, "zh", "full/v2") != batch_id(canonical, "ja", "full/v2")
+
+    # 导入时结果中的确定性占位符换回本次运行的占位符
+    results = BatchResults({custom_id: ("<p>你好 {ph000000} 世界 {ph000001}。</p>", "stop")}, "full/v2")
+    canonical, placeholders = canonicalize(second)
+    assert results.lookup(second, canonical, placeholders, "zh") == "<p>你好 {Qq11Ww22} 世界 {Ee33Rr44}。</p>"
+    assert results.lookup(second, canonical, placeholders, "ja") is None
+
+
+def test_parse_results_skips_failed_requests(tmp_path):
+    path = tmp_path / "results.jsonl"
+    lines = [
+        _result("zh-a", "<p>好</p>"),
+        {"custom_id": "zh-b", "response": {"status_code": 500, "body": {}}, "error": None},
+        {"custom_id": "zh-c", "response": None, "error": {"message": "timeout"}},
+        {"custom_id": "zh-d"},
+    ]
+    path.write_text("\n".join(json.dumps(line) for line in lines) + "\n\n", encoding="utf-8")
+    results = BatchResults(parse_results(str(path)), "full/v2")
+    assert results.results == {"zh-a": ("<p>好</p>", "stop")}
+
+
+def test_export_import_round_trip(tmp_path, sample_epub, echo_translator, monkeypatch):
+    monkeypatch.setattr(settings, "SKIP_ENABLED", False)
+    requests_path = tmp_path / "requests.jsonl"
+    exporter = Coordinator(str(sample_epub), enable_resume=False)
+    count = asyncio.run(exporter.export_batch(str(requests_path), "openai"))
+    lines = [json.loads(line) for line in requests_path.read_text(encoding="utf-8").splitlines()]
+    assert count == len(lines) > 3
+    assert all(line["url"] == "/v1/chat/completions" and line["body"]["model"] for line in lines)
+    assert not list(tmp_path.glob("*-zh.epub"))
+
+    # 离线模拟批量接口：一个结果缺少标签、一个请求失败，其余正常
+    body = [line for line in lines if "<p>" in fenced_text(line["body"]["messages"])]
+    results = []
+    for line in lines:
+        text = fenced_text(line["body"]["messages"])
+        if line is body[0]:
+            results.append(_result(line["custom_id"], text.replace("<p>", "", 1).replace("</p>", "", 1)))
+        elif line is body[1]:
+            results.append({"custom_id": line["custom_id"], "error": {"message": "failed"}})
+        else:
+            results.append(_result(line["custom_id"], text.replace("<p>", "<p>[zh]")))
+    results_path = tmp_path / "results.jsonl"
+    results_path.write_text("\n".join(json.dumps(line) for line in results), encoding="utf-8")
+
+    output = tmp_path / "out.epub"
+    coordinator = Coordinator(
+        str(sample_epub), output_file=str(output), enable_resume=False, batch_results=str(results_path)
+    )
+    coordinator.translator = echo_translator
+    asyncio.run(coordinator.process())
+
+    # 只有未通过校验和失败的分块重新交互翻译
+    assert len(echo_translator.requests) == 2
+    assert coordinator.metrics.get("batch.invalid") == 1
+    assert coordinator.metrics.get("batch.missing") == 1
+    assert coordinator.metrics.get("batch.used") == count - 2
+    built = epub.read_epub(str(output))
+    bodies = [item.get_content().decode("utf-8") for item in built.get_items_of_type(ebooklib.ITEM_DOCUMENT) if "chapter" in item.file_name]
+    assert len(bodies) == 3 and all("[zh]" in content for content in bodies)
@@ -0,0 +1,101 @@
+# tests/services/test_cascade.py
+
+import asyncio
+import re
+
+import pytest
+
+from epubot.config.settings import settings
+from epubot.services.quality import is_complex, quality_issue
+from epubot.services.translator import Translator
+from tests.services.conftest import EchoProvider
+
+SOURCE = "<p>The quick brown fox jumps over the lazy dog near the river bank.</p>"
+
+
+def test_quality_accepts_translation():
+    assert quality_issue(SOURCE, "<p>敏捷的棕色狐狸跳过了河岸边那只懒惰的狗。</p>", "Chinese") is None
+
+
+@pytest.mark.parametrize(
+    "translated, reason",
+    [
+        (SOURCE, "untranslated"),
+        ("<p>狐狸。</p>", "length"),
+        ("<p>Der schnelle Fuchs springt über den faulen Hund am Ufer.</p>", "language"),
+    ],
+)
+def test_quality_detects_issues(translated, reason):
+    assert quality_issue(SOURCE, translated, "Chinese") == reason
+
+
+def test_untranslated_check_for_latin_script_target():
+    # 法语译文保留专名和同形词是正常的；仍是英文时才算未翻译
+    source = "<p>Captain Nemo showed Professor Aronnax, Conseil and Ned Land the Nautilus salon.</p>"
+    french = "<p>Le capitaine Nemo montra au professeur Aronnax, à Conseil et à Ned Land le salon du Nautilus.</p>"
+    assert quality_issue(source, french, "French") is None
+    english = "<p>The quick brown fox jumps over the lazy dog and then it runs to the river with his friend.</p>"
+    assert quality_issue(english, english, "French") == "untranslated"
+    assert quality_issue(source, source, "Chinese") == "untranslated"
+
+
+def test_short_chunks_skip_quality_checks():
+    assert quality_issue("<p>Hi</p>", "<p>Hi</p>", "Chinese") is None
+
+
+def test_markup_dense_chunks_are_complex():
+    dense = "".join(f"<span>word{i}</span>{{abcdefg{i % 10}}}" for i in range(30))
+    assert is_complex(dense)
+    assert not is_complex(SOURCE * 3)
+
+
+class TierProvider(EchoProvider):
+    """cheap 层对包含 “hard” 的分块原样返回，strong 层总是正确翻译"""
+
+    def __init__(self, name):
+        super().__init__(name, f"{name}-model")
+
+    async def reply(self, text):
+        if self.name == "cheap" and "hard" in text:
+            return text
+        return re.sub(r">[^<]+<", ">" + "译文" * 20 + "<", text)
+
+
+@pytest.fixture
+def cascade(monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_INTERVAL", 0)
+    monkeypatch.setattr(settings, "STREAMING", False)
+    cheap, strong = TierProvider("cheap"), TierProvider("strong")
+    return cheap, strong, Translator(tiers=[cheap, strong])
+
+
+def test_cascade_escalates_only_failing_chunks(cascade):
+    cheap, strong, translator = cascade
+    chunks = [
+        "<p>An easy sentence that the cheap model handles without trouble.</p>",
+        "<p>A hard sentence that the cheap model leaves completely untranslated.</p>",
+        "<p>Another easy sentence for the cheap model to translate quickly.</p>",
+    ]
+
+    async def run():
+        return await asyncio.gather(*(translator.translate(chunk) for chunk in chunks))
+
+    results = asyncio.run(run())
+    assert all("译文" in r for r in results)
+    assert len(cheap.requests) == 3
+    assert strong.requests == [chunks[1]]
+
+    report = translator.metrics.report()["cascade"]
+    assert report["escalated_untranslated"] == 1
+    assert report["escalation_rate"] == round(1 / 3, 4)
+    assert report["cheap/cheap-model.accepted"] == 2
+    assert report["strong/strong-model.accepted"] == 1
+    assert "tokens_per_second" in "".join(report)
+
+
+def test_complex_chunks_go_straight_to_strongest_tier(cascade):
+    cheap, strong, translator = cascade
+    dense = "<p>" + "".join(f"<b>w{i}</b>" for i in range(30)) + "</p>"
+    asyncio.run(translator.translate(dense))
+    assert cheap.requests == []
+    assert translator.metrics.get("cascade.escalated_complex") == 1
@@ -0,0 +1,96 @@
+# tests/services/test_chunking.py
+
+import asyncio
+
+import pytest
+
+from epubot.config.settings import settings
+from epubot.services.chunking import ChunkTuner, content_type
+from epubot.services.html import HTMLSplitter
+from epubot.services.translator import Translator
+from tests.services.conftest import EchoProvider
+
+PROSE = "<p>" + "A plain sentence of ordinary prose. " * 10 + "</p>"
+MARKUP = "<p>" + "".join(f"<b>w{i}</b>" for i in range(30)) + "</p>"
+
+
+def _tuner(**kwargs):
+    options = dict(default=4000, min_tokens=1000, max_tokens=8000, target_latency=60, min_samples=3)
+    options.update(kwargs)
+    return ChunkTuner(**options)
+
+
+def _feed(tuner, provider, count, seconds=4.0, output_ratio=1.0, failed=False, content=PROSE):
+    for _ in range(count):
+        tuner.record(provider, content, 4000, seconds, output_tokens=int(4000 * output_ratio), failed=failed)
+
+
+def test_healthy_backend_grows_chunks_to_cut_overhead():
+    tuner, provider = _tuner(), EchoProvider("stub", "m")
+    assert tuner.chunk_tokens(provider) == 4000
+    _feed(tuner, provider, 3)
+    assert tuner.chunk_tokens(provider) == 5000
+    # 样本不足时保持不变
+    _feed(tuner, provider, 2)
+    assert tuner.chunk_tokens(provider) == 5000
+    assert tuner.metrics.values["chunking.stub/m.tokens"] == 5000
+    assert tuner.metrics.values["chunking.stub/m.reasons"] == ["overhead"]
+
+
+@pytest.mark.parametrize(
+    "feed, size, reason",
+    [
+        (dict(failed=True), 3000, "failure_rate"),
+        (dict(seconds=120.0), 2000, "latency"),
+        (dict(output_ratio=4.0), 1843, "output_ratio"),
+    ],
+)
+def test_backend_problems_shrink_chunks(feed, size, reason):
+    tuner, provider = _tuner(max_output_tokens=8192), EchoProvider("stub", "m")
+    _feed(tuner, provider, 3, **feed)
+    assert tuner.chunk_tokens(provider) == size
+    assert tuner.stats["stub/m"].reasons[0].startswith(reason)
+
+
+def test_sizes_are_clamped_and_kept_per_backend():
+    tuner = _tuner()
+    slow, fast = EchoProvider("slow", "m"), EchoProvider("fast", "m")
+    _feed(tuner, slow, 3, seconds=1000.0)
+    assert tuner.chunk_tokens(slow) == 1000
+    assert "limit" in tuner.stats["slow/m"].reasons
+    assert tuner.chunk_tokens(fast) == 4000
+
+
+def test_content_types_are_tuned_separately():
+    assert content_type(PROSE) == "prose" and content_type(MARKUP) == "markup"
+    tuner, provider = _tuner(by_content=True), EchoProvider("stub", "m")
+    _feed(tuner, provider, 3, failed=True, content=MARKUP)
+    assert tuner.chunk_tokens(provider, MARKUP) == 3000
+    assert tuner.chunk_tokens(provider, PROSE) == 4000
+
+
+def test_tuning_state_persists_between_runs(tmp_path):
+    state = str(tmp_path / "tuning.json")
+    tuner, provider = _tuner(state_file=state), EchoProvider("stub", "m")
+    _feed(tuner, provider, 3)
+    assert tuner.chunk_tokens(provider) == 5000
+    tuner.save()
+    assert _tuner(state_file=state).chunk_tokens(provider) == 5000
+
+
+def test_translator_records_requests(monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_INTERVAL", 0)
+    monkeypatch.setattr(settings, "STREAMING", False)
+    tuner, provider = _tuner(), EchoProvider("stub", "m")
+    translator = Translator(provider=provider, tuner=tuner)
+    asyncio.run(translator.translate(PROSE))
+    stats = tuner.stats["stub/m"]
+    assert stats.requests == 1 and stats.failure_rate == 0
+    assert stats.output_ratio == pytest.approx(1.0)
+
+
+def test_splitter_accepts_per_call_limit():
+    splitter = HTMLSplitter(count=10000)
+    html = "".join(f"<p>Paragraph number {i} with some words.</p>" for i in range(20))
+    assert len(splitter.split(html)) == 1
+    assert len(splitter.split(html, count=40)) > 1
@@ -0,0 +1,91 @@
+# tests/services/test_classifier.py
+
+import asyncio
+
+import pytest
+from ebooklib import epub
+
+from epubot.services.classifier import detect_language, skip_reason
+from epubot.services.coordinator import Coordinator
+
+SAMPLES = {
+    "en": "The quick brown fox jumps over the lazy dog and then it runs to the river with his friend.",
+    "fr": "Le renard brun saute par-dessus le chien paresseux et il court vers la rivière avec son ami dans la forêt.",
+    "de": "Der schnelle braune Fuchs springt über den faulen Hund und läuft mit seinem Freund zu dem Fluss im Wald.",
+    "es": "El rápido zorro marrón salta sobre el perro perezoso y corre con su amigo hacia el río por el bosque.",
+    "it": "La volpe marrone veloce salta sopra il cane pigro e corre con il suo amico verso il fiume della foresta.",
+    "pt": "A raposa marrom rápida pula sobre o cão preguiçoso e corre com o seu amigo para o rio da floresta.",
+    "zh": "敏捷的棕色狐狸跳过了那只懒惰的狗，然后和它的朋友一起跑向森林里的河边。这是第二句话，也是最后一句。",
+    "ja": "素早い茶色の狐は怠け者の犬を飛び越えて、友達と一緒に森の川へ走っていきました。これは二番目の文です。",
+    "ko": "빠른 갈색 여우가 게으른 개를 뛰어넘어 친구와 함께 숲 속의 강으로 달려갔습니다. 이것은 두 번째 문장입니다.",
+    "ru": "Быстрая коричневая лиса прыгает через ленивую собаку и бежит со своим другом к реке в лесу.",
+}
+
+
+@pytest.mark.parametrize("lang", SAMPLES)
+def test_detect_language(lang):
+    assert detect_language(SAMPLES[lang]) == lang
+
+
+def test_short_or_mixed_text_is_undetermined():
+    assert detect_language("Hello") is None
+    assert detect_language("Lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod") is None
+
+
+def test_skip_reasons():
+    assert skip_reason('<div><img src="a.png"/></div>{abcdefgh}', "zh") == "no_text"
+    assert skip_reason("<ol>" + "".join(f"<li>{i}</li>" for i in range(1, 300)) + "</ol>", "zh") == "no_text"
+    code = "<p>for (int i = 0; i &lt; n; i++) { sum += a[i] * b[i]; } if (x == y) { y = f(x); } return sum;</p>"
+    assert skip_reason(code, "zh") == "code"
+    assert skip_reason(f"<p>{SAMPLES['zh']}</p>", "zh") == "target_language"
+    assert skip_reason(f"<p>{SAMPLES['zh']}</p>", "zh-tw") == "target_language"
+    assert skip_reason(f"<p>{SAMPLES['zh']}</p>", "ja") is None
+    assert skip_reason(f"<p>{SAMPLES['en']}</p>", "zh") is None
+    long_images = '<div><img src="images/cover.png" alt=""/></div>{abcdefgh}\n' * 500
+    assert skip_reason(long_images, "zh") == "no_text"
+
+
+@pytest.mark.parametrize("paragraphs", [1, 40])
+def test_prose_after_code_or_epigraph_is_translated(paragraphs):
+    code = "<pre>for (int i = 0; i &lt; n; i++) { sum += a[i] * b[i]; } if (x == y) { y = f(x); }</pre>" * 30
+    epigraph = f"<blockquote>{SAMPLES['zh'] * 20}</blockquote>"
+    prose = f"<p>{SAMPLES['en']}</p>" * paragraphs
+    # 开头的代码或目标语言题记不能让后面的正文被跳过
+    assert skip_reason(code + prose, "zh") is None
+    assert skip_reason(epigraph + prose, "zh") is None
+    assert skip_reason(code * 3, "zh") == "code"
+
+
+def test_coordinator_passes_through_skipped_chunks(tmp_path, echo_translator):
+    book = epub.EpubBook()
+    book.set_identifier("epubot-skip")
+    book.set_title("Skip Book")
+    chapters = []
+    for i, body in enumerate(
+        [
+            '<div><img src="../images/a.png" alt=""/></div>',
+            f"<p>{SAMPLES['zh']}</p>",
+            f"<p>{SAMPLES['en']}</p>",
+        ],
+        start=1,
+    ):
+        chapter = epub.EpubHtml(title=f"Part {i}", file_name=f"Text/part-{i}.xhtml", lang="en")
+        chapter.content = body
+        book.add_item(chapter)
+        chapters.append(chapter)
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+    book.spine = ["nav", *chapters]
+    path = tmp_path / "skip.epub"
+    epub.write_epub(str(path), book, {})
+
+    coordinator = Coordinator(str(path), output_file=str(tmp_path / "out.epub"), enable_resume=False)
+    coordinator.translator = echo_translator
+    asyncio.run(coordinator.process())
+
+    # 除目录标题外只翻译英文章节
+    body_requests = [r for r in echo_translator.requests if "<body>" in r]
+    assert len(body_requests) == 1 and "quick brown fox" in body_requests[0]
+    assert coordinator.skipped[("Text/part-1.xhtml", "zh")] == {"no_text": 1}
+    assert coordinator.skipped[("Text/part-2.xhtml", "zh")] == {"target_language": 1}
+    assert coordinator.metrics.get("skip.items") == 2
@@ -0,0 +1,53 @@
+# tests/services/test_clients.py
+
+import asyncio
+
+from epubot.services.clients import ClientRegistry, http_metrics, registry
+from epubot.services.metrics import RunMetrics
+from epubot.services.mockserver import MockServer
+from epubot.services.providers import MistralProvider, OpenAICompatibleProvider
+
+MESSAGES = [{"role": "user", "content": "```html\n<p>Hello</p>\n```"}]
+
+
+def test_registry_shares_clients_per_loop_and_key():
+    local = ClientRegistry()
+
+    async def run():
+        first = local.http("https://api.example.com", "key-a")
+        assert local.http("https://api.example.com", "key-a") is first
+        assert local.http("https://api.example.com", "key-b") is not first
+        sdk = local.get("sdk", "https://api.example.com", "key-a", lambda http: ("sdk", http))
+        assert sdk == ("sdk", first) and local.get("sdk", "https://api.example.com", "key-a", None) is sdk
+        await local.close()
+        assert first.is_closed
+        return first
+
+    first = asyncio.run(run())
+    # 新的事件循环使用新的连接池
+    assert asyncio.run(run()) is not first
+
+
+def test_providers_reuse_pooled_connections():
+    metrics = RunMetrics()
+
+    async def run():
+        http_metrics.set(metrics)
+        async with MockServer(latency=0) as server:
+            providers = [OpenAICompatibleProvider("mock", f"{server.url}/v1", "test", "m") for _ in range(2)]
+            assert providers[0].client is providers[1].client
+            for i in range(6):
+                await providers[i % 2].complete(MESSAGES)
+            mistral = [MistralProvider(api_key="test", server_url=server.url) for _ in range(2)]
+            assert mistral[0].client is mistral[1].client
+            await mistral[0].complete(MESSAGES)
+            await mistral[1].complete(MESSAGES)
+            await registry.close()
+
+    asyncio.run(run())
+    # 每个后端只建立一次连接，之后的请求复用 keep-alive 连接
+    assert metrics.get("http.requests") == 8
+    assert metrics.get("http.new_connections") == 2
+    assert metrics.get("http.reused_connections") == 6
+    samples = metrics.samples["http.connect_seconds"]
+    assert len(samples) == 8 and sum(1 for s in samples if s > 0) == 2
@@ -0,0 +1,170 @@
+# tests/services/test_deadline.py
+
+import asyncio
+import zipfile
+from datetime import datetime
+
+import pytest
+
+from epubot.config.settings import settings
+from epubot.schemas.chunk import Chunk
+from epubot.services.coordinator import Coordinator
+from epubot.services.deadline import UNTRANSLATED_BEGIN, UNTRANSLATED_END, DeadlinePlanner, mark_untranslated, parse_deadline
+from epubot.services.providers import MistralProvider
+from epubot.services.scheduler import Scheduler
+from epubot.services.translator import Translator
+
+
+@pytest.mark.parametrize(
+    "value, seconds",
+    [("3600", 3600), ("90m", 5400), ("1h30m", 5400), ("45s", 45), ("1.5h", 5400)],
+)
+def test_parse_deadline_durations(value, seconds):
+    assert parse_deadline(value) == seconds
+
+
+def test_parse_deadline_clock_time_rolls_over_to_tomorrow():
+    now = datetime(2024, 1, 1, 17, 0)
+    assert parse_deadline("18:30", now=now) == 5400
+    assert parse_deadline("16:00", now=now) == 23 * 3600
+    with pytest.raises(ValueError):
+        parse_deadline("soon")
+
+
+def test_planner_takes_one_action_per_cooldown():
+    decisions = []
+
+    def action(name):
+        def run():
+            decisions.append(name)
+            return name
+
+        return run
+
+    planner = DeadlinePlanner(
+        100, total=1000, actions=[lambda: None, action("concurrency"), action("chunks")], reserve=0, cooldown=10
+    )
+    start = planner.started
+    planner.check(start + 5)  # 尚无进度，无法预测
+    assert decisions == []
+
+    planner.advance(100)  # 10 秒完成 10%，预计 100 秒后完成，不会超时
+    planner.check(start + 10)
+    assert decisions == []
+
+    planner.advance(50)  # 20 秒完成 15%，预计超时；不可执行的措施被跳过
+    planner.check(start + 20)
+    assert decisions == ["concurrency"]
+    planner.check(start + 25)  # 冷却期内不再调整
+    assert decisions == ["concurrency"]
+    planner.check(start + 31)
+    assert decisions == ["concurrency", "chunks"]
+    assert planner.metrics.values["deadline.decisions"] == ["concurrency", "chunks"]
+
+
+def test_planner_expires_at_deadline_minus_reserve():
+    expired = []
+    planner = DeadlinePlanner(100, total=1000, expire=lambda: expired.append(True), reserve=30)
+    planner.check(planner.started + 69)
+    assert not planner.expired
+    planner.check(planner.started + 70)
+    planner.check(planner.started + 80)
+    assert planner.expired and expired == [True]
+
+
+def test_request_interval_spaces_concurrent_requests(monkeypatch):
+    """提高并发后，同时等待的请求依次间隔 REQUEST_INTERVAL 发出，而不是一起放行"""
+    monkeypatch.setattr(settings, "REQUEST_INTERVAL", 0.05)
+    monkeypatch.setattr(Translator, "_last_request_time", 0)
+    translator = Translator()
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        async def request():
+            await translator._wait_interval()
+            return loop.time() - start
+
+        return sorted(await asyncio.gather(*(request() for _ in range(4))))
+
+    # 第 i 个请求最早在 i 个间隔之后发出（允许事件循环的时钟误差）
+    times = asyncio.run(run())
+    assert all(elapsed >= i * 0.05 - 0.005 for i, elapsed in enumerate(times))
+
+
+def test_scheduler_expire_marks_queued_and_inflight_chunks():
+    """expire 后正在执行的请求被取消，剩余分块以标记过的原文返回"""
+
+    async def translate(content):
+        await asyncio.sleep(5)
+        return content
+
+    scheduler = Scheduler(translate, concurrency=1)
+
+    async def run():
+        async with scheduler:
+            chunks = [Chunk(id=str(i), file_id="", content=f"<p>{i} {{AAAAAAA{i}}}</p>") for i in range(3)]
+            tasks = [asyncio.ensure_future(scheduler.submit(chunk)) for chunk in chunks]
+            await asyncio.sleep(0.01)
+            scheduler.expire(mark_untranslated)
+            return await asyncio.wait_for(asyncio.gather(*tasks), timeout=1)
+
+    results = asyncio.run(run())
+    assert results == [mark_untranslated(f"<p>{i} {{AAAAAAA{i}}}</p>") for i in range(3)]
+    assert scheduler.metrics.get("scheduler.expired") == 3
+
+
+def test_fast_tier_switch_compares_backend_and_model(sample_epub, monkeypatch):
+    monkeypatch.setattr(settings, "DEADLINE_FAST_TIER", "mistral:fast-model")
+    coordinator = Coordinator(str(sample_epub), enable_resume=False)
+    coordinator.translator.use_provider(MistralProvider(api_key="test", model="fast-model"))
+    assert coordinator._switch_to_fast_tier() is None
+
+    coordinator.translator.use_provider(MistralProvider(api_key="test", model="large-model"))
+    assert coordinator._switch_to_fast_tier() == "provider -> mistral/fast-model"
+    assert [(tier.name, tier.model) for tier in coordinator.translator.tiers] == [("mistral", "fast-model")]
+
+
+class StallingTranslator:
+    """第二章的请求一直不返回"""
+
+    async def translate(self, content, **kwargs):
+        if "Second" in content:
+            await asyncio.sleep(60)
+        return content.replace("<p>", "<p>[zh]")
+
+
+def test_coordinator_writes_output_with_untranslated_sections_at_deadline(sample_epub, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DEADLINE_BUILD_RESERVE", 0)
+    monkeypatch.setattr(settings, "DEADLINE_CHECK_INTERVAL", 0.02)
+    monkeypatch.setattr(settings, "MAX_CONCURRENT_REQUESTS", 4)
+    monkeypatch.setattr(settings, "DEADLINE_MAX_CONCURRENCY", 4)
+    monkeypatch.setattr(settings, "DEADLINE_FAST_TIER", None)
+    output = tmp_path / "out.epub"
+    coordinator = Coordinator(str(sample_epub), output_file=str(output), enable_resume=False, deadline=0.5)
+    coordinator.translator = StallingTranslator()
+
+    asyncio.run(asyncio.wait_for(coordinator.process(), timeout=5))
+    with zipfile.ZipFile(output) as z:
+        first = z.read("EPUB/Text/chapter-1.xhtml").decode("utf-8")
+        second = z.read("EPUB/Text/chapter-3.xhtml").decode("utf-8")
+    assert "[zh]Hello world." in first
+    assert UNTRANSLATED_BEGIN in second and "Second paragraph." in second
+    # 读者可见的提示
+    assert f'<p class="epubot-untranslated">{settings.DEADLINE_UNTRANSLATED_NOTICE}</p>' in second
+    assert second.startswith("<?xml")
+    assert coordinator.metrics.values["deadline.met"] is False
+
+
+def test_mark_untranslated_keeps_xml_declaration_first():
+    marked = mark_untranslated("<?xml version='1.0'?>\n<html><body class='x'><p>Text</p></body></html>", notice="未翻译")
+    assert marked.startswith("<?xml version='1.0'?>" + UNTRANSLATED_BEGIN)
+    assert "<body class='x'><p class=\"epubot-untranslated\">未翻译</p><p>Text</p>" in marked
+    assert marked.endswith(UNTRANSLATED_END)
+
+
+def test_mark_untranslated_adds_visible_notice_to_fragments():
+    marked = mark_untranslated("<p>Text {AAAAAAAA}</p>", notice="未翻译 <原文>")
+    assert marked == f'{UNTRANSLATED_BEGIN}<p class="epubot-untranslated">未翻译 &lt;原文&gt;</p><p>Text {{AAAAAAAA}}</p>{UNTRANSLATED_END}'
+    assert mark_untranslated("<p>Text</p>", notice="") == f"{UNTRANSLATED_BEGIN}<p>Text</p>{UNTRANSLATED_END}"
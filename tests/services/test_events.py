@@ -0,0 +1,77 @@
+# tests/services/test_events.py
+
+import asyncio
+
+from epubot.config.settings import settings
+from epubot.services.coordinator import Coordinator
+from epubot.services.events import BookBuilt, ChunkTranslated, ItemRestored, ItemStarted
+
+
+def _coordinator(sample_epub, tmp_path, translator):
+    coordinator = Coordinator(str(sample_epub), output_file=str(tmp_path / "out.epub"), enable_resume=False)
+    coordinator.translator = translator
+    return coordinator
+
+
+def test_translate_stream_yields_events_in_order(sample_epub, tmp_path, echo_translator, capsys):
+    coordinator = _coordinator(sample_epub, tmp_path, echo_translator)
+
+    async def run():
+        return [event async for event in coordinator.translate_stream()]
+
+    events = asyncio.run(run())
+    started = [e for e in events if isinstance(e, ItemStarted)]
+    restored = [e for e in events if isinstance(e, ItemRestored)]
+    assert len(started) == len(restored) == 3
+    assert isinstance(events[-1], BookBuilt) and events[-1].output_file == str(tmp_path / "out.epub")
+    assert (tmp_path / "out.epub").exists()
+    for item in started:
+        chunks = [e for e in events if isinstance(e, ChunkTranslated) and e.item_id == item.item_id]
+        done = next(e for e in restored if e.item_id == item.item_id)
+        assert len(chunks) == item.chunks and all(c.input_tokens > 0 and c.output_tokens > 0 for c in chunks)
+        assert events.index(item) < events.index(chunks[0]) < events.index(done)
+    assert any("[zh]Hello" in e.content for e in restored)
+    assert "翻译完成" not in capsys.readouterr().out
+
+
+def test_pause_resume_and_backpressure(sample_epub, tmp_path, echo_translator, monkeypatch):
+    monkeypatch.setattr(settings, "ITEM_CONCURRENCY", 1)
+    coordinator = _coordinator(sample_epub, tmp_path, echo_translator)
+    job = coordinator.translate_stream(maxsize=1)
+
+    async def run():
+        events = []
+        async for event in job:
+            events.append(event)
+            if len(events) == 1:
+                # 暂停后不再派发新的请求
+                job.pause()
+                requests = len(echo_translator.requests)
+                await asyncio.sleep(0.2)
+                paused_requests = len(echo_translator.requests)
+                job.resume()
+                # 不消费事件时队列满，翻译等待
+                await asyncio.sleep(0.2)
+                assert job.queue.full() and not job.task.done()
+                assert paused_requests == requests
+        return events
+
+    events = asyncio.run(run())
+    assert isinstance(events[-1], BookBuilt)
+
+
+def test_cancel_stops_the_job(sample_epub, tmp_path, echo_translator):
+    coordinator = _coordinator(sample_epub, tmp_path, echo_translator)
+    job = coordinator.translate_stream(maxsize=1)
+
+    async def run():
+        events = []
+        async for event in job:
+            events.append(event)
+            job.cancel()
+        return events
+
+    events = asyncio.run(run())
+    assert not any(isinstance(e, BookBuilt) for e in events)
+    assert job.task.cancelled()
+    assert not (tmp_path / "out.epub").exists()
@@ -0,0 +1,73 @@
+# tests/services/test_glossary.py
+
+import json
+
+from epubot.services.glossary import Automaton, Glossary, Term, cache_path, compile_glossary, parse_glossary
+from epubot.services.translator import Translator
+
+
+def test_automaton_finds_overlapping_patterns():
+    automaton = Automaton(["he", "she", "his", "hers"])
+    matches = sorted(automaton.search("ushers"))
+    assert matches == [(1, 4, 1), (2, 4, 0), (2, 6, 3)]
+
+
+def test_find_terms_in_text_only():
+    glossary = Glossary([Term("Commons", "公地"), Term("enclosure", "圈地"), Term("API", "接口")])
+    html = '<p class="commons">The commons and <b>Enclosure</b>, not enclosures.</p>'
+    assert [term.target for term in glossary.find(html)] == ["公地", "圈地"]
+    assert len(glossary.find(html, limit=1)) == 1
+
+
+def test_enforce_replaces_variants_outside_tags():
+    glossary = Glossary([Term("commons", "公地", variants=("共有地", "共有地资源"))])
+    html = '<p title="共有地">共有地资源和共有地，您好</p>'
+    assert glossary.enforce(html) == '<p title="共有地">公地和公地，你好</p>'
+
+
+def test_prompt_contains_only_terms_in_chunk():
+    glossary = Glossary([Term(f"term{i}", f"术语{i}") for i in range(10000)] + [Term("commons", "公地")])
+    translator = Translator(glossary=glossary)
+    prompt = translator._messages("<p>The commons</p>", "English", "Chinese", glossary.find("<p>The commons</p>"))[1]
+    assert "commons => 公地" in prompt["content"]
+    assert "term1 " not in prompt["content"]
+    assert translator._replace_designation("```html\n<p>大型语言模型</p>\n```") == "<p> LLM </p>"
+
+
+def test_compiled_glossary_is_cached(tmp_path):
+    source = tmp_path / "terms.tsv"
+    source.write_text("# comment\ncommons\t公地\t共有地|公共地\nenclosure\t圈地\n", encoding="utf-8")
+    assert parse_glossary(str(source))[0] == Term("commons", "公地", ("共有地", "公共地"))
+
+    cache_dir = str(tmp_path / "cache")
+    first = compile_glossary(str(source), cache_dir)
+    assert cache_path(str(source), cache_dir).exists()
+    second = compile_glossary(str(source), cache_dir)
+    assert second.get("zh").enforce("<p>公共地</p>") == first.get("zh").enforce("<p>公共地</p>") == "<p>公地</p>"
+
+    # 内容变化后重新编译
+    source.write_text(json.dumps({"commons": "共享资源"}), encoding="utf-8")
+    renamed = tmp_path / "terms.json"
+    source.rename(renamed)
+    assert [t.target for t in compile_glossary(str(renamed), cache_dir).get("zh").find("<p>commons</p>")] == ["共享资源"]
+
+
+def test_terms_are_kept_per_target_language(tmp_path):
+    source = tmp_path / "terms.csv"
+    source.write_text("source,zh,ja,fr\ncommons,公地|共有地,入会地,biens communs|communs\nenclosure,圈地,,\n", encoding="utf-8")
+    assert parse_glossary(str(source))[2] == Term("commons", "biens communs", ("communs",), "fr")
+    (tmp_path / "terms.json").write_text(json.dumps({"commons": {"zh": "公地", "ja": "入会地"}}), encoding="utf-8")
+    assert [t.lang for t in parse_glossary(str(tmp_path / "terms.json"))] == ["zh", "ja"]
+
+    glossaries = compile_glossary(str(source), str(tmp_path / "cache"))
+    translator = Translator(glossary=glossaries)
+    html = "<p>The commons and the enclosure.</p>"
+    for lang, expected in [("Chinese", "commons => 公地"), ("Japanese", "commons => 入会地"), ("fr", "biens communs")]:
+        prompt = translator.build_messages(html, "English", lang)[1]["content"]
+        assert expected in prompt and ("enclosure => 圈地" in prompt) == (lang == "Chinese")
+
+    # 中文的其他译法和固定替换项不作用于其他语言的译文
+    assert translator._replace_designation("<p>共有地，您好</p>", "Chinese") == "<p>公地，你好</p>"
+    assert translator._replace_designation("<p>共有地，您好</p>", "Japanese") == "<p>共有地，您好</p>"
+    assert translator._replace_designation("<p>Les communs</p>", "French") == "<p>Les biens communs</p>"
+    assert glossaries.get("de").enforce("<p>您</p>") == "<p>您</p>"
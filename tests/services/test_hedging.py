@@ -0,0 +1,146 @@
+# tests/services/test_hedging.py
+
+import asyncio
+
+import pytest
+
+from epubot.config.settings import settings
+from epubot.services.hedging import Hedger
+from epubot.services.translator import Translator
+from tests.services.conftest import EchoProvider, FakeProvider
+
+
+def _warm(hedger, latency=0.01, count=20):
+    for _ in range(count):
+        hedger.record(latency)
+
+
+def test_no_hedge_without_enough_samples():
+    hedger = Hedger(min_samples=5, min_delay=0.01, budget=1.0)
+    assert hedger.delay() is None
+    _warm(hedger, count=5)
+    assert hedger.delay() == 0.01
+    assert Hedger(budget=0).delay() is None
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    """主请求超过阈值后发送副本，副本先返回时主请求被取消"""
+    hedger = Hedger(min_samples=5, min_delay=0.01, budget=1.0)
+    _warm(hedger)
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "slow"
+
+    async def fast():
+        await asyncio.sleep(0.01)
+        return "fast"
+
+    async def run():
+        result = await hedger.run(slow, fast, tokens=100)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == "fast"
+    assert cancelled == [True]
+    assert hedger.metrics.get("hedge.sent") == 1
+    assert hedger.metrics.get("hedge.hedge_wins") == 1
+    assert hedger.metrics.get("hedge.extra_tokens") == 100
+    assert hedger.metrics.summary("request.latency_seconds")["max"] < 1
+
+
+def test_failed_primary_does_not_win():
+    """先返回但失败（如未通过校验）的一方不会胜出"""
+    hedger = Hedger(min_samples=1, min_delay=0.01, budget=1.0)
+    _warm(hedger, count=1)
+
+    async def invalid():
+        await asyncio.sleep(0.02)
+        raise ValueError("invalid")
+
+    async def valid():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    assert asyncio.run(hedger.run(invalid, valid)) == "ok"
+
+
+def test_hedging_budget_bounds_extra_requests():
+    hedger = Hedger(budget=0.25)
+    hedger.delay = lambda: 0.001
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "x"
+
+    async def run():
+        for _ in range(8):
+            await hedger.run(slow, slow)
+
+    asyncio.run(run())
+    assert hedger.hedged == 2
+    assert hedger.metrics.get("hedge.budget_exhausted") == 6
+
+
+class SlowOnceProvider(EchoProvider):
+    """第一个请求卡住，之后的请求正常返回"""
+
+    async def reply(self, text):
+        if self.name == "primary" and len(self.requests) == 1:
+            await asyncio.sleep(5)
+        return text.replace("<p>", f"<p>[{self.name}]")
+
+
+@pytest.fixture
+def hedging(monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_INTERVAL", 0)
+    monkeypatch.setattr(settings, "STREAMING", False)
+    monkeypatch.setattr(settings, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "HEDGE_MIN_SAMPLES", 1)
+    monkeypatch.setattr(settings, "HEDGE_MIN_DELAY", 0.05)
+    monkeypatch.setattr(settings, "HEDGE_BUDGET", 1.0)
+
+
+def test_translator_hedges_to_alternate_provider(hedging):
+    translator = Translator(provider=SlowOnceProvider("primary"), hedge_provider=SlowOnceProvider("backup"))
+    translator.hedger.record(0.01)
+
+    result = asyncio.run(asyncio.wait_for(translator.translate("<p>Hello</p>"), timeout=2))
+    assert result == "<p>[backup]Hello</p>"
+    assert translator.metrics.get("hedge.hedge_wins") == 1
+
+
+class HangingProvider(FakeProvider):
+    name = "hanging"
+    model = "hanging-model"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def complete(self, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(60)
+
+
+def test_cancelled_request_is_not_retried(monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_INTERVAL", 0)
+    monkeypatch.setattr(settings, "STREAMING", False)
+    monkeypatch.setattr(settings, "HEDGE_ENABLED", False)
+    provider = HangingProvider()
+    translator = Translator(provider=provider, tiers=[provider])
+
+    async def run():
+        task = asyncio.create_task(translator._request("<p>Hello</p>", "English", "Chinese"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        # 取消立即生效，不进入重试退避
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(task, timeout=1)
+
+    asyncio.run(run())
+    assert provider.calls == 1
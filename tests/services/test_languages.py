@@ -0,0 +1,76 @@
+# tests/services/test_languages.py
+
+import asyncio
+import re
+import zipfile
+
+import pytest
+
+from epubot.services.coordinator import Coordinator
+from epubot.services.languages import language_name, output_path, parse_languages
+from epubot.services.resume import Resume
+
+
+def test_parse_languages():
+    assert parse_languages("zh, ja,fr,zh") == ["zh", "ja", "fr"]
+    assert parse_languages(["ZH"]) == ["zh"]
+    with pytest.raises(ValueError):
+        parse_languages(" , ")
+
+
+def test_output_path():
+    assert output_path("out/book-{lang}.epub", "ja", multiple=False) == "out/book-ja.epub"
+    assert output_path("out/book.epub", "ja", multiple=False) == "out/book.epub"
+    assert output_path("out/book.epub", "ja", multiple=True) == "out/book-ja.epub"
+    assert language_name("ja") == "Japanese" and language_name("Klingon") == "Klingon"
+
+
+class TaggingTranslator:
+    """按目标语言给段落加标记，并记录每个请求的语言"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def translate(self, content, target_lang="Chinese", **kwargs):
+        self.requests.append((target_lang, content))
+        return re.sub(r"<(p|li[^>]*)>", lambda m: f"<{m.group(1)}>[{target_lang}]", content)
+
+
+def _chapter(path, name="EPUB/Text/chapter-1.xhtml"):
+    with zipfile.ZipFile(path) as archive:
+        return archive.read(name).decode("utf-8")
+
+
+def test_coordinator_fans_out_to_every_language(sample_epub, tmp_path, monkeypatch):
+    output = tmp_path / "out-{lang}.epub"
+    coordinator = Coordinator(str(sample_epub), target_lang="zh,ja", output_file=str(output), enable_resume=False)
+    coordinator.translator = translator = TaggingTranslator()
+    splits = []
+    split = coordinator.html_splitter.split
+    monkeypatch.setattr(coordinator.html_splitter, "split", lambda *args: splits.append(1) or split(*args))
+    asyncio.run(coordinator.process())
+
+    # 每个文档只替换和分块一次，分块按语言各翻译一次
+    assert len(splits) == 3
+    languages = [lang for lang, _ in translator.requests]
+    assert languages.count("Chinese") == languages.count("Japanese") == len(translator.requests) // 2
+    assert "[Chinese]Hello" in _chapter(tmp_path / "out-zh.epub")
+    assert "[Japanese]Hello" in _chapter(tmp_path / "out-ja.epub")
+    assert "Chinese" not in _chapter(tmp_path / "out-ja.epub")
+    # 目录按语言分别本地化
+    assert "[Japanese]Chapter One" in _chapter(tmp_path / "out-ja.epub", "EPUB/toc.ncx")
+    assert "[Chinese]Chapter One" in _chapter(tmp_path / "out-zh.epub", "EPUB/toc.ncx")
+
+
+def test_resume_is_tracked_per_language(sample_epub, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    Resume().mark_file_processed(str(sample_epub), "Text/chapter-1.xhtml")
+    coordinator = Coordinator(str(sample_epub), target_lang="zh,ja", output_file=str(tmp_path / "out.epub"))
+    coordinator.translator = translator = TaggingTranslator()
+    asyncio.run(coordinator.process())
+
+    hello = [lang for lang, content in translator.requests if "Hello world." in content]
+    assert hello == ["Japanese"]
+    state = Resume().state
+    assert "Text/chapter-1.xhtml" in state[f"{sample_epub}#ja"]["processed_files"]
+    assert (tmp_path / "out-zh.epub").exists() and (tmp_path / "out-ja.epub").exists()
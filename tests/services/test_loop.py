@@ -0,0 +1,64 @@
+# tests/services/test_loop.py
+
+import asyncio
+import contextvars
+import threading
+import time
+
+from epubot.services.loop import LoopLagMonitor, run_blocking_io
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def _busy(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_run_blocking_io_runs_in_worker_thread():
+    """阻塞函数应在工作线程中执行，并继承当前的 contextvars"""
+
+    def work(value):
+        return value * 2, threading.get_ident(), request_id.get()
+
+    async def run():
+        request_id.set("abc")
+        return await run_blocking_io(work, 21)
+
+    result, thread_id, context_value = asyncio.run(run())
+    assert result == 42
+    assert thread_id != threading.get_ident()
+    assert context_value == "abc"
+
+
+def test_run_blocking_io_keeps_loop_responsive():
+    """阻塞操作在线程池中执行时，事件循环延迟应保持很低"""
+    monitor = LoopLagMonitor(interval=0.01)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.02)
+        await run_blocking_io(time.sleep, 0.1)
+        monitor.stop()
+
+    asyncio.run(run())
+    assert monitor.summary()["max"] < 0.05
+
+
+def test_loop_lag_monitor_warns_when_blocked():
+    """事件循环被阻塞超过阈值时应计数"""
+    monitor = LoopLagMonitor(interval=0.01, warn_threshold=0.02, max_samples=5)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.02)
+        _busy(0.05)
+        await asyncio.sleep(0.1)
+        monitor.stop()
+
+    asyncio.run(run())
+    summary = monitor.summary()
+    assert summary["blocked"] >= 1
+    assert summary["max"] >= 0.03
+    assert len(monitor.samples) <= 5
@@ -0,0 +1,141 @@
+# tests/services/test_mockserver.py
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+
+from epubot.config.settings import settings
+from epubot.services.cassette import Cassette, Interaction, RecordingProvider, request_key
+from epubot.services.mockserver import Faults, MockServer, RateLimiter
+from epubot.services.providers import MistralProvider, OpenAICompatibleProvider, Provider, get_provider
+from epubot.services.translator import Translator
+
+SOURCE = "<p>Hello <b>world</b>.</p>"
+
+
+def _messages(text=SOURCE):
+    return Translator()._messages(text, "English", "Chinese")
+
+
+class FixedProvider(Provider):
+    name = "fixed"
+    model = "m1"
+
+    async def complete(self, messages, **kwargs):
+        return "<p>你好</p>", "stop"
+
+    @asynccontextmanager
+    async def stream(self, messages, **kwargs):
+        async def deltas():
+            yield "<p>你", None
+            yield "好</p>", "stop"
+
+        yield deltas()
+
+
+def test_recording_provider_appends_interactions(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    provider = RecordingProvider(FixedProvider(), Cassette(path))
+
+    async def run():
+        await provider.complete(_messages())
+        async with provider.stream(_messages()) as deltas:
+            return [delta async for delta, _ in deltas]
+
+    assert asyncio.run(run()) == ["<p>你", "好</p>"]
+    recorded = Cassette(path).interactions
+    assert [(i.stream, i.response, i.finish_reason) for i in recorded] == [
+        (False, "<p>你好</p>", "stop"),
+        (True, "<p>你好</p>", "stop"),
+    ]
+    assert recorded[1].ttft is not None and recorded[0].key == request_key(_messages())
+
+
+def test_get_provider_reads_cassette_setting_at_call_time(tmp_path, monkeypatch):
+    """先获取过的后端不影响之后开启录制：录制文件是共享实例缓存键的一部分"""
+    path = str(tmp_path / "cassette.jsonl")
+    plain = get_provider("mistral", "cassette-test-model")
+    assert isinstance(plain, MistralProvider)
+
+    monkeypatch.setattr(settings, "CASSETTE_RECORD", path)
+    recording = get_provider("mistral", "cassette-test-model")
+    assert isinstance(recording, RecordingProvider) and recording.cassette.path == path
+    assert recording.provider.model == "cassette-test-model"
+    assert get_provider("mistral", "cassette-test-model") is recording
+    assert get_provider("mistral", "cassette-test-model", cassette=str(tmp_path / "other.jsonl")) is not recording
+
+
+def test_rate_limiter_window():
+    limiter = RateLimiter(rpm=2, tpm=100, window=60)
+    assert limiter.acquire(10, now=0) == 0
+    assert limiter.acquire(10, now=1) == 0
+    assert limiter.acquire(10, now=2) == 58  # 第三个请求超过 RPM
+    assert limiter.acquire(10, now=61) == 0
+    assert limiter.acquire(95, now=62) == 59  # 超过 TPM，等到 t=61 的请求移出窗口
+
+
+def test_mock_server_speaks_mistral_api():
+    async def run():
+        async with MockServer(latency=0.01) as server:
+            provider = MistralProvider(api_key="test", server_url=server.url)
+            completed = await provider.complete(_messages())
+            async with provider.stream(_messages("<p>" + "long text " * 40 + "</p>")) as deltas:
+                streamed = [delta async for delta in deltas]
+            return completed, streamed, server.stats
+
+    completed, streamed, stats = asyncio.run(run())
+    assert completed == (SOURCE, "stop")
+    assert len(streamed) > 1 and streamed[-1][1] == "stop"
+    assert "".join(delta for delta, _ in streamed) == "<p>" + "long text " * 40 + "</p>"
+    assert stats["responses"] == 2
+
+
+def test_mock_server_replays_recorded_responses(tmp_path):
+    cassette = Cassette(str(tmp_path / "cassette.jsonl"))
+    interaction = Interaction(
+        provider="mistral", model="m", key=request_key(_messages()), prompt="", response="<p>你好<b>世界</b>。</p>"
+    )
+    cassette.append(interaction)
+
+    async def run():
+        async with MockServer(cassette=cassette, latency=0.01) as server:
+            provider = OpenAICompatibleProvider("mock", f"{server.url}/v1", "test", "m")
+            return await provider.complete(_messages()), await provider.complete(_messages("<p>Other</p>"))
+
+    assert asyncio.run(run()) == (("<p>你好<b>世界</b>。</p>", "stop"), ("<p>Other</p>", "stop"))
+
+
+def test_mock_server_rate_limits_and_injects_faults():
+    async def run():
+        results = []
+        async with MockServer(latency=0, rpm=1) as server:
+            provider = OpenAICompatibleProvider("mock", f"{server.url}/v1", "test", "m")
+            await provider.complete(_messages())
+            with pytest.raises(httpx.HTTPStatusError) as error:
+                await provider.complete(_messages())
+            results.append((error.value.response.status_code, error.value.response.headers["retry-after"]))
+        async with MockServer(latency=0, faults=Faults(error_rate=1.0)) as server:
+            provider = OpenAICompatibleProvider("mock", f"{server.url}/v1", "test", "m")
+            with pytest.raises(httpx.HTTPStatusError) as error:
+                await provider.complete(_messages())
+            results.append(error.value.response.status_code)
+        async with MockServer(latency=0, faults=Faults(truncate_rate=1.0)) as server:
+            provider = OpenAICompatibleProvider("mock", f"{server.url}/v1", "test", "m")
+            results.append((await provider.complete(_messages()))[1])
+        return results
+
+    assert asyncio.run(run()) == [(429, "60"), 500, "length"]
+
+
+def test_translator_end_to_end_against_mock_server(monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_INTERVAL", 0)
+
+    async def run():
+        async with MockServer(latency=0.01) as server:
+            provider = MistralProvider(api_key="test", server_url=server.url)
+            translator = Translator(provider=provider, tiers=[provider])
+            return await translator.translate(SOURCE)
+
+    assert asyncio.run(run()) == SOURCE
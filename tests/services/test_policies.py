@@ -0,0 +1,79 @@
+# tests/services/test_policies.py
+
+import asyncio
+
+import pytest
+
+from epubot.schemas.chunk import Chunk
+from epubot.services.policies import LatencyModel, get_policy, simulate
+from epubot.services.scheduler import Job, Scheduler
+
+UNIT = LatencyModel(overhead=0, seconds_per_token=1)
+
+
+def _jobs(tokens, documents=None, books=None):
+    documents = documents or [0] * len(tokens)
+    books = books or [""] * len(tokens)
+    return [
+        Job(key=str(i), content="", placeholders=[], tokens=t, seq=i, document=d, book=b)
+        for i, (t, d, b) in enumerate(zip(tokens, documents, books))
+    ]
+
+
+def test_longest_first_shortens_makespan():
+    tokens = [1, 1, 1, 1, 1, 1, 10]
+    fifo = simulate(_jobs(tokens), get_policy("fifo", UNIT), workers=2)
+    lpt = simulate(_jobs(tokens), get_policy("lpt", UNIT), workers=2)
+    assert fifo["makespan"] == 13
+    assert lpt["makespan"] == 10
+
+
+def test_chapter_order_finishes_first_document_early():
+    def run(policy):
+        return simulate(_jobs([5, 5, 1, 1], documents=[3, 2, 0, 0]), get_policy(policy, UNIT), workers=1)
+
+    assert run("chapter")["first_document"] == 2
+    assert run("fifo")["first_document"] == 12
+
+
+def test_simulation_respects_request_interval():
+    assert simulate(_jobs([1, 1, 1]), get_policy("fifo", UNIT), workers=3, interval=2)["makespan"] == 5
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        get_policy("random")
+
+
+def _dispatch_order(policy, submissions):
+    """并发为 1 时记录派发顺序，submissions 为 (内容, tokens, submit 参数)"""
+    order = []
+
+    async def translate(content):
+        order.append(content)
+        return content
+
+    scheduler = Scheduler(translate, concurrency=1, policy=get_policy(policy))
+
+    async def run():
+        async with scheduler:
+            await asyncio.gather(
+                *(
+                    scheduler.submit(Chunk(id="1", file_id="", content=content, tokens=tokens), **kwargs)
+                    for content, tokens, kwargs in submissions
+                )
+            )
+
+    asyncio.run(run())
+    return order
+
+
+def test_scheduler_dispatches_longest_first_after_priority():
+    submissions = [("small", 10, {}), ("large", 5000, {}), ("medium", 500, {}), ("titles", 50, {"priority": -1})]
+    assert _dispatch_order("lpt", submissions) == ["titles", "large", "medium", "small"]
+    assert _dispatch_order("fifo", submissions) == ["titles", "small", "large", "medium"]
+
+
+def test_fair_share_interleaves_books():
+    submissions = [(f"a{i}", 100, {"book": "a"}) for i in range(3)] + [(f"b{i}", 100, {"book": "b"}) for i in range(3)]
+    assert _dispatch_order("fair", submissions) == ["a0", "b0", "a1", "b1", "a2", "b2"]
@@ -0,0 +1,102 @@
+# tests/services/test_profiler.py
+
+import asyncio
+import json
+import pstats
+import time
+
+from epubot.services.coordinator import Coordinator
+from epubot.services.loop import LoopLagMonitor
+from epubot.services.profiler import Profiler
+
+
+def _busy(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_disabled_profiler_is_noop(tmp_path):
+    """未启用时不应写出任何文件"""
+    profiler = Profiler(str(tmp_path / "profile"), enabled=False)
+
+    async def run():
+        profiler.start()
+        with profiler.stage("parse", memory=True):
+            _busy(0.01)
+        return profiler.stop()
+
+    assert asyncio.run(run()) is None
+    assert not (tmp_path / "profile").exists()
+
+
+def test_profiler_writes_stage_outputs(tmp_path):
+    """启用时每个阶段都应输出 pstats 与 collapsed 文件，并记录内存峰值和事件循环延迟"""
+    profiler = Profiler(str(tmp_path / "profile"), sample_interval=0.001, lag_interval=0.01)
+
+    async def run():
+        profiler.start()
+        with profiler.stage("parse", memory=True):
+            data = [bytes(1024) for _ in range(1000)]
+            _busy(0.05)
+        with profiler.stage("translate"):
+            await asyncio.sleep(0.03)
+            _busy(0.05)  # 阻塞事件循环
+            await asyncio.sleep(0.03)
+        del data
+        return profiler.stop()
+
+    output = asyncio.run(run())
+
+    for stage in ("parse", "translate"):
+        assert (output / f"{stage}.pstats").exists()
+        pstats.Stats(str(output / f"{stage}.pstats"))
+        collapsed = (output / f"{stage}.collapsed").read_text(encoding="utf-8")
+        assert collapsed.startswith(f"{stage};")
+        assert collapsed.splitlines()[0].rsplit(" ", 1)[1].isdigit()
+
+    summary = json.loads((output / "summary.json").read_text(encoding="utf-8"))
+    assert summary["stages"]["parse"]["memory_peak"] >= 1024 * 1000
+    assert "memory_peak" not in summary["stages"]["translate"]
+    assert summary["loop_lag"]["max"] >= 0.03
+
+
+def test_wrapped_stage_in_worker_thread(tmp_path):
+    """在线程池中执行的阶段也应被 cProfile 和栈采样捕获"""
+    profiler = Profiler(str(tmp_path / "profile"), sample_interval=0.001)
+
+    async def run():
+        profiler.start()
+        await asyncio.to_thread(profiler.wrap("build", _busy, memory=True), 0.05)
+        return profiler.stop()
+
+    output = asyncio.run(run())
+    stats = pstats.Stats(str(output / "build.pstats"))
+    assert any(func[2] == "_busy" for func in stats.stats)
+    assert "_busy" in (output / "build.collapsed").read_text(encoding="utf-8")
+
+
+def test_profiler_shares_the_coordinator_lag_monitor(tmp_path, sample_epub):
+    """性能分析和 Coordinator 共用一个事件循环延迟监控，同一个事件循环只有一个采样任务"""
+    coordinator = Coordinator(str(sample_epub), enable_resume=False, profiler=Profiler(str(tmp_path / "profile")))
+    assert coordinator.profiler.lag_monitor is coordinator.loop_monitor
+
+    monitor = LoopLagMonitor(interval=0.01)
+    profiler = Profiler(str(tmp_path / "shared"), sample_interval=0.001)
+    profiler.use_lag_monitor(monitor)
+
+    async def run():
+        monitor.start()
+        profiler.start()
+        tasks = [task for task in asyncio.all_tasks() if "LoopLagMonitor._run" in repr(task.get_coro())]
+        await asyncio.sleep(0.02)
+        _busy(0.05)
+        await asyncio.sleep(0.02)
+        output = profiler.stop()
+        monitor.stop()
+        return tasks, output
+
+    tasks, output = asyncio.run(run())
+    assert len(tasks) == 1
+    summary = json.loads((output / "summary.json").read_text(encoding="utf-8"))
+    assert summary["loop_lag"]["max"] >= 0.03 and summary["loop_lag"] == monitor.summary()
@@ -0,0 +1,94 @@
+# tests/services/test_progressive.py
+
+import asyncio
+import io
+import zipfile
+
+from epubot.config.settings import settings
+from epubot.services.coordinator import Coordinator
+from epubot.services.epub import EpubParser, ProgressiveOutput
+from epubot.services.epub.progressive import ZipSnapshot, pending_notice
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def _read(path):
+    with zipfile.ZipFile(path) as archive:
+        assert archive.testzip() is None
+        return {name: archive.read(name).decode("utf-8", "replace") for name in archive.namelist()}
+
+
+def test_snapshot_copies_unchanged_members(tmp_path):
+    snapshot = ZipSnapshot.from_bytes(_zip({"a.xhtml": "<p>a</p>" * 100, "b.xhtml": "<p>b</p>"}))
+    unchanged = snapshot.members["a.xhtml"].data
+    snapshot.put("b.xhtml", "<p>乙</p>".encode("utf-8"))
+    output = tmp_path / "out.epub"
+    snapshot.write(str(output))
+
+    assert snapshot.members["a.xhtml"].data is unchanged
+    assert _read(output) == {"mimetype": "application/epub+zip", "a.xhtml": "<p>a</p>" * 100, "b.xhtml": "<p>乙</p>"}
+    with zipfile.ZipFile(output) as archive:
+        first = archive.infolist()[0]
+        assert first.filename == "mimetype" and first.compress_type == zipfile.ZIP_STORED
+    assert not (tmp_path / "out.epub.tmp").exists()
+
+
+def test_pending_notice_replaces_body():
+    content = "<html><head><title>t</title></head><body class='x'><p>Hello</p></body></html>"
+    assert pending_notice(content, "稍后") == (
+        "<html><head><title>t</title></head><body class='x'><p class=\"epubot-pending\">稍后</p></body></html>"
+    )
+
+
+def test_progressive_output_updates_finished_documents(sample_epub, tmp_path):
+    book = EpubParser(str(sample_epub)).parse()
+    output = tmp_path / "partial.epub"
+    progressive = ProgressiveOutput(book, str(output), pending="notice", notice="翻译中")
+    progressive.start()
+    assert all("翻译中" in _read(output)[f"EPUB/Text/chapter-{i}.xhtml"] for i in (1, 2, 3))
+
+    chapter = next(item for item in book.items if item.file_name == "Text/chapter-1.xhtml")
+    chapter.translated = chapter.content.replace("Hello world.", "你好，世界。")
+    progressive.mark(chapter)
+    assert progressive.flush(progressive.take()) == 1
+
+    contents = _read(output)
+    assert "你好，世界。" in contents["EPUB/Text/chapter-1.xhtml"]
+    assert "翻译中" in contents["EPUB/Text/chapter-2.xhtml"]
+    assert progressive.writes == 2
+
+
+class SlowSecondChapter:
+    """第二章翻译期间检查输出文件中是否已有第一章的译文"""
+
+    def __init__(self, output):
+        self.output = output
+        self.seen_partial = False
+
+    async def translate(self, content, **kwargs):
+        if "Second" in content:
+            for _ in range(50):
+                await asyncio.sleep(0.02)
+                if self.output.exists() and "[zh]Hello" in _read(self.output)["EPUB/Text/chapter-1.xhtml"]:
+                    self.seen_partial = True
+                    break
+        return content.replace("<p>", "<p>[zh]")
+
+
+def test_coordinator_writes_partial_output_while_translating(sample_epub, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_CONCURRENT_REQUESTS", 4)
+    output = tmp_path / "out.epub"
+    coordinator = Coordinator(str(sample_epub), output_file=str(output), enable_resume=False, progressive=0.02)
+    coordinator.translator = SlowSecondChapter(output)
+    asyncio.run(coordinator.process())
+
+    assert coordinator.translator.seen_partial
+    assert coordinator.metrics.get("progressive.snapshots") >= 1
+    assert "[zh]Second" in _read(output)["EPUB/Text/chapter-3.xhtml"]
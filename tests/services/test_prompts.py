@@ -0,0 +1,65 @@
+# tests/services/test_prompts.py
+
+import asyncio
+
+import pytest
+
+from epubot.config.settings import settings
+from epubot.services.chunking import ChunkTuner
+from epubot.services.html.tokenizer import get_encoding
+from epubot.services.prompts import COMPACT, FULL, PROMPTS, REVIEW, REVIEW_APPROVED, get_prompt
+from epubot.services.translator import Translator
+from tests.services.conftest import EchoProvider
+
+TEXT = "<p>Hello <b>world</b>.</p>"
+
+
+@pytest.mark.parametrize("template", PROMPTS.values())
+def test_system_prompt_is_a_static_prefix(template):
+    first = template.messages(TEXT, "English", "Chinese")
+    second = template.messages("<p>Other</p>", "French", "Japanese", extra="terms")
+    assert first[0] == second[0]
+    assert "Chinese" not in first[0]["content"] and "Japanese" not in second[0]["content"]
+    assert f"```html\n{TEXT}\n```" in first[1]["content"]
+    assert second[1]["content"].endswith("\n\nterms")
+
+
+def test_review_prompt_is_a_versioned_template():
+    provider = EchoProvider()
+    translator = Translator(provider=provider, tiers=[provider])
+    messages = translator._review_messages(TEXT, "<p>你好<b>世界</b>。</p>", "English", "French", ["Check {names}."])
+    assert messages[0] == {"role": "system", "content": REVIEW.system}
+    assert REVIEW_APPROVED in messages[0]["content"] and "French" not in messages[0]["content"]
+    assert f"```html\n{TEXT}\n```" in messages[1]["content"] and "- Check {names}." in messages[1]["content"]
+    assert REVIEW.key == "review/v1" and "review" not in PROMPTS
+
+
+def test_compact_prompt_is_smaller():
+    encoding = get_encoding()
+    full = len(encoding.encode(FULL.system))
+    compact = len(encoding.encode(COMPACT.system))
+    assert compact * 3 < full
+    assert FULL.key == "full/v2" and COMPACT.key == "compact/v1"
+    with pytest.raises(ValueError):
+        get_prompt("verbose")
+
+
+def test_translator_separates_overhead_from_content(monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_INTERVAL", 0)
+    monkeypatch.setattr(settings, "STREAMING", False)
+    content_tokens = len(get_encoding().encode(TEXT))
+
+    def overhead(template):
+        provider = EchoProvider()
+        translator = Translator(provider=provider, tiers=[provider], prompt=template)
+        assert asyncio.run(translator.translate(TEXT)) == TEXT
+        assert translator.metrics.get("prompt.content_tokens") == content_tokens
+        return translator.metrics.get("prompt.overhead_tokens")
+
+    assert 0 < overhead(COMPACT) < overhead(FULL)
+
+
+def test_tuner_statistics_are_keyed_by_prompt_version():
+    provider = EchoProvider()
+    assert ChunkTuner().key(provider) == "echo/echo-model"
+    assert ChunkTuner(prompt=COMPACT.key).key(provider) == "echo/echo-model@compact/v1"
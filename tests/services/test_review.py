@@ -0,0 +1,126 @@
+# tests/services/test_review.py
+
+import asyncio
+
+from epubot.config.settings import settings
+from epubot.schemas.chunk import Chunk
+from epubot.services.coordinator import Coordinator
+from epubot.services.glossary import Glossary, Term
+from epubot.services.review import ReviewGate, review_signals
+from epubot.services.scheduler import Scheduler
+from epubot.services.translator import REVIEW_APPROVED, Translator
+from tests.services.conftest import FakeProvider
+
+SOURCE = "<p>The quick brown fox jumps over the lazy dog near the <b>river</b> bank.</p>"
+GOOD = "<p>敏捷的棕色狐狸跳过了<b>河</b>岸边那只懒惰的狗，然后跑进了树林。</p>"
+
+
+def test_review_signals():
+    assert review_signals(SOURCE, GOOD) == {}
+    assert set(review_signals(SOURCE, "<p>狐狸跳过<b>河</b>。</p>")) == {"length"}
+    assert "untranslated" in review_signals(SOURCE, "<p>The quick brown fox 跳过了<b>河</b>岸边那只懒惰的狗 near the river.</p>")
+    # 标签数量一致但顺序变化
+    reordered = "<p>敏捷的棕色狐狸跳过了岸边那只懒惰的狗，然后跑进了树林。</p><b>河</b>"
+    assert set(review_signals(SOURCE, reordered)) == {"structure"}
+
+    glossary = Glossary([Term("fox", "赤狐"), Term("river", "河")])
+    signals = review_signals(SOURCE, GOOD, glossary)
+    assert set(signals) == {"glossary"} and "fox => 赤狐" in signals["glossary"]
+    assert "river" not in signals["glossary"]
+
+
+def test_untranslated_signal_is_target_aware():
+    source = "<p>Captain Nemo showed Professor Aronnax, Conseil and Ned Land the Nautilus salon.</p>"
+    french = "<p>Le capitaine Nemo montra au professeur Aronnax, à Conseil et à Ned Land le salon du Nautilus.</p>"
+    assert review_signals(source, french, target_lang="fr") == {}
+    english = "<p>The quick brown fox jumps over the lazy dog and then it runs to the river with his friend.</p>"
+    assert "untranslated" in review_signals(english, english, target_lang="fr")
+
+
+def test_gate_samples_clean_chunks_and_reports_rate():
+    calls = []
+
+    async def review(source, translated, lang, issues):
+        calls.append(issues)
+        return None
+
+    gate = ReviewGate(review, sample_rate=0.1, seed=1)
+
+    async def run():
+        return [await gate(SOURCE, GOOD, "zh") for _ in range(1000)]
+
+    assert set(asyncio.run(run())) == {GOOD}
+    assert 50 < len(calls) < 150
+    assert gate.metrics.get("review.sample") == len(calls) == gate.metrics.get("review.approved")
+    assert gate.metrics.values["review.call_rate"] == round(len(calls) / 1000, 4)
+
+
+class ReviewProvider(FakeProvider):
+    name = "reviewer"
+    model = "reviewer-model"
+
+    def __init__(self, reply):
+        self.reply = reply
+
+    async def complete(self, messages, **kwargs):
+        return self.reply, "stop"
+
+
+def test_translator_review_keeps_only_valid_revisions(monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_INTERVAL", 0)
+
+    def review(reply):
+        translator = Translator(provider=ReviewProvider(reply), tiers=[ReviewProvider(reply)])
+        result = asyncio.run(translator.review(SOURCE, GOOD, issues=["check"]))
+        return result, translator.metrics
+
+    assert review(REVIEW_APPROVED)[0] is None
+    assert review(f"```html\n{GOOD.replace('狐狸', '狐')}\n```")[0] == GOOD.replace("狐狸", "狐")
+    result, metrics = review("<p>敏捷的棕色狐狸</p>")
+    assert result is None and metrics.get("review.rejected") == 1
+
+
+def test_coordinator_reviews_selected_chunks(sample_epub, tmp_path, echo_translator, monkeypatch, capsys):
+    monkeypatch.setattr(settings, "REVIEW_ENABLED", True)
+    monkeypatch.setattr(settings, "REVIEW_SAMPLE_RATE", 1.0)
+    coordinator = Coordinator(str(sample_epub), output_file=str(tmp_path / "out.epub"), enable_resume=False)
+    coordinator.translator = echo_translator
+
+    async def review(source, translated, lang, issues):
+        return translated.replace("[zh]", "[reviewed]")
+
+    coordinator.reviewer.review = review
+    asyncio.run(coordinator.process())
+
+    chunks = coordinator.metrics.get("review.chunks")
+    assert chunks > 0 and coordinator.metrics.get("review.calls") == chunks
+    assert coordinator.metrics.get("review.revised") == chunks
+    assert f"审校: {int(chunks)}/{int(chunks)} 个分块（100.0%）" in capsys.readouterr().out
+
+
+def test_duplicate_chunks_are_reviewed_once():
+    """内容相同的分块合并为一个任务，审校只执行一次，各分块得到相同的审校结果"""
+    reviews = []
+
+    async def translate(content, target_lang=None):
+        await asyncio.sleep(0.01)
+        return content.replace("Figure", "图")
+
+    async def review(source, translated, lang):
+        reviews.append((source, lang))
+        return translated.replace("图", f"图{len(reviews)}")
+
+    chunks = [
+        Chunk(id=str(i), file_id="", content=f"<p>Figure {{{name * 8}}}</p>", tokens=10)
+        for i, name in enumerate("ABC")
+    ]
+
+    async def run():
+        scheduler = Scheduler(translate, concurrency=3)
+        scheduler.review = review
+        async with scheduler:
+            return await asyncio.gather(*(scheduler.submit(chunk, lang="zh") for chunk in chunks))
+
+    results = asyncio.run(run())
+    assert len(reviews) == 1 and reviews[0][1] == "zh"
+    assert results == [f"<p>图1 {{{name * 8}}}</p>" for name in "ABC"]
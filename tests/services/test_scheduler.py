@@ -0,0 +1,109 @@
+# tests/services/test_scheduler.py
+
+import asyncio
+
+from epubot.schemas.chunk import Chunk
+from epubot.services.metrics import RunMetrics
+from epubot.services.scheduler import Scheduler
+from epubot.services.singleflight import SingleFlight, canonicalize, content_key, from_canonical, to_canonical
+
+
+def _chunk(content: str, tokens: int = 10) -> Chunk:
+    return Chunk(id="1", file_id="", content=content, tokens=tokens)
+
+
+def test_canonicalize_ignores_placeholder_names():
+    """只有占位符不同的分块应得到相同的键，并能映射回各自的占位符"""
+    a, holders_a = canonicalize("<p>Figure {AAAAAAAA} see {BBBBBBBB}</p>")
+    b, holders_b = canonicalize("<p>Figure  {CCCCCCCC} see {DDDDDDDD}</p>")
+    assert content_key(a) == content_key(b)
+    translated = to_canonical("<p>图 {AAAAAAAA} 见 {BBBBBBBB}</p>", holders_a)
+    assert from_canonical(translated, holders_b) == "<p>图 {CCCCCCCC} 见 {DDDDDDDD}</p>"
+
+
+def test_singleflight_coalesces_inflight_requests():
+    """并发的相同请求只执行一次，之后的重复命中缓存"""
+    metrics = RunMetrics()
+    flight = SingleFlight(metrics)
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("k", fn, tokens=5) for _ in range(3)))
+        results.append(await flight.do("k", fn, tokens=5))
+        return results
+
+    assert asyncio.run(run()) == ["result"] * 4
+    assert len(calls) == 1
+    assert metrics.get("singleflight.coalesced") == 2
+    assert metrics.get("singleflight.memo_hits") == 1
+    assert metrics.get("singleflight.saved_tokens") == 15
+
+
+def test_singleflight_propagates_errors():
+    """失败的请求不应被缓存"""
+    flight = SingleFlight()
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    async def ok():
+        return "ok"
+
+    async def run():
+        try:
+            await flight.do("k", fail)
+        except RuntimeError:
+            pass
+        return await flight.do("k", ok)
+
+    assert asyncio.run(run()) == "ok"
+
+
+def test_scheduler_collapses_duplicates_before_dispatch():
+    """队列中内容相同的分块只派发一次，译文使用各自的占位符"""
+    requests = []
+
+    async def translate(content):
+        requests.append(content)
+        await asyncio.sleep(0.01)
+        return content.replace("Figure", "图")
+
+    metrics = RunMetrics()
+    scheduler = Scheduler(translate, concurrency=1, metrics=metrics)
+    chunks = [
+        _chunk("<p>Figure {AAAAAAAA}</p>"),
+        _chunk("<p>Other text</p>"),
+        _chunk("<p>Figure {BBBBBBBB}</p>"),
+        _chunk("<p>Figure {CCCCCCCC}</p>"),
+    ]
+
+    async def run():
+        async with scheduler:
+            return await asyncio.gather(*(scheduler.submit(chunk) for chunk in chunks))
+
+    results = asyncio.run(run())
+    assert results == ["<p>图 {AAAAAAAA}</p>", "<p>Other text</p>", "<p>图 {BBBBBBBB}</p>", "<p>图 {CCCCCCCC}</p>"]
+    assert len(requests) == 2
+    report = metrics.report()
+    assert report["singleflight"]["collapsed_in_queue"] == 2
+    assert report["singleflight"]["saved_tokens"] == 20
+    assert report["scheduler"]["requests"] == 2
+
+
+def test_scheduler_propagates_translation_errors():
+    """翻译失败时提交者应收到异常"""
+
+    async def translate(content):
+        raise ValueError("bad")
+
+    async def run():
+        async with Scheduler(translate) as scheduler:
+            return await asyncio.gather(scheduler.submit(_chunk("a")), return_exceptions=True)
+
+    [result] = asyncio.run(run())
+    assert isinstance(result, ValueError)
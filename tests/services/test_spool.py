@@ -0,0 +1,74 @@
+# tests/services/test_spool.py
+
+import asyncio
+import re
+import zipfile
+
+from epubot.services.coordinator import Coordinator
+from epubot.services.spool import MemoryBudget, Spool, SpooledItem
+
+
+def test_spool_round_trip(tmp_path):
+    """文本与二进制内容都应原样读回"""
+    spool = Spool(str(tmp_path))
+    spool.put("text", "你好 <p>world</p>")
+    spool.put("binary", b"\x00\x01")
+    assert "text" in spool
+    assert spool.get("text") == "你好 <p>world</p>"
+    assert spool.get("binary") == b"\x00\x01"
+    spool.put("text", "updated")
+    assert spool.get("text") == "updated"
+    spool.close()
+    assert not spool.directory.exists()
+
+
+def test_spooled_item_reads_lazily(tmp_path):
+    """SpooledItem 应在 get_content 时才读取暂存内容"""
+    spool = Spool(str(tmp_path))
+    spool.put("c1", "<p>a</p>")
+    item = SpooledItem(spool, "c1", uid="c1", file_name="c1.xhtml", media_type="application/xhtml+xml")
+    spool.put("c1", "<p>b</p>")
+    assert item.get_content() == b"<p>b</p>"
+
+
+def test_memory_budget_limits_working_set():
+    """同时驻留的工作集不应超过预算，超大文档单独执行"""
+    budget = MemoryBudget(limit=100)
+
+    async def work(size):
+        async with budget.reserve(size):
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(work(size) for size in (60, 60, 30, 150, 10)))
+
+    asyncio.run(run())
+    assert budget.peak <= 150
+    assert budget.used == 0
+
+
+def _contents(path):
+    with zipfile.ZipFile(path) as z:
+        contents = {name: z.read(name) for name in z.namelist()}
+    # 两次构建的 dcterms:modified 时间戳可能相差一秒
+    for name in contents:
+        if name.endswith(".opf"):
+            contents[name] = re.sub(rb"<meta property=\"dcterms:modified\">[^<]*</meta>", b"", contents[name])
+    return contents
+
+
+def test_spool_mode_matches_in_memory_output(sample_epub, tmp_path, echo_translator):
+    """低内存模式的输出应与常规模式一致"""
+    outputs = {}
+    for spool in (False, True):
+        output = tmp_path / f"out-{spool}.epub"
+        coordinator = Coordinator(str(sample_epub), output_file=str(output), enable_resume=False, spool=spool)
+        coordinator.translator = echo_translator
+        asyncio.run(coordinator.process())
+        outputs[spool] = _contents(output)
+
+    assert outputs[True] == outputs[False]
+    chapter = outputs[True]["EPUB/Text/chapter-1.xhtml"].decode("utf-8")
+    assert "[zh]Hello world." in chapter
+    assert "<code>x = 1</code>" in chapter
+    assert outputs[True]["EPUB/images/a.png"] == b"\x89PNG"
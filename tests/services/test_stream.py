@@ -0,0 +1,120 @@
+# tests/services/test_stream.py
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from epubot.config.settings import settings
+from epubot.services.providers import MistralProvider
+from epubot.services.translator import Translator
+from epubot.services.validator import StreamGuard
+
+SOURCE = "<p>Hello {aZ3k9QpL}.</p><p>World</p>"
+
+
+def _feed(source, deltas):
+    guard = StreamGuard(source)
+    for delta in deltas:
+        reason = guard.feed(delta)
+        if reason:
+            return reason
+    return None
+
+
+def test_stream_guard_accepts_valid_output_split_anywhere():
+    output = "```html\n<p>你好 {aZ3k9QpL}。</p><p>世界</p>\n```"
+    assert _feed(SOURCE, [output[i : i + 3] for i in range(0, len(output), 3)]) is None
+
+
+@pytest.mark.parametrize(
+    "deltas, reason",
+    [
+        (["Here is", " the translation: <p>"], "preamble"),
+        (["<p>你好</p>", "<div>"], "unknown_tag"),
+        (["<p>你好</p><p>世界</p>", "<p>"], "extra_tag"),
+        (["<p>你好 {Zzzzzzzz}"], "unknown_placeholder"),
+        (["<p>你好</p>\n```\n", "Note: I kept the tags."], "fence"),
+    ],
+)
+def test_stream_guard_aborts_early(deltas, reason):
+    assert _feed(SOURCE, deltas) == reason
+
+
+def test_stream_guard_treats_unclosed_angle_bracket_as_text():
+    source = "<p>if a < b then</p>"
+    assert _feed(source, ["<p>如果 a < b", " 那么" * 100, "</p>"]) is None
+
+
+class FakeStream:
+    def __init__(self, deltas, finish_reason="stop"):
+        self.events = [
+            SimpleNamespace(data=SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=d), finish_reason=None)]))
+            for d in deltas
+        ]
+        self.events.append(
+            SimpleNamespace(data=SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=""), finish_reason=finish_reason)]))
+        )
+        self.consumed = 0
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.consumed >= len(self.events):
+            raise StopAsyncIteration
+        self.consumed += 1
+        return self.events[self.consumed - 1]
+
+
+class FakeChat:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.streams = []
+
+    async def stream_async(self, **kwargs):
+        stream = self.responses.pop(0)
+        self.streams.append(stream)
+        return stream
+
+
+@pytest.fixture
+def streaming(monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_INTERVAL", 0)
+    monkeypatch.setattr(settings, "STREAMING", True)
+
+
+def _translator(responses):
+    return Translator(provider=MistralProvider(client=SimpleNamespace(chat=FakeChat(responses))))
+
+
+def test_stream_aborts_bad_generation_and_redispatches(streaming):
+    bad = FakeStream(["Sure! ", "Here is", " the translation:", "<p>...</p>"] * 10)
+    good = FakeStream(["<p>你好 {aZ3k9QpL}。</p>", "<p>世界</p>"])
+    translator = _translator([bad, good])
+
+    result = asyncio.run(translator.translate(SOURCE))
+    assert result == "<p>你好 {aZ3k9QpL}。</p><p>世界</p>"
+    # 第一次生成在前言处即中止，没有读完全部输出
+    assert bad.closed and bad.consumed < len(bad.events)
+    assert translator.metrics.get("stream.aborts") == 1
+    assert translator.metrics.get("validation.preamble") == 1
+    assert translator.metrics.summary("stream.ttft_seconds")["count"] == 2
+
+
+def test_stream_length_finish_reason_is_truncation(streaming):
+    truncated = FakeStream(["<p>你好 {aZ3k9QpL}。</p>"], finish_reason="length")
+    good = FakeStream(["<p>你好 {aZ3k9QpL}。</p><p>世界</p>"])
+    translator = _translator([truncated, good])
+
+    assert asyncio.run(translator.translate(SOURCE)) == "<p>你好 {aZ3k9QpL}。</p><p>世界</p>"
+    assert translator.metrics.get("validation.truncated") == 1
+    report = translator.metrics.report()
+    assert report["stream"]["generation_seconds"]["count"] == 2
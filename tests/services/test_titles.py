@@ -0,0 +1,100 @@
+# tests/services/test_titles.py
+
+import asyncio
+import zipfile
+
+from epubot.services.coordinator import Coordinator
+from epubot.services.html import HTMLReplacer
+from epubot.services.titles import TitleTable
+
+TITLES = {"Introduction": "引言", "Chapter One": "第一章", "Chapter Two": "第二章", "Test Book": "测试书"}
+
+
+class TitleTranslator:
+    """按固定词表翻译标题，正文段落加上标记"""
+
+    def __init__(self, drop=()):
+        self.requests = []
+        self.drop = set(drop)
+
+    async def translate(self, content: str, **kwargs) -> str:
+        self.requests.append(content)
+        for source, target in TITLES.items():
+            content = content.replace(f">{source}<", f">{target}<")
+        for source in self.drop:
+            content = content.replace(f">{TITLES[source]}<", "><")
+        return content.replace("<p>", "<p>[zh]")
+
+
+def _table(translator):
+    async def submit(chunk):
+        return await translator.translate(chunk.content)
+
+    return TitleTable(submit, lambda text: len(text.split()), batch_tokens=20)
+
+
+def test_title_table_translates_each_title_once_in_batches():
+    """重复的标题只翻译一次，按 token 预算分批"""
+    translator = TitleTranslator()
+    table = _table(translator)
+    for title in ["Introduction", "Chapter One", "Chapter  One", "Chapter Two", "Introduction"]:
+        table.add(title)
+
+    assert len(table) == 3
+    assert [len(batch) for batch in table.batches()] == [2, 1]
+    asyncio.run(table.translate())
+    assert len(translator.requests) == 2
+    assert table.get("Chapter One") == "第一章"
+    assert table.metrics.get("titles.references") == 5
+
+
+def test_title_table_retries_missing_entries_and_falls_back():
+    """批次结果缺失的标题单独重试，仍失败时保留原文"""
+    translator = TitleTranslator(drop=["Chapter Two"])
+    table = _table(translator)
+    for title in TITLES:
+        table.add(title)
+
+    asyncio.run(table.translate())
+    assert table.get("Introduction") == "引言"
+    assert table.get("Chapter Two") == "Chapter Two"
+    assert table.metrics.get("titles.fallbacks") == 1
+
+
+def test_replacer_uses_title_table_for_headings():
+    """与目录相同的正文标题不随正文发送，还原时使用标题表译文"""
+    table = _table(TitleTranslator())
+    table.add("Chapter One")
+    replacer = HTMLReplacer(titles=table)
+    replaced = replacer.replace('<h1 id="c1"><span>Chapter One</span></h1><h2>Other</h2><p>Text</p>')
+    assert "Chapter One" not in replaced
+    assert "<h2>Other</h2>" in replaced
+
+    asyncio.run(table.translate())
+    restored = replacer.restore(replaced)
+    assert restored == '<h1 id="c1"><span>第一章</span></h1><h2>Other</h2><p>Text</p>'
+
+
+def test_coordinator_applies_titles_to_toc_nav_and_headings(sample_epub, tmp_path):
+    """目录、导航文档、NCX 和正文标题使用同一份译文，导航文档不再作为正文翻译"""
+    output = tmp_path / "out.epub"
+    translator = TitleTranslator()
+    coordinator = Coordinator(str(sample_epub), output_file=str(output), enable_resume=False)
+    coordinator.translator = translator
+    asyncio.run(coordinator.process())
+
+    title_requests = [r for r in translator.requests if r.startswith("<ol>")]
+    assert len(title_requests) == 1
+    assert not any("<nav" in r or "<navMap" in r for r in translator.requests)
+    assert not any("Chapter One" in r for r in translator.requests if r not in title_requests)
+
+    with zipfile.ZipFile(output) as z:
+        nav = z.read("EPUB/nav.xhtml").decode("utf-8")
+        ncx = z.read("EPUB/toc.ncx").decode("utf-8")
+        chapter = z.read("EPUB/Text/chapter-2.xhtml").decode("utf-8")
+        opf = z.read("EPUB/content.opf").decode("utf-8")
+    assert "第一章" in nav and "Chapter One" not in nav
+    assert "<text>第一章</text>" in ncx
+    assert "<h1>第一章</h1>" in chapter
+    assert "[zh]First paragraph." in chapter
+    assert 'properties="nav"' in opf
@@ -0,0 +1,71 @@
+# tests/services/test_tokenizer.py
+
+import subprocess
+import sys
+
+import pytest
+
+from epubot.config.settings import settings
+from epubot.services.html import HTMLSplitter, tokenizer
+from epubot.services.html.tokenizer import ApproximateEncoding, cache_path, get_encoding, seed_cache
+
+
+@pytest.fixture
+def offline_cache(tmp_path, monkeypatch):
+    """使用空的临时缓存目录，并禁止联网下载"""
+    monkeypatch.setenv("TIKTOKEN_CACHE_DIR", str(tmp_path / "tiktoken"))
+    monkeypatch.setattr(settings, "TOKENIZER_OFFLINE", True)
+    get_encoding.cache_clear()
+    yield tmp_path / "tiktoken"
+    get_encoding.cache_clear()
+
+
+def test_approximate_encoding_counts():
+    """近似分词器应按单词、标点和 CJK 单字计数"""
+    encoding = ApproximateEncoding()
+    assert len(encoding.encode("Hello, world!")) == 5
+    assert len(encoding.encode("你好世界")) == 4
+    assert encoding.encode("") == []
+
+
+def test_offline_fallback(offline_cache):
+    """缓存缺失且离线时应回退到近似分词器"""
+    assert isinstance(get_encoding(), ApproximateEncoding)
+
+
+def test_offline_without_fallback_raises(offline_cache):
+    """不允许兜底时应抛出异常"""
+    with pytest.raises(FileNotFoundError):
+        get_encoding(fallback=False)
+
+
+def test_seed_cache_uses_tiktoken_cache_name(offline_cache, tmp_path):
+    """预置的缓存文件名应与 tiktoken 的缓存命名一致"""
+    source = tmp_path / "cl100k_base.tiktoken"
+    source.write_bytes(b"not a real bpe file")
+    target = seed_cache(str(source))
+    assert target == cache_path("cl100k_base")
+    assert target.parent == offline_cache
+    assert target.read_bytes() == b"not a real bpe file"
+
+
+def test_splitter_loads_tokenizer_lazily(offline_cache, monkeypatch):
+    """创建 HTMLSplitter 时不应加载分词器"""
+    calls = []
+    monkeypatch.setattr(tokenizer, "get_encoding", lambda name=None: calls.append(name) or ApproximateEncoding())
+    monkeypatch.setattr("epubot.services.html.splitter.get_encoding", tokenizer.get_encoding)
+    splitter = HTMLSplitter(count=50)
+    assert calls == []
+    chunks = splitter.split("<p>" + "word " * 100 + "</p>")
+    assert calls
+    assert all(chunk.tokens <= 50 for chunk in chunks)
+
+
+def test_cli_startup_does_not_import_heavy_modules():
+    """导入 CLI 入口不应加载翻译相关的重量级依赖"""
+    code = (
+        "import sys, epubot.main; "
+        "print(','.join(m for m in ('mistralai', 'ebooklib', 'bs4', 'lxml', 'tiktoken', 'tqdm') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
@@ -0,0 +1,101 @@
+# tests/services/test_validator.py
+
+import asyncio
+
+import pytest
+
+from epubot.config.settings import settings
+from epubot.services.html import HTMLReplacer
+from epubot.services.translator import Translator
+from epubot.services.validator import InvalidTranslation, bisect, validate
+
+SOURCE = "<p>Hello {aZ3k9QpL} world.</p><p>Second <em>part</em>.</p>"
+
+
+def test_validate_accepts_well_formed_translation():
+    assert validate(SOURCE, "<p>你好 {aZ3k9QpL} 世界。</p><p>第二<em>部分</em>。</p>") is None
+
+
+@pytest.mark.parametrize(
+    "translated, finish_reason, reason",
+    [
+        ("", None, "empty"),
+        ("<p>你好 {aZ3k9QpL} 世界。</p><p>第二<em>部分</em>。</p>", "length", "truncated"),
+        ("<p>你好世界。</p><p>第二<em>部分</em>。</p>", None, "placeholders"),
+        ("<p>你好 {aZ3k9QpL} 世界。</p><p>第二部分。</p>", None, "tags"),
+        ("Here is the translation: <p>你好 {aZ3k9QpL}</p><p>第二<em>部分</em></p><br/>", None, "tags"),
+    ],
+)
+def test_validate_detects_structural_errors(translated, finish_reason, reason):
+    assert validate(SOURCE, translated, finish_reason) == reason
+
+
+def test_validate_detects_truncation_by_token_ratio(monkeypatch):
+    monkeypatch.setattr(settings, "VALIDATION_MIN_TOKENS", 10)
+    source = "<p>" + " ".join(["word"] * 100) + "</p>"
+    assert validate(source, "<p>词</p>") == "truncated"
+
+
+def test_bisect_prefers_top_level_boundaries():
+    first, second = bisect("<div><p>a</p><p>b</p></div><p>c</p><p>d</p><p>e</p>")
+    assert first + second == "<div><p>a</p><p>b</p></div><p>c</p><p>d</p><p>e</p>"
+    assert first == "<div><p>a</p><p>b</p></div>"
+    assert bisect("<p>x</p>") is None
+
+
+def test_restore_reports_remaining_placeholders(monkeypatch):
+    """还原后残留的占位符应能被检测到"""
+    warnings = []
+    monkeypatch.setattr("epubot.services.html.replacer.logger.warning", lambda *a, **kw: warnings.append(kw))
+    replacer = HTMLReplacer()
+    replacer.restore("<p>{Ab3dEf9h}</p>")
+    assert warnings and warnings[0]["examples"] == ["{Ab3dEf9h}"]
+
+
+class FlakyTranslator(Translator):
+    """长分块丢失标签，短分块正常翻译"""
+
+    def __init__(self, max_size: int):
+        super().__init__()
+        self.max_size = max_size
+        self.calls = []
+
+    async def _translate(self, text: str, source_lang: str, target_lang: str, **kwargs) -> str:
+        self.calls.append(text)
+        if len(text) > self.max_size:
+            return "翻译：" + text.replace("<p>", "")
+        return text.replace("<p>", "<p>[zh]")
+
+
+@pytest.fixture
+def no_interval(monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_INTERVAL", 0)
+
+
+def test_invalid_chunks_are_bisected(no_interval):
+    """重试仍失败的分块对半拆分后分别翻译"""
+    content = "".join(f"<p>Paragraph {i}.</p>" for i in range(4))
+    translator = FlakyTranslator(max_size=40)
+    result = asyncio.run(translator.translate(content))
+
+    assert result == content.replace("<p>", "<p>[zh]")
+    assert translator.metrics.get("validation.bisections") == 1
+    assert translator.metrics.get("validation.tags") == 2
+    # 整块 2 次 + 两半各 1 次，没有进入 10 次的长退避重试
+    assert len(translator.calls) == 4
+
+
+def test_unsplittable_chunks_keep_source(no_interval):
+    translator = FlakyTranslator(max_size=0)
+    assert asyncio.run(translator.translate("<p>x</p>")) == "<p>x</p>"
+    assert translator.metrics.get("validation.fallbacks") == 1
+
+
+def test_truncated_finish_reason_raises(no_interval):
+    class Truncating(Translator):
+        async def _translate(self, text, source_lang, target_lang, **kwargs):
+            raise InvalidTranslation("truncated", "finish_reason=length")
+
+    translator = Truncating()
+    assert asyncio.run(translator.translate("<p>Hello</p>")) == "<p>Hello</p>"
+    assert translator.metrics.get("validation.truncated") == 2